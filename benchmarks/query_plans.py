@@ -0,0 +1,213 @@
+"""
+Query plans of the workflow instance access paths, before and after the composite
+indexes of migration 0007.
+
+Builds a SQLite database with ``--rows`` workflow instances (1,000,000 by default),
+then prints the plan and the best time of each query with the schema migrated to
+0006 (without the indexes) and to 0007 (with them):
+
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --rows 100000 --database /tmp/steps.sqlite3
+
+Generating a million instances takes a few minutes; the database is
+reused when ``--database`` points to an existing file with enough rows.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+)
+
+
+def configure(database):
+    from django.conf import settings
+
+    settings.configure(
+        USE_TZ=True,
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": database}
+        },
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django_steps",
+        ],
+        DJANGO_STEPS={"RECORD_HISTORY": False},
+    )
+
+    import django
+
+    django.setup()
+
+
+def populate(rows, batch_size=5000):
+    """Creates a workflow of five steps and ``rows`` instances spread over a year."""
+    from django.contrib.auth.models import Group, User
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from django_steps.models import (
+        Workflow,
+        WorkflowInstance,
+        WorkflowStep,
+        WorkflowStepStatus,
+        get_object_id_values,
+    )
+
+    existing = WorkflowInstance.objects.count()
+    if existing >= rows:
+        print(f"Reusing {existing} workflow instances.")
+        return
+
+    WorkflowInstance.objects.all().delete()
+    workflow, _ = Workflow.objects.get_or_create(name="Benchmark Workflow")
+    steps = []
+    for order in range(1, 6):
+        step, _ = WorkflowStep.objects.get_or_create(
+            workflow=workflow,
+            order=order,
+            defaults={
+                "name": f"Step {order}",
+                "is_initial_step": order == 1,
+                "is_final_step": order == 5,
+            },
+        )
+        statuses = [
+            WorkflowStepStatus.objects.get_or_create(
+                step=step, name=name, defaults={"is_default_status": name == "Open"}
+            )[0]
+            for name in ("Open", "Assigned", "Waiting")
+        ]
+        steps.append((step, statuses))
+
+    models = (User, Group)
+    content_types = [ContentType.objects.get_for_model(model) for model in models]
+    now = timezone.now()
+    started = time.perf_counter()
+    with transaction.atomic():
+        for offset in range(0, rows, batch_size):
+            instances = []
+            for i in range(offset, min(offset + batch_size, rows)):
+                step, statuses = steps[i % len(steps)]
+                instances.append(
+                    WorkflowInstance(
+                        workflow=workflow,
+                        content_type=content_types[i % 2],
+                        **get_object_id_values(models[i % 2], i // 2),
+                        current_step=step,
+                        current_step_status=statuses[i % len(statuses)],
+                        state=WorkflowInstance.State.ACTIVE,
+                        entered_step_at=now,
+                    )
+                )
+            WorkflowInstance.objects.bulk_create(instances)
+        # started_at is set on creation (auto_now_add); spread it over a year
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {WorkflowInstance._meta.db_table} "
+                "SET started_at = datetime(started_at, '-' || (id % 365) || ' days')"
+            )
+    print(f"Created {rows} workflow instances in {time.perf_counter() - started:.1f}s.")
+
+
+def queries():
+    """The access paths of the library and the admin, as (label, queryset) pairs."""
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+
+    from django_steps.models import WorkflowInstance, WorkflowStepStatus
+
+    content_type = ContentType.objects.get(app_label="auth", model="user")
+    # Only columns that exist in both schemas: later migrations add some to every model
+    status = WorkflowStepStatus.objects.values(
+        "pk", "step_id", "step__workflow_id"
+    ).get(step__order=3, name="Assigned")
+    # Rows rather than instances, whose definitions would be loaded with every column
+    instances = WorkflowInstance.objects.values_list(
+        "pk",
+        "workflow",
+        "current_step",
+        "current_step_status",
+        "started_at",
+        "completed_at",
+    )
+    since = timezone.now() - timedelta(days=30)
+    return [
+        (
+            "get_workflow_instance_for_object",
+            instances.filter(content_type=content_type, object_id=4242).order_by(
+                "-started_at"
+            )[:1],
+        ),
+        (
+            "admin: filter by step and status",
+            instances.filter(
+                current_step_id=status["step_id"],
+                current_step_status_id=status["pk"],
+            )[:100],
+        ),
+        (
+            "admin: date hierarchy of a workflow",
+            instances.filter(
+                workflow_id=status["step__workflow_id"], started_at__gte=since
+            )[:100],
+        ),
+    ]
+
+
+def best_time(queryset, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        # A fresh copy, so nothing is served from the result cache
+        list(queryset._chain())
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def report(title):
+    print(f"\n=== {title} ===")
+    for label, queryset in queries():
+        print(f"\n{label}: {best_time(queryset) * 1000:.2f} ms")
+        for line in queryset.explain().splitlines():
+            print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--database", help="SQLite file to use (a temporary one by default)"
+    )
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(
+        tempfile.mkdtemp(), "steps_benchmark.sqlite3"
+    )
+    configure(database)
+
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    populate(args.rows)
+
+    call_command("migrate", "django_steps", "0006", verbosity=0)
+    report("Before (migration 0006)")
+
+    started = time.perf_counter()
+    call_command("migrate", "django_steps", "0007", verbosity=0)
+    print(
+        f"\nBuilt the indexes of migration 0007 in {time.perf_counter() - started:.1f}s."
+    )
+    report("After (migration 0007)")
+
+
+if __name__ == "__main__":
+    main()
@@ -311,7 +311,7 @@ class Command(BaseCommand):
                     workflow=workflow,
                     from_step=claim_approval,
                     to_step=claim_completed,
-                    condition="claim.amount_approved is None or float(claim.amount_approved) == 0.0",
+                    condition="claim.amount_approved == null || float(claim.amount_approved) == 0.0",
                     priority=0,
                     description="Mark as completed (rejected) if no amount is approved"
                 )
@@ -3,6 +3,8 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.conf import settings
 
+from django_steps.managers import WorkflowManager
+
 
 class Customer(models.Model):
     """Represents a customer who can submit insurance claims"""
@@ -65,6 +67,8 @@ class Claim(models.Model):
     adjuster_notes = models.TextField(blank=True)
     supervisor_notes = models.TextField(blank=True)
 
+    objects = WorkflowManager()
+
     def __str__(self):
         return f"Claim {self.claim_number} - {self.policy.customer.name}"
 
@@ -79,18 +83,13 @@ class Claim(models.Model):
 
     @property
     def workflow_instance(self):
-        """Returns the associated workflow instance using ContentType framework"""
-        from django.contrib.contenttypes.models import ContentType
-        from django_steps.models import WorkflowInstance
-
-        content_type = ContentType.objects.get_for_model(self.__class__)
-        try:
-            return WorkflowInstance.objects.filter(
-                content_type=content_type,
-                object_id=str(self.pk)
-            ).order_by('-started_at').first()
-        except Exception:
-            return None
+        """
+        Returns the associated workflow instance, without a query if it was loaded
+        with Claim.objects.prefetch_workflow_instances()
+        """
+        from django_steps.services import get_workflow_instance_for_object
+
+        return get_workflow_instance_for_object(self)
 
 
 class ClaimNote(models.Model):
@@ -9,7 +9,9 @@ from django.utils import timezone
 from .models import Claim, Customer, Policy, ClaimNote, ClaimPayment
 from .forms import ClaimForm, ClaimNoteForm, ClaimReviewForm, ClaimApprovalForm, CustomerForm, PolicyForm
 
-from django_steps.models import WorkflowStep
+from django_steps.definitions import get_workflow_definition_by_name
+from django_steps.models import Workflow, WorkflowStep
+from django_steps.state_cache import get_workflow_state
 from django_steps.services import (
     start_workflow_instance, update_workflow_step_status, 
     cancel_workflow_instance, get_workflow_instance_for_object
@@ -159,7 +161,10 @@ class ClaimListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # One query for the page's claims with their policy and customer, one for their workflows
+        queryset = super().get_queryset().select_related(
+            'policy__customer'
+        ).prefetch_workflow_instances()
 
         # Filter by priority if specified
         priority = self.request.GET.get('priority')
@@ -171,14 +176,28 @@ class ClaimListView(LoginRequiredMixin, ListView):
         if policy_type:
             queryset = queryset.filter(policy__policy_type=policy_type)
 
+        # Filter by workflow step if specified (in SQL, so pagination still works)
+        step = self.request.GET.get('step')
+        if step:
+            try:
+                queryset = queryset.filter_by_workflow_step('Claim Processing', step)
+            except Workflow.DoesNotExist:
+                queryset = queryset.none()
+
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['priorities'] = Claim.CLAIM_PRIORITIES
         context['policy_types'] = Policy.POLICY_TYPES
+        try:
+            definition = get_workflow_definition_by_name('Claim Processing')
+            context['workflow_steps'] = [step.step.name for step in definition.steps]
+        except Workflow.DoesNotExist:
+            context['workflow_steps'] = []
         context['current_priority'] = self.request.GET.get('priority', '')
         context['current_policy_type'] = self.request.GET.get('policy_type', '')
+        context['current_step'] = self.request.GET.get('step', '')
         return context
 
 
@@ -204,13 +223,13 @@ class ClaimDetailView(LoginRequiredMixin, DetailView):
         # Add form for adding notes
         context['note_form'] = ClaimNoteForm()
 
-        # Check if there's a workflow instance for this claim
-        workflow_instance = get_workflow_instance_for_object(self.object)
-        context['workflow_instance'] = workflow_instance
+        # The state of the claim's workflow, from the cache after the first view
+        workflow_state = get_workflow_state(self.object)
+        context['workflow_state'] = workflow_state
 
         # Based on the current workflow step, determine which forms to show
-        if workflow_instance and workflow_instance.current_step:
-            step_name = workflow_instance.current_step.name
+        if workflow_state and workflow_state.step_name:
+            step_name = workflow_state.step_name
 
             if step_name == 'Claim Review':
                 context['review_form'] = ClaimReviewForm(instance=self.object)
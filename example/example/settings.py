@@ -2,6 +2,7 @@
 Django settings for example project.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +37,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django_steps.middleware.WorkflowScopeMiddleware",
 ]
 
 ROOT_URLCONF = "example.urls"
@@ -66,6 +68,25 @@ DATABASES = {
     }
 }
 
+# Cache
+# Shared between processes when Redis is available (see docker-compose.yml), so that
+# workflow definition changes made in the admin reach every worker.
+if os.environ.get("REDIS_HOST"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{os.environ['REDIS_HOST']}:{os.environ.get('REDIS_PORT', '6379')}",
+        }
+    }
+
+# Django Steps
+DJANGO_STEPS = {
+    "CACHE_ALIAS": "default",
+    "DEFINITION_CHECK_INTERVAL": 5,
+    # Claim pages read the state of their workflow from the cache
+    "STATE_CACHE": True,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
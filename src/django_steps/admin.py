@@ -1,10 +1,50 @@
 from django.contrib import admin, messages
 from django.core.exceptions import ValidationError
 
-from .models import (Workflow, WorkflowInstance, WorkflowStep,
-                     WorkflowStepStatus, WorkflowTransition)
-from .services import (cancel_workflow_instance, resume_workflow_instance,
-                       set_workflow_on_hold)
+from .models import (
+    Workflow,
+    WorkflowInstance,
+    WorkflowInstanceEvent,
+    WorkflowOperation,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
+)
+from .plans import get_workflow_errors, get_workflow_warnings
+
+
+class WorkflowDefinitionAdminMixin:
+    """
+    Admin of the definition models. Code-defined workflows (see ``declarative.py``) can
+    be viewed, but only changed in code. Saving shows the errors found compiling the
+    workflow (see ``plans.py``).
+    """
+
+    def get_definition_workflow(self, obj):
+        return obj.workflow
+
+    def is_code_defined(self, obj):
+        return obj is not None and self.get_definition_workflow(obj).is_code_defined
+
+    def has_change_permission(self, request, obj=None):
+        if self.is_code_defined(obj):
+            return False
+        return super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if self.is_code_defined(obj):
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        workflow = Workflow.objects.get(
+            pk=self.get_definition_workflow(form.instance).pk
+        )
+        for error in get_workflow_errors(workflow):
+            messages.error(request, f"Workflow '{workflow.name}' is invalid: {error}")
+        for warning in get_workflow_warnings(workflow):
+            messages.warning(request, f"Workflow '{workflow.name}': {warning}")
 
 
 class WorkflowStepStatusInline(admin.TabularInline):
@@ -29,7 +69,7 @@ class WorkflowTransitionInline(admin.TabularInline):
 
 
 @admin.register(WorkflowStep)
-class WorkflowStepAdmin(admin.ModelAdmin):
+class WorkflowStepAdmin(WorkflowDefinitionAdminMixin, admin.ModelAdmin):
     list_display = ("workflow", "name", "order", "is_initial_step", "is_final_step")
     list_filter = ("workflow", "is_initial_step", "is_final_step")
     search_fields = ("name", "description", "workflow__name")
@@ -67,7 +107,6 @@ class WorkflowStepAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at", "updated_at")
 
 
-
 class WorkflowStepInline(admin.TabularInline):
     model = WorkflowStep
     extra = 1
@@ -75,7 +114,7 @@ class WorkflowStepInline(admin.TabularInline):
 
 
 @admin.register(Workflow)
-class WorkflowAdmin(admin.ModelAdmin):
+class WorkflowAdmin(WorkflowDefinitionAdminMixin, admin.ModelAdmin):
     list_display = ("name", "description", "created_at", "updated_at")
     search_fields = ("name", "description")
     inlines = [WorkflowStepInline]
@@ -85,7 +124,13 @@ class WorkflowAdmin(admin.ModelAdmin):
         (
             None,
             {
-                "fields": ("name", "description"),
+                "fields": ("name", "description", "deferred_advancement", "key"),
+            },
+        ),
+        (
+            "Compiled Plan",
+            {
+                "fields": ("definition_errors", "definition_warnings"),
             },
         ),
         (
@@ -96,7 +141,47 @@ class WorkflowAdmin(admin.ModelAdmin):
             },
         ),
     )
-    readonly_fields = ("created_at", "updated_at")
+    readonly_fields = (
+        "key",
+        "definition_errors",
+        "definition_warnings",
+        "created_at",
+        "updated_at",
+    )
+
+    def get_definition_workflow(self, obj):
+        return obj
+
+    @admin.display(description="Definition errors")
+    def definition_errors(self, obj):
+        if obj.pk is None:
+            return "-"
+        return "\n".join(get_workflow_errors(obj)) or "None"
+
+    @admin.display(description="Definition warnings")
+    def definition_warnings(self, obj):
+        if obj.pk is None:
+            return "-"
+        return "\n".join(get_workflow_warnings(obj)) or "None"
+
+
+class WorkflowInstanceEventInline(admin.TabularInline):
+    model = WorkflowInstanceEvent
+    extra = 0
+    can_delete = False
+    fields = (
+        "timestamp",
+        "kind",
+        "from_step",
+        "from_status",
+        "to_step",
+        "to_status",
+        "actor",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False  # The history is append-only
 
 
 @admin.register(WorkflowInstance)
@@ -107,10 +192,19 @@ class WorkflowInstanceAdmin(admin.ModelAdmin):
         "content_object",
         "current_step",
         "current_step_status",
+        "state",
         "started_at",
         "completed_at",
     )
-    list_filter = ("workflow", "current_step", "current_step_status", "content_type")
+    list_filter = (
+        "workflow",
+        "state",
+        "current_step",
+        "current_step_status",
+        "content_type",
+    )
+    # No joins: the workflow, step and status come from the cached definitions
+    list_select_related = ()
     search_fields = (
         "id",
         "object_id",
@@ -118,10 +212,18 @@ class WorkflowInstanceAdmin(admin.ModelAdmin):
         "current_step__name",
         "current_step_status__name",
     )
-    readonly_fields = ("id", "started_at", "completed_at", "content_object")
+    readonly_fields = (
+        "id",
+        "state",
+        "started_at",
+        "entered_step_at",
+        "completed_at",
+        "content_object",
+    )
     raw_id_fields = ("workflow", "current_step", "current_step_status", "content_type")
     date_hierarchy = "started_at"
     ordering = ("-started_at",)
+    inlines = [WorkflowInstanceEventInline]
 
     fieldsets = (
         (
@@ -133,13 +235,13 @@ class WorkflowInstanceAdmin(admin.ModelAdmin):
         (
             "Current State",
             {
-                "fields": ("current_step", "current_step_status"),
+                "fields": ("current_step", "current_step_status", "state"),
             },
         ),
         (
             "Timestamps & Completion",
             {
-                "fields": ("started_at", "completed_at"),
+                "fields": ("started_at", "entered_step_at", "completed_at"),
                 "classes": ("collapse",),
             },
         ),
@@ -147,63 +249,39 @@ class WorkflowInstanceAdmin(admin.ModelAdmin):
 
     actions = ["mark_as_on_hold", "mark_as_resumed", "mark_as_cancelled"]
 
-    @admin.action(description="Mark selected workflows as On Hold")
-    def mark_as_on_hold(self, request, queryset):
-        successful_updates = 0
-        for instance in queryset:
-            if set_workflow_on_hold(instance):
-                successful_updates += 1
-            else:
-                self.message_user(
-                    request,
-                    f"Failed to put workflow instance {instance.id} on hold.",
-                    level=messages.ERROR,
-                )
-        if successful_updates > 0:
+    def _report_bulk_counts(self, request, counts, verb):
+        if counts.applied:
+            self.message_user(
+                request, f"Successfully {verb} {counts.applied} workflow instances."
+            )
+        if counts.skipped:
             self.message_user(
                 request,
-                f"Successfully put {successful_updates} workflow instances on hold.",
+                f"Skipped {counts.skipped} workflow instances that were already completed or in that state.",
+                level=messages.WARNING,
             )
-
-    @admin.action(description="Mark selected workflows as Resumed")
-    def mark_as_resumed(self, request, queryset):
-        successful_updates = 0
-        for instance in queryset:
-            if resume_workflow_instance(instance):
-                successful_updates += 1
-            else:
-                self.message_user(
-                    request,
-                    f"Failed to resume workflow instance {instance.id}.",
-                    level=messages.ERROR,
-                )
-        if successful_updates > 0:
+        if counts.failed:
             self.message_user(
                 request,
-                f"Successfully resumed {successful_updates} workflow instances.",
+                f"Failed to update {counts.failed} workflow instances; check their step statuses.",
+                level=messages.ERROR,
             )
 
+    @admin.action(description="Mark selected workflows as On Hold")
+    def mark_as_on_hold(self, request, queryset):
+        self._report_bulk_counts(request, queryset.bulk_set_on_hold(), "put on hold")
+
+    @admin.action(description="Mark selected workflows as Resumed")
+    def mark_as_resumed(self, request, queryset):
+        self._report_bulk_counts(request, queryset.bulk_resume(), "resumed")
+
     @admin.action(description="Mark selected workflows as Cancelled")
     def mark_as_cancelled(self, request, queryset):
-        successful_updates = 0
-        for instance in queryset:
-            if cancel_workflow_instance(instance):
-                successful_updates += 1
-            else:
-                self.message_user(
-                    request,
-                    f"Failed to cancel workflow instance {instance.id}.",
-                    level=messages.ERROR,
-                )
-        if successful_updates > 0:
-            self.message_user(
-                request,
-                f"Successfully cancelled {successful_updates} workflow instances.",
-            )
+        self._report_bulk_counts(request, queryset.bulk_cancel(), "cancelled")
 
 
 @admin.register(WorkflowStepStatus)
-class WorkflowStepStatusAdmin(admin.ModelAdmin):
+class WorkflowStepStatusAdmin(WorkflowDefinitionAdminMixin, admin.ModelAdmin):
     list_display = (
         "name",
         "step",
@@ -253,9 +331,12 @@ class WorkflowStepStatusAdmin(admin.ModelAdmin):
     )
     readonly_fields = ("created_at", "updated_at")
 
+    def get_definition_workflow(self, obj):
+        return obj.step.workflow
+
 
 @admin.register(WorkflowTransition)
-class WorkflowTransitionAdmin(admin.ModelAdmin):
+class WorkflowTransitionAdmin(WorkflowDefinitionAdminMixin, admin.ModelAdmin):
     list_display = (
         "workflow",
         "from_step",
@@ -297,3 +378,30 @@ class WorkflowTransitionAdmin(admin.ModelAdmin):
         ),
     )
     readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(WorkflowOperation)
+class WorkflowOperationAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "instance",
+        "kind",
+        "status_name",
+        "priority",
+        "state",
+        "attempts",
+        "available_at",
+        "finished_at",
+    )
+    list_filter = ("state", "kind")
+    search_fields = ("id", "instance__id", "status_name", "last_error")
+    raw_id_fields = ("instance",)
+    readonly_fields = (
+        "attempts",
+        "last_error",
+        "claimed_by",
+        "claimed_at",
+        "created_at",
+        "finished_at",
+    )
+    ordering = ("-priority", "available_at", "id")
@@ -1,7 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+from django.utils.module_loading import autodiscover_modules
 
 
 class DjangoStepsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_steps"
     verbose_name = "Django Steps"
+
+    def ready(self):
+        # Connect the receivers that keep cached workflow definitions up to date
+        from . import signals  # noqa: F401
+        from .conf import get_setting
+        from .declarative import sync_workflows
+
+        # Register the code-defined workflows of every app, and keep their rows in line
+        autodiscover_modules("workflows")
+        post_migrate.connect(sync_workflows, sender=self)
+
+        if get_setting("WARM_UP_DEFINITIONS"):
+            from .snapshot import warm_up_definitions
+
+            warm_up_definitions()
@@ -0,0 +1,262 @@
+"""
+Parsing and evaluation of the CEL conditions attached to WorkflowTransitions.
+
+The same condition strings are evaluated over and over, so parsed expressions are
+kept in a bounded, thread-safe LRU cache keyed by the condition text. Conditions
+that fail to parse are cached too, so a broken condition costs a single parse.
+Unless ``COMPILE_CONDITIONS`` is disabled, each parsed condition is compiled to a
+native Python function on its first evaluation (see ``compiler.py``).
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+from .compiler import compile_condition
+from .conf import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedCondition:
+    """
+    Result of parsing a CEL condition: either its AST or the error raised by the parser.
+    """
+
+    __slots__ = (
+        "condition",
+        "ast",
+        "error",
+        "is_compiled",
+        "_function",
+        "_member_paths",
+    )
+
+    def __init__(self, condition, ast=None, error=None):
+        self.condition = condition
+        self.ast = ast
+        self.error = error
+        self.is_compiled = False
+        # Compiled (or interpreting) function, built on first evaluation
+        self._function = None
+        self._member_paths = None
+
+    def __repr__(self):
+        state = "error" if self.error is not None else "ok"
+        return f"<ParsedCondition: {self.condition!r} ({state})>"
+
+    @property
+    def is_valid(self):
+        return self.error is None
+
+    @property
+    def member_paths(self):
+        """
+        The identifier/member paths read by the condition, e.g. ``{("claim", "amount")}``.
+        Empty for conditions that could not be parsed.
+        """
+        if self._member_paths is None:
+            self._member_paths = (
+                collect_member_paths(self.ast) if self.error is None else frozenset()
+            )
+        return self._member_paths
+
+    def evaluate(self, context_data):
+        """
+        Evaluates the condition against ``context_data``.
+
+        Raises:
+            CELError: If the condition could not be parsed or evaluated.
+        """
+        if self.error is not None:
+            raise self.error.with_traceback(None)
+        function = self._function
+        if function is None:
+            function = self._function = self._build_function()
+        return function(context_data)
+
+    def prepare(self):
+        """
+        Builds the function evaluating the condition now rather than on its first
+        evaluation. Does nothing for conditions that could not be parsed.
+        """
+        if self.error is None and self._function is None:
+            self._function = self._build_function()
+
+    def _build_function(self):
+        if get_setting("COMPILE_CONDITIONS"):
+            compiled = compile_condition(self.ast, self.condition)
+            if compiled is not None:
+                self.is_compiled = True
+                return compiled
+
+        # Lazy import to ensure celparser is installed
+        from celparser.evaluator import evaluate
+
+        ast = self.ast
+        return lambda context_data: evaluate(ast, context_data)
+
+
+class ConditionCache:
+    """
+    Bounded LRU cache of ParsedConditions keyed by condition text.
+    """
+
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return get_setting("CONDITION_CACHE_SIZE")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, condition):
+        """
+        Returns the ParsedCondition for ``condition``, parsing it on a cache miss.
+        """
+        with self._lock:
+            entry = self._entries.get(condition)
+            if entry is not None:
+                self._entries.move_to_end(condition)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Parse outside the lock; a concurrent miss on the same text only parses twice
+        entry = _parse(condition)
+
+        with self._lock:
+            self._add(entry)
+        return entry
+
+    def preload(self, entries):
+        """
+        Adds already parsed conditions (e.g. from a definition snapshot) to the cache,
+        keeping the entries it already holds. Doesn't count as hits or misses.
+        """
+        with self._lock:
+            for entry in entries:
+                if entry.condition not in self._entries:
+                    self._add(entry)
+
+    def _add(self, entry):
+        self._entries[entry.condition] = entry
+        self._entries.move_to_end(entry.condition)
+        maxsize = self.maxsize
+        while len(self._entries) > maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        """Empties the cache and resets its counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def _parse(condition):
+    # Lazy import to ensure celparser is installed
+    from celparser.parser import parse
+
+    try:
+        return ParsedCondition(condition, ast=parse(condition))
+    except Exception as e:
+        logger.error(f"Error parsing CEL condition '{condition}': {e}")
+        return ParsedCondition(condition, error=e)
+
+
+def _member_path(node):
+    """
+    Returns the path of a chain of member accesses rooted at an identifier
+    (``claim.policy.policy_type`` -> ``("claim", "policy", "policy_type")``), or None.
+    """
+    fields = []
+    while type(node).__name__ == "MemberAccess":
+        fields.append(node.field)
+        node = node.object
+    if type(node).__name__ != "Identifier" or node.name in ("True", "False", "null"):
+        return None
+    fields.append(node.name)
+    return tuple(reversed(fields))
+
+
+def collect_member_paths(ast):
+    """
+    Statically collects the identifier and member paths an expression reads.
+
+    Index accesses and method calls contribute the path of the value they are applied
+    to (``claim.tags[0]`` -> ``("claim", "tags")``); names of called functions are ignored.
+
+    Returns:
+        frozenset: Tuples of path segments.
+    """
+    paths = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        kind = type(node).__name__
+        if kind in ("Identifier", "MemberAccess"):
+            path = _member_path(node)
+            if path is not None:
+                paths.add(path)
+            elif kind == "MemberAccess":
+                stack.append(node.object)
+        elif kind == "IndexAccess":
+            stack.extend((node.object, node.index))
+        elif kind == "UnaryOp":
+            stack.append(node.expr)
+        elif kind == "BinaryOp":
+            stack.extend((node.left, node.right))
+        elif kind == "TernaryOp":
+            stack.extend((node.condition, node.true_expr, node.false_expr))
+        elif kind == "FunctionCall":
+            if type(node.function).__name__ == "MemberAccess":
+                # Method call: the receiver is read, the method name is not a field
+                stack.append(node.function.object)
+            stack.extend(node.arguments)
+        elif kind == "ListExpr":
+            stack.extend(node.elements)
+        elif kind == "MapExpr":
+            for key, value in node.entries:
+                stack.extend((key, value))
+    return frozenset(paths)
+
+
+condition_cache = ConditionCache()
+
+
+def parse_condition(condition: str) -> ParsedCondition:
+    """
+    Returns the (cached) ParsedCondition for a CEL condition string.
+    """
+    return condition_cache.get(condition)
+
+
+def evaluate_condition(condition: str, context_data: dict):
+    """
+    Parses (through the cache) and evaluates a CEL condition against ``context_data``.
+
+    Raises:
+        CELError: If the condition could not be parsed or evaluated.
+    """
+    return condition_cache.get(condition).evaluate(context_data)
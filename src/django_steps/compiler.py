@@ -0,0 +1,324 @@
+"""
+Compiles parsed CEL conditions into native Python functions.
+
+Walking celparser's AST with its visitor-based evaluator on every transition check
+is comparatively slow. ``compile_condition`` translates an AST into the source of a
+single Python function, compiles it once and returns it. The generated code mirrors
+the semantics of ``celparser.evaluator.Evaluator`` (with undeclared variables
+allowed), including its null handling and the errors it raises.
+
+Only the node types and operators used by transition conditions are supported
+(literals, identifiers, member and index access, ``!``/unary minus, arithmetic,
+comparisons, ``&&``/``||``, the ternary operator, list/map literals and calls of
+built-in or context functions). ``compile_condition`` returns None for anything
+else, and callers fall back to the interpreter.
+"""
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = (int, float)
+
+
+class UnsupportedExpression(Exception):
+    """Raised while generating code for a node the compiler does not support."""
+
+
+def _runtime_namespace():
+    # Lazy import to ensure celparser is installed
+    from celparser.errors import CELEvaluationError, CELTypeError
+    from celparser.evaluator import Evaluator
+
+    def _member(obj, field):
+        if obj is None:
+            return None
+        if isinstance(obj, dict):
+            return obj.get(field)
+        try:
+            return getattr(obj, field)
+        except (AttributeError, TypeError):
+            return None
+
+    def _index(obj, index):
+        if obj is None:
+            return None
+        try:
+            return obj[index]
+        except (TypeError, KeyError, IndexError):
+            return None
+
+    def _neg(value):
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            raise CELTypeError("Cannot apply unary minus to bool")
+        if not isinstance(value, _NUMBER):
+            raise CELTypeError(f"Cannot apply unary minus to {type(value).__name__}")
+        return -value
+
+    def _add(left, right):
+        if left is None or right is None:
+            return None
+        if isinstance(left, str) or isinstance(right, str):
+            return str(left) + str(right)
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            return left + right
+        raise CELTypeError(
+            f"Cannot add {type(left).__name__} and {type(right).__name__}"
+        )
+
+    def _sub(left, right):
+        if left is None or right is None:
+            return None
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            return left - right
+        raise CELTypeError(
+            f"Cannot subtract {type(right).__name__} from {type(left).__name__}"
+        )
+
+    def _mul(left, right):
+        if left is None or right is None:
+            return None
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            return left * right
+        if isinstance(left, str) and isinstance(right, int):
+            return left * right
+        raise CELTypeError(
+            f"Cannot multiply {type(left).__name__} and {type(right).__name__}"
+        )
+
+    def _div(left, right):
+        if left is None or right is None:
+            return None
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            if right == 0:
+                raise CELEvaluationError("Division by zero")
+            return left / right
+        raise CELTypeError(
+            f"Cannot divide {type(left).__name__} by {type(right).__name__}"
+        )
+
+    def _mod(left, right):
+        if left is None or right is None:
+            return None
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            if right == 0:
+                raise CELEvaluationError("Modulo by zero")
+            return left % right
+        raise CELTypeError(
+            f"Cannot apply modulo to {type(left).__name__} and {type(right).__name__}"
+        )
+
+    def _comparable(left, right):
+        if isinstance(left, _NUMBER) and isinstance(right, _NUMBER):
+            return True
+        if isinstance(left, str) and isinstance(right, str):
+            return True
+        raise CELTypeError(
+            f"Cannot compare {type(left).__name__} and {type(right).__name__}"
+        )
+
+    def _lt(left, right):
+        if left is None or right is None:
+            return False
+        return _comparable(left, right) and left < right
+
+    def _le(left, right):
+        if left is None or right is None:
+            return False
+        return _comparable(left, right) and left <= right
+
+    def _gt(left, right):
+        if left is None or right is None:
+            return False
+        return _comparable(left, right) and left > right
+
+    def _ge(left, right):
+        if left is None or right is None:
+            return False
+        return _comparable(left, right) and left >= right
+
+    def _map_key(key):
+        if not isinstance(key, (str, int, float, bool, tuple)):
+            raise CELTypeError(
+                f"Map key must be a hashable type, got {type(key).__name__}"
+            )
+        return key
+
+    builtins = Evaluator().functions
+
+    def _call(func, name, args, description):
+        # Same resolution order as Evaluator.visit_FunctionCall for plain function calls
+        if isinstance(func, str) and func in builtins:
+            return builtins[func](*args)
+        if callable(func):
+            return func(*args)
+        if name in builtins:
+            return builtins[name](*args)
+        raise CELEvaluationError(f"Not a function: {description}")
+
+    namespace = {
+        "_member": _member,
+        "_index": _index,
+        "_neg": _neg,
+        "_add": _add,
+        "_sub": _sub,
+        "_mul": _mul,
+        "_div": _div,
+        "_mod": _mod,
+        "_lt": _lt,
+        "_le": _le,
+        "_gt": _gt,
+        "_ge": _ge,
+        "_map_key": _map_key,
+        "_call": _call,
+    }
+    for name, func in builtins.items():
+        namespace[f"_builtin_{name}"] = func
+    return namespace
+
+
+_ARITHMETIC = {"+": "_add", "-": "_sub", "*": "_mul", "/": "_div", "%": "_mod"}
+_COMPARISONS = {"<": "_lt", "<=": "_le", ">": "_gt", ">=": "_ge"}
+_SPECIAL_IDENTIFIERS = {"True": "True", "False": "False", "null": "None"}
+
+
+class _CodeGenerator:
+    """
+    Translates a celparser AST into a Python expression over a ``ctx`` mapping.
+    """
+
+    def __init__(self, builtin_names):
+        self.builtin_names = builtin_names
+        self.constants = []
+
+    def constant(self, value):
+        self.constants.append(value)
+        return f"_k{len(self.constants) - 1}"
+
+    def emit(self, node):
+        method = getattr(self, f"emit_{type(node).__name__}", None)
+        if method is None:
+            raise UnsupportedExpression(type(node).__name__)
+        return method(node)
+
+    def emit_Literal(self, node):
+        value = node.value
+        if value is None or isinstance(value, (bool, int, str)):
+            return repr(value)
+        if isinstance(value, float) and math.isfinite(value):
+            return repr(value)
+        return self.constant(value)
+
+    def emit_Identifier(self, node):
+        if node.name in _SPECIAL_IDENTIFIERS:
+            return _SPECIAL_IDENTIFIERS[node.name]
+        return f"ctx.get({node.name!r})"
+
+    def emit_MemberAccess(self, node):
+        return f"_member({self.emit(node.object)}, {node.field!r})"
+
+    def emit_IndexAccess(self, node):
+        return f"_index({self.emit(node.object)}, {self.emit(node.index)})"
+
+    def emit_UnaryOp(self, node):
+        operand = self.emit(node.expr)
+        if node.operator == "!":
+            return f"(not {operand})"
+        if node.operator == "UNARY_MINUS":
+            return f"_neg({operand})"
+        raise UnsupportedExpression(f"unary {node.operator}")
+
+    def emit_BinaryOp(self, node):
+        left = self.emit(node.left)
+        right = self.emit(node.right)
+        operator = node.operator
+        if operator == "&&":
+            return f"(bool({right}) if {left} else False)"
+        if operator == "||":
+            return f"(True if {left} else bool({right}))"
+        if operator == "==":
+            return f"({left} == {right})"
+        if operator == "!=":
+            return f"({left} != {right})"
+        if operator in _COMPARISONS:
+            return f"{_COMPARISONS[operator]}({left}, {right})"
+        if operator in _ARITHMETIC:
+            return f"{_ARITHMETIC[operator]}({left}, {right})"
+        raise UnsupportedExpression(f"binary {operator}")
+
+    def emit_TernaryOp(self, node):
+        return (
+            f"({self.emit(node.true_expr)} if {self.emit(node.condition)} "
+            f"else {self.emit(node.false_expr)})"
+        )
+
+    def emit_ListExpr(self, node):
+        return "[" + "".join(f"{self.emit(e)}, " for e in node.elements) + "]"
+
+    def emit_MapExpr(self, node):
+        entries = "".join(
+            f"_map_key({self.emit(key)}): {self.emit(value)}, "
+            for key, value in node.entries
+        )
+        return "{" + entries + "}"
+
+    def emit_FunctionCall(self, node):
+        function = node.function
+        # Method calls (obj.method()) have receiver-specific semantics: leave them to the interpreter
+        if (
+            type(function).__name__ != "Identifier"
+            or function.name in _SPECIAL_IDENTIFIERS
+        ):
+            raise UnsupportedExpression("method call")
+        name = function.name
+        args = "".join(f"{self.emit(arg)}, " for arg in node.arguments)
+        generic = f"_call(ctx.get({name!r}), {name!r}, ({args}), {self.constant(repr(function))})"
+        if name in self.builtin_names:
+            # Fast path: the context does not shadow the built-in
+            return f"(_builtin_{name}({args}) if {name!r} not in ctx else {generic})"
+        return generic
+
+
+_namespace = None
+
+
+def compile_condition(ast, source="<cel>"):
+    """
+    Compiles a parsed CEL expression into a function taking the context mapping.
+
+    Returns:
+        callable: A function ``f(context_data)`` returning the same value as
+                  ``celparser.evaluator.evaluate(ast, context_data)``.
+        None: If the expression uses a construct the compiler does not support.
+    """
+    global _namespace
+    if _namespace is None:
+        _namespace = _runtime_namespace()
+
+    builtin_names = {
+        name[len("_builtin_") :] for name in _namespace if name.startswith("_builtin_")
+    }
+    generator = _CodeGenerator(builtin_names)
+    try:
+        expression = generator.emit(ast)
+    except UnsupportedExpression as e:
+        logger.debug(
+            f"CEL condition {source!r} not compiled ({e}); using the interpreter."
+        )
+        return None
+
+    constants = ", ".join(f"_k{i}" for i in range(len(generator.constants)))
+    code = (
+        f"def _make({constants}):\n"
+        f"    def _condition(ctx):\n"
+        f"        if not ctx:\n"
+        f"            ctx = {{}}\n"
+        f"        return {expression}\n"
+        f"    return _condition\n"
+    )
+    namespace = dict(_namespace)
+    exec(compile(code, f"<cel: {source}>", "exec"), namespace)
+    return namespace["_make"](*generator.constants)
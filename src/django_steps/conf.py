@@ -0,0 +1,55 @@
+"""
+Settings for django_steps.
+
+All settings live in a single ``DJANGO_STEPS`` dictionary in the project's settings,
+e.g.::
+
+    DJANGO_STEPS = {
+        "CACHE_ALIAS": "default",
+        "DEFINITION_CHECK_INTERVAL": 5,
+    }
+"""
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Django cache used to share definition generations between processes
+    "CACHE_ALIAS": "default",
+    # Seconds between two checks of the shared definition generations (0 checks every lookup)
+    "DEFINITION_CHECK_INTERVAL": 5.0,
+    # Load the workflow definitions when the app starts instead of on first use
+    "WARM_UP_DEFINITIONS": False,
+    # File written by ``manage.py steps_snapshot``, loaded by the warm-up before the database
+    "DEFINITION_SNAPSHOT": None,
+    # Maximum number of parsed CEL conditions kept in memory
+    "CONDITION_CACHE_SIZE": 1024,
+    # Compile CEL conditions to Python functions instead of interpreting their AST
+    "COMPILE_CONDITIONS": True,
+    # Attempts of a queued operation before it is marked as failed
+    "QUEUE_MAX_ATTEMPTS": 5,
+    # Seconds before a failed attempt is retried, multiplied by the number of attempts
+    "QUEUE_RETRY_DELAY": 30.0,
+    # Seconds after which an operation claimed by a worker that died is run again
+    "QUEUE_CLAIM_TIMEOUT": 300.0,
+    # Where deferred advancements run: "thread" (a local thread pool, as soon as the
+    # status update is committed) or "queue" (left to the steps_worker workers)
+    "DEFERRED_ADVANCEMENT_BACKEND": "thread",
+    # Size of the local thread pool running deferred advancements
+    "DEFERRED_ADVANCEMENT_THREADS": 4,
+    # Record every change of step or status as a WorkflowInstanceEvent
+    "RECORD_HISTORY": True,
+    # Cache the state of workflow instances by content object (see state_cache.py)
+    "STATE_CACHE": False,
+    # Seconds the cached instance states are kept (None keeps them until evicted)
+    "STATE_CACHE_TIMEOUT": 300,
+    # Seconds invalidated instance states can't be cached again, which should be longer
+    # than reading a state and committing takes (slower reads don't cache it)
+    "STATE_CACHE_TOMBSTONE_TIMEOUT": 10,
+}
+
+
+def get_setting(name):
+    """
+    Returns the value of a django_steps setting, falling back to its default.
+    """
+    return getattr(settings, "DJANGO_STEPS", {}).get(name, DEFAULTS[name])
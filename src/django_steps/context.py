@@ -0,0 +1,294 @@
+"""
+Per-model providers of the data CEL conditions are evaluated against.
+
+By default the context of a content object is built by DefaultContextProvider,
+which loads only the fields the conditions read (see ``utils``). Projects can
+register their own provider for a model:
+
+    @register_context_provider(Claim)
+    def claim_context(claim):
+        return {"claim": {"amount": claim.amount, "risk": claim.customer.risk_score}}
+
+Inside a WorkflowScope (one per request with ``WorkflowScopeMiddleware``) the
+contexts are memoized, so advancing the same object several times in one request
+builds its context once. While contexts are memoized, saving or deleting any model
+instance outside of django_steps discards them.
+"""
+
+import logging
+from collections.abc import Mapping
+
+from django.contrib.contenttypes.models import ContentType
+
+from .scope import get_current_scope
+from .utils import (
+    extract_context_data_for_paths,
+    extract_context_data_from_content_object,
+    extract_contexts_for_paths,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCOPE_STORE = "contexts"
+
+
+class LazyContext(Mapping):
+    """
+    A context whose top-level values are computed on first access.
+
+    Each value of ``loaders`` is either a plain value or a callable taking no
+    arguments; callables are called at most once, when a condition first reads
+    the name. Nested values should be dictionaries.
+    """
+
+    def __init__(self, loaders=None, **kwargs):
+        self._loaders = dict(loaders or {}, **kwargs)
+        self._values = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        loader = self._loaders[name]
+        value = self._values[name] = loader() if callable(loader) else loader
+        return value
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def __repr__(self):
+        return f"<LazyContext: {', '.join(self._loaders)}>"
+
+
+class ContextProvider:
+    """
+    Builds the CEL context of the content objects of a model.
+
+    Subclasses implement ``get_context(content_object)``. ``load_contexts`` may be
+    overridden to load many objects more efficiently (``select_related``...).
+    """
+
+    # Whether the context only covers the member paths it was loaded for
+    uses_paths = False
+
+    def get_context(self, content_object):
+        """Returns the context dictionary (or mapping) for ``content_object``."""
+        raise NotImplementedError
+
+    def load_context(self, model, pk, paths=frozenset()):
+        """
+        Returns the context of the object ``model``/``pk`` ({} if it doesn't exist).
+        """
+        content_object = model._base_manager.filter(pk=pk).first()
+        if content_object is None:
+            return {}
+        return self.get_context(content_object)
+
+    def load_contexts(self, model, pks, paths=frozenset()):
+        """
+        Returns a dictionary mapping each of ``pks`` to its context.
+        """
+        content_objects = model._base_manager.in_bulk(pks)
+        return {
+            pk: self.get_context(content_objects[pk]) if pk in content_objects else {}
+            for pk in pks
+        }
+
+
+class FunctionContextProvider(ContextProvider):
+    """Wraps a function taking a content object and returning its context."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __repr__(self):
+        return f"<FunctionContextProvider: {self.function.__qualname__}>"
+
+    def get_context(self, content_object):
+        return self.function(content_object)
+
+
+class DefaultContextProvider(ContextProvider):
+    """
+    Loads only the fields read by the conditions, falling back to every field of
+    the content object when they can't be projected.
+    """
+
+    uses_paths = True
+
+    def get_context(self, content_object):
+        return extract_context_data_from_content_object(content_object)
+
+    def load_context(self, model, pk, paths=frozenset()):
+        context = extract_context_data_for_paths(model, pk, paths)
+        if context is None:
+            context = super().load_context(model, pk, paths)
+        return context
+
+    def load_contexts(self, model, pks, paths=frozenset()):
+        contexts = extract_contexts_for_paths(model, pks, paths)
+        if contexts is None:
+            contexts = super().load_contexts(model, pks, paths)
+        return contexts
+
+
+default_context_provider = DefaultContextProvider()
+
+_providers = {}
+
+
+def _resolve_model(model):
+    if isinstance(model, ContentType):
+        return model.model_class()
+    return model
+
+
+def as_context_provider(provider):
+    """
+    Returns ``provider`` as a ContextProvider instance: classes are instantiated and
+    functions taking a content object are wrapped in a FunctionContextProvider.
+    """
+    if isinstance(provider, type) and issubclass(provider, ContextProvider):
+        return provider()
+    if isinstance(provider, ContextProvider):
+        return provider
+    return FunctionContextProvider(provider)
+
+
+def register_context_provider(model, provider=None):
+    """
+    Registers the context provider of a model (or ContentType).
+
+    ``provider`` may be a ContextProvider instance or class, or a function taking a
+    content object and returning its context. Without ``provider``, returns a
+    decorator registering the decorated function or class.
+    """
+    if provider is None:
+
+        def decorator(provider):
+            register_context_provider(model, provider)
+            return provider
+
+        return decorator
+
+    provider = as_context_provider(provider)
+    _providers[_resolve_model(model)] = provider
+    forget_content_contexts()
+    logger.debug(f"Registered context provider {provider!r} for {model}.")
+    return provider
+
+
+def unregister_context_provider(model):
+    """Restores the default context provider of a model (or ContentType)."""
+    _providers.pop(_resolve_model(model), None)
+    forget_content_contexts()
+
+
+def get_context_provider(model):
+    """Returns the context provider registered for a model (or ContentType)."""
+    model = _resolve_model(model)
+    provider = _providers.get(model)
+    if provider is None and model is not None:
+        provider = _providers.get(model._meta.concrete_model)
+    return provider or default_context_provider
+
+
+def _memo_key(model, pk):
+    return (model._meta.label_lower, pk)
+
+
+def _memoized(store, key, paths):
+    entry = store.get(key)
+    if entry is None:
+        return None, paths
+    covered, context = entry
+    if covered is None or paths <= covered:
+        return context, paths
+    # Reload with everything read so far so the new entry still covers the old paths
+    return None, paths | covered
+
+
+def get_content_context(model, pk, paths=frozenset()):
+    """
+    Returns the CEL context of the content object ``model``/``pk``.
+
+    Args:
+        model: The content object's model class (or ContentType).
+        pk: The content object's primary key.
+        paths: Member paths read by the conditions to evaluate
+               (see StepDefinition.context_paths).
+    """
+    model = _resolve_model(model)
+    pk = model._meta.pk.to_python(pk)
+    paths = frozenset(paths)
+    provider = get_context_provider(model)
+
+    scope = get_current_scope()
+    if scope is None:
+        return provider.load_context(model, pk, paths)
+
+    store = scope.store(_SCOPE_STORE)
+    key = _memo_key(model, pk)
+    context, paths = _memoized(store, key, paths)
+    if context is None:
+        context = provider.load_context(model, pk, paths)
+        store[key] = (paths if provider.uses_paths else None, context)
+    return context
+
+
+def get_content_contexts(model, pks, paths=frozenset()):
+    """
+    Batch version of get_content_context, building the contexts of many objects
+    of the same model with a single query.
+
+    Returns:
+        dict: The context of each primary key.
+    """
+    model = _resolve_model(model)
+    pks = [model._meta.pk.to_python(pk) for pk in pks]
+    paths = frozenset(paths)
+    provider = get_context_provider(model)
+
+    scope = get_current_scope()
+    if scope is None:
+        return provider.load_contexts(model, pks, paths)
+
+    store = scope.store(_SCOPE_STORE)
+    contexts = {}
+    missing = []
+    load_paths = paths
+    for pk in pks:
+        context, needed = _memoized(store, _memo_key(model, pk), paths)
+        if context is None:
+            missing.append(pk)
+            load_paths |= needed
+        else:
+            contexts[pk] = context
+
+    if missing:
+        loaded = provider.load_contexts(model, missing, load_paths)
+        covered = load_paths if provider.uses_paths else None
+        for pk, context in loaded.items():
+            store[_memo_key(model, pk)] = (covered, context)
+        contexts.update(loaded)
+    return {pk: contexts[pk] for pk in pks}
+
+
+def has_content_contexts():
+    """Whether contexts are memoized in the current scope."""
+    scope = get_current_scope()
+    return scope is not None and bool(scope.peek(_SCOPE_STORE))
+
+
+def forget_content_contexts():
+    """Discards the contexts memoized in the current scope, if any."""
+    scope = get_current_scope()
+    if scope is not None:
+        scope.clear(_SCOPE_STORE)
@@ -0,0 +1,520 @@
+"""
+Workflows defined in code.
+
+Workflows that only ever change with a deploy can be declared in Python instead of
+being edited in the admin, e.g. in a ``workflows.py`` module of any installed app
+(imported automatically when django_steps starts)::
+
+    from django_steps.declarative import (
+        StatusSpec, StepSpec, TransitionSpec, WorkflowSpec, register_workflow
+    )
+
+    register_workflow(
+        WorkflowSpec(
+            key="claims",
+            name="Claim Processing",
+            steps=[
+                StepSpec(
+                    key="review",
+                    name="Initial Review",
+                    statuses=[
+                        StatusSpec("pending", "Pending", is_default_status=True),
+                        StatusSpec("done", "Review Complete", is_completion_status=True),
+                    ],
+                    transitions=[TransitionSpec(to="payment", condition="!claim.is_high_risk")],
+                ),
+                StepSpec(key="payment", name="Payment", statuses=[...]),
+            ],
+        )
+    )
+
+Instances keep referencing steps and statuses through foreign keys, so each
+code-defined workflow is mirrored by regular definition rows. Rows are matched to the
+declaration by stable keys (falling back to the name for rows without a key, so an
+existing workflow can be moved to code), which lets steps and statuses be renamed or
+reordered without touching the instances at them. The rows are brought in line with
+the code after every ``migrate`` (or by ``manage.py steps_sync``), never while serving
+requests: during a rolling deploy, processes still running the previous code would
+otherwise write their own version back. The first time a process uses the workflow,
+it reads the rows and checks them against the code; from then on, it serves the
+definition from memory without any query and without checking the shared
+generations: it only changes with a deploy.
+
+Steps and statuses removed from the code are deleted, unless instances are still at
+them; they are then kept (without flags) until those instances moved on.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.validators import validate_slug
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import (
+    Workflow,
+    WorkflowInstance,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
+)
+
+logger = logging.getLogger(__name__)
+
+_STATUS_FLAGS = (
+    "is_default_status",
+    "is_completion_status",
+    "is_cancellation_status",
+    "is_on_hold_status",
+)
+
+
+def _check_key(key, what):
+    try:
+        validate_slug(key)
+    except ValidationError:
+        raise ImproperlyConfigured(
+            f"Invalid key {key!r} for {what}: keys must be slugs."
+        )
+
+
+@dataclass
+class StatusSpec:
+    """
+    A status of a code-defined step. Fields mirror WorkflowStepStatus.
+    """
+
+    key: str
+    name: str
+    description: str = ""
+    is_default_status: bool = False
+    is_completion_status: bool = False
+    is_cancellation_status: bool = False
+    is_on_hold_status: bool = False
+
+
+@dataclass
+class TransitionSpec:
+    """
+    An outgoing transition of a code-defined step, to the step with the key ``to``.
+    """
+
+    to: str
+    condition: str = ""
+    priority: int = 0
+    description: str = ""
+
+
+@dataclass
+class StepSpec:
+    """
+    A step of a code-defined workflow. Steps are ordered as declared.
+    """
+
+    key: str
+    name: str
+    statuses: list = field(default_factory=list)
+    transitions: list = field(default_factory=list)
+    description: str = ""
+    is_initial_step: bool = False
+    is_final_step: bool = False
+
+
+@dataclass
+class WorkflowSpec:
+    """
+    A code-defined workflow. Unless flagged otherwise, its first step is the initial
+    step and its last step the final one.
+
+    Raises:
+        ImproperlyConfigured: If the declaration is inconsistent (duplicate keys,
+                              transitions to unknown steps, steps without a default
+                              status...).
+    """
+
+    key: str
+    name: str
+    steps: list
+    description: str = ""
+    deferred_advancement: bool = False
+
+    def __post_init__(self):
+        self.steps = list(self.steps)
+        _check_key(self.key, f"workflow '{self.name}'")
+        if not self.steps:
+            raise ImproperlyConfigured(f"Workflow '{self.name}' has no steps.")
+        step_keys = [step.key for step in self.steps]
+        if len(set(step_keys)) != len(step_keys):
+            raise ImproperlyConfigured(
+                f"Workflow '{self.name}' has duplicate step keys."
+            )
+        for flag in ("is_initial_step", "is_final_step"):
+            if sum(getattr(step, flag) for step in self.steps) > 1:
+                raise ImproperlyConfigured(
+                    f"Workflow '{self.name}' has more than one {flag}."
+                )
+        for step in self.steps:
+            self._check_step(step, step_keys)
+
+    def _check_step(self, step, step_keys):
+        what = f"step '{step.name}' of workflow '{self.name}'"
+        _check_key(step.key, what)
+        step.statuses = list(step.statuses)
+        step.transitions = list(step.transitions)
+        for status in step.statuses:
+            _check_key(status.key, f"status '{status.name}' of {what}")
+        for values in ([s.key for s in step.statuses], [s.name for s in step.statuses]):
+            if len(set(values)) != len(values):
+                raise ImproperlyConfigured(
+                    f"The statuses of {what} have duplicate keys or names."
+                )
+        if sum(status.is_default_status for status in step.statuses) != 1:
+            raise ImproperlyConfigured(f"The {what} needs exactly one default status.")
+        for flag in ("is_cancellation_status", "is_on_hold_status"):
+            if sum(getattr(status, flag) for status in step.statuses) > 1:
+                raise ImproperlyConfigured(f"The {what} has more than one {flag}.")
+        targets = [
+            (transition.to, transition.priority) for transition in step.transitions
+        ]
+        if len(set(targets)) != len(targets):
+            raise ImproperlyConfigured(
+                f"The {what} has several transitions to the same step with the same priority."
+            )
+        for to, _ in targets:
+            if to not in step_keys:
+                raise ImproperlyConfigured(
+                    f"The {what} has a transition to unknown step '{to}'."
+                )
+
+    @property
+    def initial_step(self):
+        return next((s for s in self.steps if s.is_initial_step), self.steps[0])
+
+    @property
+    def final_step(self):
+        return next((s for s in self.steps if s.is_final_step), self.steps[-1])
+
+
+_workflows = {}
+
+
+def register_workflow(spec):
+    """
+    Registers a code-defined workflow. Returns the spec.
+
+    Raises:
+        ImproperlyConfigured: If another workflow with the same key or name is registered.
+    """
+    for registered in _workflows.values():
+        if spec.key != registered.key and spec.name == registered.name:
+            raise ImproperlyConfigured(
+                f"A workflow named '{spec.name}' is already registered."
+            )
+    if spec.key in _workflows and _workflows[spec.key] is not spec:
+        raise ImproperlyConfigured(
+            f"A workflow with key '{spec.key}' is already registered."
+        )
+    _workflows[spec.key] = spec
+    return spec
+
+
+def unregister_workflow(key):
+    """Forgets the code-defined workflow with ``key`` (its rows are left alone)."""
+    _workflows.pop(key, None)
+
+
+def get_workflow_spec(key=None, name=None):
+    """Returns the registered WorkflowSpec with ``key`` (or ``name``), or None."""
+    if name is not None:
+        return next((spec for spec in _workflows.values() if spec.name == name), None)
+    return _workflows.get(key)
+
+
+def get_workflow_specs():
+    return list(_workflows.values())
+
+
+def _save_changed(obj, **values):
+    """Sets ``values`` on a model instance and saves it if it is new or any changed."""
+    changed = obj.pk is None or any(
+        getattr(obj, name) != value for name, value in values.items()
+    )
+    for name, value in values.items():
+        setattr(obj, name, value)
+    if changed:
+        obj.save()
+    return changed
+
+
+def _match(rows, spec):
+    """Returns the row declared by ``spec``: the one with its key, else an unkeyed one with its name."""
+    return next((row for row in rows if row.key == spec.key), None) or next(
+        (row for row in rows if row.key is None and row.name == spec.name), None
+    )
+
+
+def _workflow_values(spec):
+    return {
+        "key": spec.key,
+        "name": spec.name,
+        "description": spec.description,
+        "deferred_advancement": spec.deferred_advancement,
+    }
+
+
+def _step_values(spec):
+    """Returns the declared field values of each step of ``spec``, by key."""
+    initial, final = spec.initial_step, spec.final_step
+    return {
+        step_spec.key: {
+            "key": step_spec.key,
+            "name": step_spec.name,
+            "description": step_spec.description,
+            "order": order,
+            "is_initial_step": step_spec is initial,
+            "is_final_step": step_spec is final,
+        }
+        for order, step_spec in enumerate(spec.steps, 1)
+    }
+
+
+def _status_values(status_spec):
+    return {
+        "key": status_spec.key,
+        "name": status_spec.name,
+        "description": status_spec.description,
+        **{flag: getattr(status_spec, flag) for flag in _STATUS_FLAGS},
+    }
+
+
+def _has_values(obj, values):
+    return all(getattr(obj, name) == value for name, value in values.items())
+
+
+def _is_synced(spec, workflow, steps, statuses, transitions):
+    """Whether the definition rows of a workflow are the ones ``sync_workflow(spec)`` writes."""
+    if not _has_values(workflow, _workflow_values(spec)):
+        return False
+    step_keys = {step.pk: step.key for step in steps}
+    step_rows = {step.key: step for step in steps}
+    for key, values in _step_values(spec).items():
+        if key not in step_rows or not _has_values(step_rows.pop(key), values):
+            return False
+    # Steps and statuses removed from the code are only kept without flags
+    if any(step.is_initial_step or step.is_final_step for step in step_rows.values()):
+        return False
+
+    status_rows = {
+        (step_keys[status.step_id], status.key): status for status in statuses
+    }
+    for step_spec in spec.steps:
+        for status_spec in step_spec.statuses:
+            status = status_rows.pop((step_spec.key, status_spec.key), None)
+            if status is None or not _has_values(status, _status_values(status_spec)):
+                return False
+    if any(
+        getattr(status, flag)
+        for status in status_rows.values()
+        for flag in _STATUS_FLAGS
+    ):
+        return False
+
+    declared = sorted(
+        (step_spec.key, t.to, t.priority, t.condition, t.description)
+        for step_spec in spec.steps
+        for t in step_spec.transitions
+    )
+    return declared == sorted(
+        (
+            step_keys.get(t.from_step_id),
+            step_keys.get(t.to_step_id),
+            t.priority,
+            t.condition,
+            t.description,
+        )
+        for t in transitions
+    )
+
+
+def load_workflow(spec):
+    """
+    Reads the definition rows of a code-defined workflow, without writing anything.
+
+    Returns:
+        tuple: The workflow, and its steps, statuses and transitions (see ``sync_workflow``).
+
+    Raises:
+        ImproperlyConfigured: If the rows are missing or don't match ``spec``, i.e. they
+                              weren't synced since the declaration last changed.
+    """
+    from .definitions import load_definition_rows
+    from .plans import get_plan_rows
+
+    workflow = Workflow.objects.filter(key=spec.key).first()
+    if workflow is not None:
+        rows = get_plan_rows(workflow) or load_definition_rows(workflow)
+        if _is_synced(spec, workflow, *rows):
+            return (workflow, *rows)
+    raise ImproperlyConfigured(
+        f"The definition rows of the code-defined workflow '{spec.name}' are missing or out "
+        "of date: run 'manage.py migrate' or 'manage.py steps_sync'."
+    )
+
+
+def sync_workflow(spec):
+    """
+    Creates, updates or deletes the definition rows of a code-defined workflow so they
+    match ``spec``. Only writes what differs.
+
+    Returns:
+        tuple: The workflow, and its steps, statuses and transitions in definition order
+               (see ``definitions.load_definition_rows``).
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return _sync_workflow(spec)
+        except IntegrityError:
+            # Another process synced the same workflow at the same time
+            if attempt:
+                raise
+
+
+def _sync_workflow(spec):
+    workflow = (
+        Workflow.objects.filter(key=spec.key).first()
+        or Workflow.objects.filter(name=spec.name, key=None).first()
+        or Workflow()
+    )
+    _save_changed(workflow, **_workflow_values(spec))
+
+    rows = list(WorkflowStep.objects.filter(workflow=workflow))
+    status_rows = list(WorkflowStepStatus.objects.filter(step__workflow=workflow))
+    steps = {
+        step_spec.key: _match(rows, step_spec) or WorkflowStep(workflow=workflow)
+        for step_spec in spec.steps
+    }
+    declared = _step_values(spec)
+    kept = [
+        row for row in rows if row not in steps.values() and not _delete_if_unused(row)
+    ]
+
+    # Move the steps changing order (and the ones kept) out of the way of the unique orders
+    moving = [
+        step.pk
+        for key, step in steps.items()
+        if step.pk is not None and step.order != declared[key]["order"]
+    ]
+    moving += [step.pk for step in kept]
+    if moving:
+        offset = max([row.order for row in rows] + [len(spec.steps)])
+        WorkflowStep.objects.filter(pk__in=moving).update(order=F("order") + offset)
+        for step in rows:
+            if step.pk in moving:
+                step.order += offset
+    for step in kept:
+        _save_changed(step, is_initial_step=False, is_final_step=False)
+    for key, step in steps.items():
+        _save_changed(step, **declared[key])
+
+    statuses = []
+    for step_spec in spec.steps:
+        step = steps[step_spec.key]
+        statuses += _sync_statuses(
+            step, step_spec, [s for s in status_rows if s.step_id == step.pk]
+        )
+    for step in kept:
+        statuses += [status for status in status_rows if status.step_id == step.pk]
+
+    transitions = _sync_transitions(workflow, spec, steps)
+
+    step_list = sorted([*steps.values(), *kept], key=lambda step: step.order)
+    orders = {step.pk: step.order for step in step_list}
+    statuses.sort(key=lambda status: (orders[status.step_id], status.name))
+    transitions.sort(key=lambda t: (orders[t.from_step_id], -t.priority, t.pk))
+    return workflow, step_list, statuses, transitions
+
+
+def _sync_statuses(step, step_spec, rows):
+    statuses = []
+    for status_spec in step_spec.statuses:
+        status = _match(rows, status_spec) or WorkflowStepStatus(step=step)
+        statuses.append((status, status_spec))
+    matched = [status for status, _ in statuses]
+    kept = [row for row in rows if row not in matched and not _delete_if_unused(row)]
+
+    # Clear the flags first, so moving one between statuses never trips the constraints
+    for status in kept:
+        WorkflowStepStatus.objects.filter(pk=status.pk).update(
+            **dict.fromkeys(_STATUS_FLAGS, False)
+        )
+        for flag in _STATUS_FLAGS:
+            setattr(status, flag, False)
+    for status, status_spec in statuses:
+        if status.pk is not None:
+            flags = {
+                flag: getattr(status, flag) and getattr(status_spec, flag)
+                for flag in _STATUS_FLAGS
+            }
+            if any(getattr(status, flag) != value for flag, value in flags.items()):
+                WorkflowStepStatus.objects.filter(pk=status.pk).update(**flags)
+                for flag, value in flags.items():
+                    setattr(status, flag, value)
+
+    for status, status_spec in statuses:
+        _save_changed(status, **_status_values(status_spec))
+    return matched + kept
+
+
+def _sync_transitions(workflow, spec, steps):
+    rows = {
+        (t.from_step_id, t.to_step_id, t.priority): t
+        for t in WorkflowTransition.objects.filter(from_step__workflow=workflow)
+    }
+    transitions = []
+    for step_spec in spec.steps:
+        from_step = steps[step_spec.key]
+        for transition_spec in step_spec.transitions:
+            to_step = steps[transition_spec.to]
+            transition = rows.pop(
+                (from_step.pk, to_step.pk, transition_spec.priority), None
+            )
+            transition = transition or WorkflowTransition()
+            _save_changed(
+                transition,
+                workflow_id=workflow.pk,
+                from_step_id=from_step.pk,
+                to_step_id=to_step.pk,
+                priority=transition_spec.priority,
+                condition=transition_spec.condition,
+                description=transition_spec.description,
+            )
+            transitions.append(transition)
+    if rows:
+        WorkflowTransition.objects.filter(pk__in=[t.pk for t in rows.values()]).delete()
+    return transitions
+
+
+def _delete_if_unused(row):
+    """Deletes a step or status removed from the code, unless instances are still at it."""
+    if isinstance(row, WorkflowStep):
+        in_use = WorkflowInstance.objects.filter(current_step=row).exists()
+    else:
+        in_use = WorkflowInstance.objects.filter(current_step_status=row).exists()
+    if in_use:
+        logger.warning(
+            f"Keeping '{row}', removed from its code-defined workflow: instances are at it."
+        )
+        return False
+    row.delete()
+    return True
+
+
+def sync_workflows(**kwargs):
+    """
+    Syncs the rows of every registered workflow. Connected to ``post_migrate``, and run
+    by ``manage.py steps_sync``.
+    """
+    for spec in get_workflow_specs():
+        sync_workflow(spec)
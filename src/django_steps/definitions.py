@@ -0,0 +1,592 @@
+"""
+In-process, read-only snapshots of workflow definitions.
+
+Workflow definitions (workflows, steps, statuses and transitions) change rarely
+compared to how often instances move through them. This module loads each
+definition once per process and keeps it in memory until one of the definition
+models is saved or deleted (see ``signals.py``).
+
+Other processes learn about changes through a per-workflow generation number kept
+in the configured Django cache: every committed change bumps it, and each process
+compares the generations of its cached definitions at most once per
+``DEFINITION_CHECK_INTERVAL`` seconds, reloading only the workflows that changed.
+
+Definitions are built from the plan compiled on the Workflow row (see ``plans.py``),
+so loading one costs a single query. Definitions of code-defined workflows (see
+``declarative.py``) are read from their rows without writing anything, checked
+against their declaration, and stay cached without generation checks.
+"""
+
+import logging
+import threading
+import time
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+from .conf import get_setting
+from .declarative import get_workflow_spec, load_workflow
+from .models import Workflow, WorkflowStep, WorkflowStepStatus, WorkflowTransition
+from .plans import get_plan_rows, store_plan
+
+logger = logging.getLogger(__name__)
+
+
+class StepDefinition:
+    """
+    Snapshot of a single WorkflowStep together with its statuses and outgoing transitions.
+    """
+
+    __slots__ = (
+        "step",
+        "statuses",
+        "statuses_by_id",
+        "default_status",
+        "cancellation_status",
+        "on_hold_status",
+        "transitions",
+        "_context_paths",
+    )
+
+    def __init__(self, step, statuses, transitions):
+        self.step = step
+        self.statuses = MappingProxyType({status.name: status for status in statuses})
+        self.statuses_by_id = MappingProxyType(
+            {status.pk: status for status in statuses}
+        )
+        self.default_status = next((s for s in statuses if s.is_default_status), None)
+        self.cancellation_status = next(
+            (s for s in statuses if s.is_cancellation_status), None
+        )
+        self.on_hold_status = next((s for s in statuses if s.is_on_hold_status), None)
+        # Already sorted by priority, highest first
+        self.transitions = tuple(transitions)
+        self._context_paths = None
+
+    def __repr__(self):
+        return f"<StepDefinition: {self.step.name} (id={self.step.pk})>"
+
+    @property
+    def id(self):
+        return self.step.pk
+
+    @property
+    def is_final_step(self):
+        return self.step.is_final_step
+
+    def get_status(self, name):
+        """Returns the status of this step with the given name, or None."""
+        return self.statuses.get(name)
+
+    @property
+    def default_transition(self):
+        """
+        The transition taken without evaluating any condition: the highest-priority
+        transition when it is unconditional, otherwise None.
+        """
+        if self.transitions and not self.transitions[0].condition:
+            return self.transitions[0]
+        return None
+
+    def select_transition(self, get_context):
+        """
+        Returns the first outgoing transition (by priority) that can be taken, or None.
+
+        Args:
+            get_context (callable): Returns the data conditions are evaluated against.
+                                    Only called once a conditional transition is reached.
+        """
+        from .cel import evaluate_condition
+
+        context = None
+        for transition in self.transitions:
+            if not transition.condition:  # Unconditional transition
+                logger.info(
+                    f"Unconditional transition from '{self.step.name}' to '{transition.to_step.name}' taken."
+                )
+                return transition
+
+            if context is None:
+                context = get_context()
+                logger.debug(f"Context data is: {context}")
+
+            try:
+                # Parse the CEL expression (cached) and evaluate it
+                if evaluate_condition(transition.condition, context):
+                    logger.info(
+                        f"Transition from '{self.step.name}' to '{transition.to_step.name}' taken. "
+                        f"Condition: '{transition.condition}' evaluated to TRUE."
+                    )
+                    return transition  # Take the first matching transition (due to priority ordering)
+                logger.debug(
+                    f"Condition '{transition.condition}' evaluated to FALSE for transition to '{transition.to_step.name}'."
+                )
+            except Exception as e:
+                # Log the error but continue trying other transitions if parsing/evaluation fails
+                logger.error(
+                    f"Error evaluating CEL condition '{transition.condition}' for transition to '{transition.to_step.name}': {e}"
+                )
+        return None
+
+    @property
+    def context_paths(self):
+        """
+        The member paths read by the conditions of the outgoing transitions,
+        i.e. what the CEL context needs to contain to advance from this step.
+        """
+        if self._context_paths is None:
+            from .cel import parse_condition
+
+            paths = set()
+            for transition in self.transitions:
+                if transition.condition:
+                    paths.update(parse_condition(transition.condition).member_paths)
+            self._context_paths = frozenset(paths)
+        return self._context_paths
+
+
+class WorkflowDefinition:
+    """
+    Immutable snapshot of a Workflow and everything needed to run its instances.
+    """
+
+    __slots__ = (
+        "workflow",
+        "steps",
+        "steps_by_id",
+        "statuses_by_id",
+        "initial_step",
+        "final_step",
+    )
+
+    def __init__(self, workflow, steps, statuses, transitions):
+        self.workflow = workflow
+
+        statuses_by_step = {}
+        for status in statuses:
+            statuses_by_step.setdefault(status.step_id, []).append(status)
+        transitions_by_step = {}
+        for transition in transitions:
+            transitions_by_step.setdefault(transition.from_step_id, []).append(
+                transition
+            )
+
+        self.steps = tuple(
+            StepDefinition(
+                step,
+                statuses_by_step.get(step.pk, []),
+                transitions_by_step.get(step.pk, []),
+            )
+            for step in steps
+        )
+        self.steps_by_id = MappingProxyType({s.id: s for s in self.steps})
+        self.statuses_by_id = MappingProxyType(
+            {status.pk: status for status in statuses}
+        )
+        self.initial_step = next(
+            (s for s in self.steps if s.step.is_initial_step), None
+        )
+        self.final_step = next((s for s in self.steps if s.step.is_final_step), None)
+
+    def __repr__(self):
+        return f"<WorkflowDefinition: {self.workflow.name} (id={self.workflow.pk})>"
+
+    @property
+    def id(self):
+        return self.workflow.pk
+
+    @property
+    def name(self):
+        return self.workflow.name
+
+    def get_step(self, step_id):
+        """Returns the StepDefinition for ``step_id``, or None if it is not part of this workflow."""
+        return self.steps_by_id.get(step_id)
+
+    def get_status(self, status_id):
+        """Returns the WorkflowStepStatus for ``status_id``, or None if it is not part of this workflow."""
+        return self.statuses_by_id.get(status_id)
+
+    def contains_step(self, step_id):
+        return step_id in self.steps_by_id
+
+
+def load_workflow_definition(workflow):
+    """
+    Builds a WorkflowDefinition for ``workflow`` from its compiled plan, or from the
+    database if it has no current plan (which is then stored).
+    """
+    rows = get_plan_rows(workflow)
+    if rows is None:
+        rows = load_definition_rows(workflow)
+        store_plan(workflow, rows)
+    return build_workflow_definition(workflow, *rows)
+
+
+def load_definition_rows(workflow):
+    """
+    Returns the steps, statuses and transitions of ``workflow``, in definition order.
+    """
+    steps = list(WorkflowStep.objects.filter(workflow=workflow).order_by("order"))
+    statuses = list(
+        WorkflowStepStatus.objects.filter(step__workflow=workflow).order_by(
+            "step", "name"
+        )
+    )
+    transitions = list(
+        WorkflowTransition.objects.filter(from_step__workflow=workflow).order_by(
+            "from_step", "-priority", "pk"
+        )
+    )
+    return steps, statuses, transitions
+
+
+def build_workflow_definition(workflow, steps, statuses, transitions):
+    """
+    Builds a WorkflowDefinition from the rows returned by ``load_definition_rows``.
+
+    Related objects (``step.workflow``, ``status.step``, ``transition.to_step``...)
+    are wired to the shared snapshot objects so that walking them never hits
+    the database again.
+    """
+    steps_by_id = {step.pk: step for step in steps}
+    for step in steps:
+        step.workflow = workflow
+    for status in statuses:
+        status.step = steps_by_id[status.step_id]
+    for transition in transitions:
+        transition.from_step = steps_by_id[transition.from_step_id]
+        if transition.to_step_id in steps_by_id:
+            transition.to_step = steps_by_id[transition.to_step_id]
+        if transition.workflow_id == workflow.pk:
+            transition.workflow = workflow
+
+    return WorkflowDefinition(workflow, steps, statuses, transitions)
+
+
+def build_step_definition(step):
+    """
+    Builds a standalone StepDefinition for ``step`` from the database.
+
+    Only used as a fallback for steps that are not part of their instance's workflow.
+    """
+    statuses = list(step.possible_statuses.order_by("name"))
+    transitions = list(step.outgoing_transitions.order_by("-priority", "pk"))
+    return StepDefinition(step, statuses, transitions)
+
+
+def _generation_key(workflow_id):
+    return f"django_steps:definition_generation:{workflow_id}"
+
+
+def _get_cache():
+    return caches[get_setting("CACHE_ALIAS")]
+
+
+def get_definition_generations(workflow_ids):
+    """
+    Returns a dict mapping each workflow id to its shared generation (None if unknown).
+    """
+    workflow_ids = list(workflow_ids)
+    if not workflow_ids:
+        return {}
+    try:
+        values = _get_cache().get_many([_generation_key(pk) for pk in workflow_ids])
+    except Exception as e:
+        logger.warning(
+            f"Could not read workflow definition generations from cache: {e}"
+        )
+        return {}
+    return {pk: values.get(_generation_key(pk)) for pk in workflow_ids}
+
+
+def seed_definition_generations(workflow_ids):
+    """
+    Gives a shared generation to the workflows that have none (never changed since the
+    cache was cleared, or evicted), so later changes can be told apart from them.
+
+    Returns:
+        dict: The generation of each workflow id; None where the cache is unavailable.
+    """
+    workflow_ids = list(workflow_ids)
+    generations = get_definition_generations(workflow_ids)
+    missing = [pk for pk in workflow_ids if generations.get(pk) is None]
+    if missing:
+        cache = _get_cache()
+        try:
+            for pk in missing:
+                cache.add(_generation_key(pk), time.time_ns(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Could not seed workflow definition generations: {e}")
+        generations.update(get_definition_generations(missing))
+    return generations
+
+
+def bump_definition_generation(workflow_id):
+    """
+    Bumps the shared generation of a workflow so every process reloads its definition.
+    """
+    cache = _get_cache()
+    key = _generation_key(workflow_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Missing (never set or evicted): seed with a value that can't repeat an older one
+            if not cache.add(key, time.time_ns(), timeout=None):
+                cache.incr(key)
+    except Exception as e:
+        logger.warning(
+            f"Could not bump definition generation of workflow {workflow_id}: {e}"
+        )
+
+
+class DefinitionRegistry:
+    """
+    Thread-safe, per-process cache of WorkflowDefinition snapshots.
+
+    Snapshots are never mutated once built; invalidation simply drops them so
+    that the next lookup loads a fresh one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._definitions = {}
+        self._ids_by_name = {}
+        # Shared generation of each cached definition at the time it was loaded
+        self._generations = {}
+        # Ids of the cached definitions built from code, never checked for changes
+        self._pinned = set()
+        self._last_check = time.monotonic()
+        # Bumped on every invalidation so a load racing with an invalidation is discarded
+        self._epoch = 0
+
+    def get(self, workflow_id):
+        """
+        Returns the WorkflowDefinition for ``workflow_id``.
+
+        Raises:
+            Workflow.DoesNotExist: If no such workflow exists.
+            ImproperlyConfigured: If the rows of a code-defined workflow weren't synced.
+        """
+        self._check_generations()
+        definition = self._definitions.get(workflow_id)
+        if definition is None:
+            definition = self._load(pk=workflow_id)
+        return definition
+
+    def get_by_name(self, name):
+        """
+        Returns the WorkflowDefinition for the workflow called ``name``.
+
+        Raises:
+            Workflow.DoesNotExist: If no such workflow exists.
+            ImproperlyConfigured: If the rows of a code-defined workflow weren't synced.
+        """
+        self._check_generations()
+        workflow_id = self._ids_by_name.get(name)
+        if workflow_id is not None:
+            definition = self._definitions.get(workflow_id)
+            if definition is not None:
+                return definition
+        spec = get_workflow_spec(name=name)
+        if spec is not None:
+            return self._load_code(spec)
+        return self._load(name=name)
+
+    def peek(self, workflow_id=None, name=None):
+        """
+        Returns the cached WorkflowDefinition for ``workflow_id`` (or ``name``) without
+        any I/O, or None if it isn't cached or the generations are due for a check.
+        """
+        if name is not None:
+            workflow_id = self._ids_by_name.get(name)
+        if workflow_id in self._pinned:
+            return self._definitions.get(workflow_id)
+        if time.monotonic() - self._last_check >= get_setting(
+            "DEFINITION_CHECK_INTERVAL"
+        ):
+            return None
+        return self._definitions.get(workflow_id)
+
+    def _load(self, **lookup):
+        epoch = self._epoch
+        workflow = Workflow.objects.get(**lookup)
+        if workflow.is_code_defined:
+            spec = get_workflow_spec(key=workflow.key)
+        else:  # Declared in code since, but not synced yet: fails clearly
+            spec = get_workflow_spec(name=workflow.name)
+        if spec is not None:
+            return self._load_code(spec)
+        # Read the generation before the rows so a concurrent change can't be missed
+        generation = get_definition_generations([workflow.pk]).get(workflow.pk)
+        definition = load_workflow_definition(workflow)
+        with self._lock:
+            if epoch == self._epoch:
+                self._store(definition, generation)
+        logger.debug(f"Loaded definition for workflow '{workflow.name}'.")
+        return definition
+
+    def _load_code(self, spec):
+        epoch = self._epoch
+        # Read-only: rows are only synced by migrate or steps_sync
+        definition = build_workflow_definition(*load_workflow(spec))
+        with self._lock:
+            if epoch == self._epoch:
+                self._store(definition)
+                self._pinned.add(definition.id)
+        logger.debug(f"Loaded definition for code-defined workflow '{spec.name}'.")
+        return definition
+
+    def preload(self, definition, generation=None):
+        """
+        Caches a definition built elsewhere (e.g. from a snapshot file) as loaded at
+        ``generation``, unless a definition of the same workflow is cached already.
+        """
+        with self._lock:
+            if definition.id not in self._definitions:
+                self._store(definition, generation)
+
+    def _store(self, definition, generation=None):
+        with self._lock:
+            self._definitions[definition.id] = definition
+            self._ids_by_name[definition.name] = definition.id
+            self._generations[definition.id] = generation
+
+    def _check_generations(self):
+        interval = get_setting("DEFINITION_CHECK_INTERVAL")
+        if time.monotonic() - self._last_check >= interval:
+            self.sync_generations()
+
+    def sync_generations(self):
+        """
+        Drops every cached definition whose shared generation changed since it was loaded.
+        """
+        self._last_check = time.monotonic()
+        with self._lock:
+            cached = {
+                pk: g for pk, g in self._generations.items() if pk not in self._pinned
+            }
+        current = get_definition_generations(cached)
+        stale = [pk for pk, generation in current.items() if generation != cached[pk]]
+        if stale:
+            with self._lock:
+                self._epoch += 1
+                # Unless reloaded by another thread in the meantime
+                stale = [
+                    pk
+                    for pk in stale
+                    if pk in self._generations and self._generations[pk] == cached[pk]
+                ]
+                for workflow_id in stale:
+                    self._drop(workflow_id)
+            logger.debug(f"Reloading stale definitions of workflows {stale}.")
+        return stale
+
+    def _drop(self, workflow_id):
+        self._generations.pop(workflow_id, None)
+        self._pinned.discard(workflow_id)
+        definition = self._definitions.pop(workflow_id, None)
+        for name, cached_id in list(self._ids_by_name.items()):
+            if cached_id == workflow_id:
+                del self._ids_by_name[name]
+        return definition is not None
+
+    def invalidate(self, workflow_id):
+        """Drops the cached definition of ``workflow_id``, if any."""
+        with self._lock:
+            self._epoch += 1
+            if self._drop(workflow_id):
+                logger.debug(f"Invalidated definition for workflow {workflow_id}.")
+
+    def invalidate_step(self, step_id):
+        """Drops every cached definition containing ``step_id``."""
+        with self._lock:
+            self._epoch += 1
+            for definition in list(self._definitions.values()):
+                if definition.contains_step(step_id):
+                    self._drop(definition.id)
+
+    def clear(self):
+        """Drops all cached definitions."""
+        with self._lock:
+            self._epoch += 1
+            self._definitions.clear()
+            self._ids_by_name.clear()
+            self._generations.clear()
+            self._pinned.clear()
+
+    def cached_ids(self):
+        return list(self._definitions)
+
+    def find_workflow_id_for_step(self, step_id):
+        """Returns the id of the cached workflow containing ``step_id``, or None."""
+        for definition in list(self._definitions.values()):
+            if definition.contains_step(step_id):
+                return definition.id
+        return None
+
+
+registry = DefinitionRegistry()
+
+
+def get_workflow_definition(workflow_id) -> WorkflowDefinition:
+    """
+    Returns the cached WorkflowDefinition for the workflow with the given id.
+
+    Raises:
+        Workflow.DoesNotExist: If no such workflow exists.
+        ImproperlyConfigured: If the rows of a code-defined workflow weren't synced.
+    """
+    return registry.get(workflow_id)
+
+
+def get_workflow_definition_by_name(name: str) -> WorkflowDefinition:
+    """
+    Returns the cached WorkflowDefinition for the workflow with the given name.
+
+    Raises:
+        Workflow.DoesNotExist: If no such workflow exists.
+        ImproperlyConfigured: If the rows of a code-defined workflow weren't synced.
+    """
+    return registry.get_by_name(name)
+
+
+async def aget_workflow_definition(workflow_id) -> WorkflowDefinition:
+    """
+    Async counterpart of ``get_workflow_definition``. Cached definitions are returned
+    straight away; loading one (or checking the generations) runs in a worker thread.
+    """
+    definition = registry.peek(workflow_id=workflow_id)
+    if definition is None:
+        definition = await sync_to_async(registry.get)(workflow_id)
+    return definition
+
+
+async def aget_workflow_definition_by_name(name: str) -> WorkflowDefinition:
+    """
+    Async counterpart of ``get_workflow_definition_by_name``.
+    """
+    definition = registry.peek(name=name)
+    if definition is None:
+        definition = await sync_to_async(registry.get_by_name)(name)
+    return definition
+
+
+def invalidate_workflow_definition(workflow_id):
+    """Drops the cached definition of a workflow so the next lookup reloads it."""
+    registry.invalidate(workflow_id)
+
+
+def clear_workflow_definitions():
+    """Drops every cached workflow definition."""
+    registry.clear()
+
+
+def sync_workflow_definitions():
+    """
+    Compares the cached definitions with the shared generations straight away and
+    drops the stale ones. Returns the ids of the workflows that were dropped.
+    """
+    return registry.sync_generations()
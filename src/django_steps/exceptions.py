@@ -0,0 +1,16 @@
+class WorkflowConflictError(Exception):
+    """
+    Raised when a workflow instance was changed by someone else between the moment
+    it was read and the moment its new state was written.
+
+    The write is not applied. Callers can reload the instance (``refresh_from_db()``)
+    and retry the operation.
+    """
+
+    def __init__(self, instance, expected_version):
+        self.instance = instance
+        self.expected_version = expected_version
+        super().__init__(
+            f"Workflow instance {instance.pk} was modified concurrently "
+            f"(expected version {expected_version})."
+        )
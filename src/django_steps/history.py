@@ -0,0 +1,158 @@
+"""
+Transition history of workflow instances.
+
+Every change of step or status is recorded as a ``WorkflowInstanceEvent``. Events
+are not written with the change itself: they are buffered per transaction (or
+savepoint) and inserted with a single ``bulk_create`` once it commits, so a status
+update that advances the workflow writes its two events with one INSERT, after the
+commit. Events of a rolled back transaction or savepoint are discarded with it.
+
+Set-based updates, which never load the instances they change, record their events
+with a single INSERT … SELECT in their own transaction instead (see
+``record_queryset_events``).
+
+The actor stored with the events is set with ``workflow_actor()``, or by
+``django_steps.middleware.WorkflowScopeMiddleware`` for the current user.
+"""
+
+import contextlib
+import logging
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Value
+
+from .conf import get_setting
+from .transactions import CommitHook, get_commit_hook
+
+logger = logging.getLogger(__name__)
+
+_current_actor = ContextVar("django_steps_actor", default=None)
+
+
+@contextlib.contextmanager
+def workflow_actor(actor):
+    """
+    Records ``actor`` (a user, or any string such as the name of a service) as the
+    author of the workflow changes made in the enclosed block.
+    """
+    token = _current_actor.set(actor)
+    try:
+        yield
+    finally:
+        _current_actor.reset(token)
+
+
+def get_current_actor() -> str:
+    """Returns the name of the current actor, or an empty string."""
+    actor = _current_actor.get()
+    if actor is None:
+        return ""
+    if hasattr(actor, "get_username"):
+        # Users (possibly still lazy, e.g. request.user) are only loaded when needed
+        return actor.get_username() if actor.is_authenticated else ""
+    return str(actor)
+
+
+class _EventBuffer(CommitHook):
+    """
+    Events waiting for the transaction (or savepoint) they were recorded in to commit.
+    """
+
+    def __init__(self, using):
+        super().__init__(using)
+        self.events = []
+
+    def run(self):
+        from .models import WorkflowInstanceEvent
+
+        events, self.events = self.events, []
+        if events:
+            WorkflowInstanceEvent.objects.using(self.using).bulk_create(events)
+            logger.debug(f"Recorded {len(events)} workflow instance events.")
+
+
+def record_events(events, using=None):
+    """
+    Records WorkflowInstanceEvent objects, inserted in bulk once the current
+    transaction commits (or straight away outside of a transaction). Events without
+    an actor are attributed to the current one.
+
+    Does nothing when the ``RECORD_HISTORY`` setting is False.
+    """
+    if not events or not get_setting("RECORD_HISTORY"):
+        return
+    actor = get_current_actor()
+    for event in events:
+        if not event.actor:
+            event.actor = actor
+    if using is None:
+        using = router.db_for_write(type(events[0])) or DEFAULT_DB_ALIAS
+
+    buffer = get_commit_hook(_EventBuffer, using)
+    if buffer is None:
+        buffer = _EventBuffer(using)
+        buffer.events.extend(events)
+        buffer()
+    else:
+        buffer.events.extend(events)
+
+
+async def arecord_events(events, using=None):
+    """
+    Async counterpart of ``record_events``. Runs in the thread holding the database
+    connection, whose transaction the events are buffered in (resolving a lazy
+    ``request.user`` may need the database too).
+    """
+    if events:
+        await sync_to_async(record_events)(events, using)
+
+
+def record_queryset_events(queryset, **values):
+    """
+    Records one WorkflowInstanceEvent per instance of ``queryset`` with a single
+    INSERT … SELECT, in the current transaction. The SELECT takes no lock, which not
+    every backend allows in an INSERT: callers lock the instances first, as
+    ``WorkflowInstanceQuerySet._apply`` does, so they don't change in between.
+
+    Args:
+        queryset: A QuerySet of WorkflowInstance.
+        **values: The value of each event field (``instance``, ``kind``, ``timestamp``...),
+                  a constant or an expression on the instance, e.g.
+                  ``from_status=F("current_step_status")``. The actor defaults to the
+                  current one.
+
+    Returns:
+        int: The number of events recorded; 0 when the ``RECORD_HISTORY`` setting is False.
+    """
+    from .models import WorkflowInstanceEvent
+
+    if not get_setting("RECORD_HISTORY"):
+        return 0
+    values.setdefault("actor", get_current_actor())
+    using = queryset.db
+    connection = connections[using]
+    meta = WorkflowInstanceEvent._meta
+
+    columns = []
+    select = {}
+    for name, value in values.items():
+        field = meta.get_field(name)
+        columns.append(connection.ops.quote_name(field.column))
+        if not hasattr(value, "resolve_expression"):
+            value = Value(value, output_field=field)
+        select[f"event_{name}"] = value
+    select = queryset.order_by().values(**select)
+
+    with transaction.atomic(using=using, savepoint=False):
+        sql, params = select.query.get_compiler(using=using).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {connection.ops.quote_name(meta.db_table)} "
+                f"({', '.join(columns)}) {sql}",
+                params,
+            )
+            count = cursor.rowcount
+    logger.debug(f"Recorded {count} workflow instance events.")
+    return count
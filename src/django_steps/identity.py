@@ -0,0 +1,81 @@
+"""
+Request-scoped identity map of workflow instances.
+
+Inside a WorkflowScope (one per request with ``WorkflowScopeMiddleware``, or opened
+with ``workflow_scope()``), ``get_workflow_instance_for_object`` returns the same
+WorkflowInstance object every time it is asked for the instance of the same object,
+and queries the database only the first time. Mapped instances are hydrated from the
+cached workflow definition (workflow, current step and current step status) and hold
+their content type and content object, so reading them, printing them and the log
+lines of their methods don't cost any query either.
+
+The map is discarded with the scope. It is emptied when instances are created or
+deleted, by bulk operations and when another copy of a mapped instance is saved,
+all of which would leave the mapped objects stale.
+"""
+
+from .scope import get_current_scope
+
+_SCOPE_STORE = "instances"
+
+# Returned by get_mapped_instance for objects that weren't looked up yet
+NOT_MAPPED = object()
+
+
+def _object_key(content_type_id, object_id, workflow_name):
+    return (content_type_id, str(object_id), workflow_name or None)
+
+
+def get_mapped_instance(content_type_id, object_id, workflow_name=None):
+    """
+    Returns the instance mapped for an object (None if it has none), or NOT_MAPPED
+    outside of a scope or if the object wasn't looked up in this scope yet.
+    """
+    scope = get_current_scope()
+    if scope is None:
+        return NOT_MAPPED
+    store = scope.store(_SCOPE_STORE)
+    return store.get(_object_key(content_type_id, object_id, workflow_name), NOT_MAPPED)
+
+
+def map_instance(content_type_id, object_id, workflow_name, instance):
+    """
+    Maps ``instance`` (or None, for an object without an instance) as the instance of
+    an object, for lookups with ``workflow_name`` (or without a workflow if None).
+
+    Returns:
+        WorkflowInstance | None: The object to use for the instance: the one mapped
+                                 before if the instance was already looked up, so
+                                 there is a single object per instance in the scope.
+    """
+    scope = get_current_scope()
+    if scope is None:
+        return instance
+    store = scope.store(_SCOPE_STORE)
+    if instance is not None:
+        instance = store.setdefault(instance.pk, instance)
+    store[_object_key(content_type_id, object_id, workflow_name)] = instance
+    return instance
+
+
+def forget_instances():
+    """Empties the identity map of the current scope, if any."""
+    scope = get_current_scope()
+    if scope is not None:
+        scope.clear(_SCOPE_STORE)
+
+
+def instance_saved(instance, created=False):
+    """
+    Empties the identity map when an instance is created (objects mapped as having
+    none may have one now) or when another copy of a mapped instance is saved.
+    """
+    scope = get_current_scope()
+    if scope is None:
+        return
+    if created:
+        scope.clear(_SCOPE_STORE)
+        return
+    mapped = scope.store(_SCOPE_STORE).get(instance.pk)
+    if mapped is not None and mapped is not instance:
+        scope.clear(_SCOPE_STORE)
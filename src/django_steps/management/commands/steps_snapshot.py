@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from django_steps.conf import get_setting
+from django_steps.snapshot import write_definition_snapshot
+
+
+class Command(BaseCommand):
+    help = "Writes every workflow definition to a snapshot file loaded by processes at start-up"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            help="File to write (defaults to the DEFINITION_SNAPSHOT setting)",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or get_setting("DEFINITION_SNAPSHOT")
+        if not path:
+            raise CommandError(
+                "Give a path or set DJANGO_STEPS['DEFINITION_SNAPSHOT']."
+            )
+        written = write_definition_snapshot(path)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} workflow definitions to {path}.")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from django_steps.declarative import get_workflow_specs, sync_workflows
+
+
+class Command(BaseCommand):
+    help = (
+        "Brings the definition rows of the code-defined workflows in line with the code"
+    )
+
+    def handle(self, *args, **options):
+        sync_workflows()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced {len(get_workflow_specs())} code-defined workflows."
+            )
+        )
@@ -0,0 +1,115 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from django_steps.queue import run_worker
+
+
+def _run_worker_process(stop_event, options):
+    # The parent process handles Ctrl+C and tells the workers to stop through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(stop_event, **options)
+
+
+class Command(BaseCommand):
+    help = "Runs workers draining the queue of pending workflow operations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of workers to run (threads, or processes with --processes)",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Run the workers in separate processes instead of threads",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Number of operations each worker claims at once",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+        worker_options = {
+            "batch_size": options["batch_size"],
+            "poll_interval": options["poll_interval"],
+            "once": options["once"],
+        }
+
+        if options["processes"]:
+            if "fork" not in multiprocessing.get_all_start_methods():
+                raise CommandError("--processes is not supported on this platform.")
+            stop_event = multiprocessing.get_context("fork").Event()
+        else:
+            stop_event = threading.Event()
+        previous_handlers = self._handle_signals(stop_event)
+        try:
+            self._run(workers, options["processes"], stop_event, worker_options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def _run(self, workers, processes, stop_event, worker_options):
+        self.stdout.write(f"Starting {workers} workflow worker(s)...")
+        if workers == 1 and not processes:
+            processed = run_worker(stop_event, **worker_options)
+            self.stdout.write(
+                self.style.SUCCESS(f"Processed {processed} workflow operations.")
+            )
+            return
+
+        if processes:
+            # Forked processes must not share the parent's database connections
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            runners = [
+                context.Process(
+                    target=_run_worker_process, args=(stop_event, worker_options)
+                )
+                for _ in range(workers)
+            ]
+        else:
+            runners = [
+                threading.Thread(
+                    target=run_worker, args=(stop_event,), kwargs=worker_options
+                )
+                for _ in range(workers)
+            ]
+
+        for runner in runners:
+            runner.start()
+        for runner in runners:
+            runner.join()
+        self.stdout.write(self.style.SUCCESS("Workflow workers stopped."))
+
+    def _handle_signals(self, stop_event):
+        def stop(signum, frame):
+            self.stdout.write("Stopping workflow workers after their current batch...")
+            stop_event.set()
+
+        previous_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                previous_handlers[signum] = signal.signal(signum, stop)
+        return previous_handlers
@@ -0,0 +1,131 @@
+"""
+QuerySet and manager for content models, i.e. the models workflows are run for.
+
+.. code-block:: python
+
+    from django_steps.managers import WorkflowManager
+
+    class Claim(models.Model):
+        ...
+        objects = WorkflowManager()
+
+Models with a custom QuerySet can mix ``WorkflowQuerySetMixin`` in instead.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.query import ModelIterable
+
+
+class WorkflowQuerySetMixin:
+    """
+    Adds workflow helpers to the QuerySet of a content model.
+    """
+
+    _workflow_prefetches = ()
+
+    def prefetch_workflow_instances(self, workflow_name: str | None = None):
+        """
+        Loads the workflow instances of the objects along with them, with one more
+        query per evaluation (see ``services.prefetch_workflow_instances``), so that
+        ``get_workflow_instance_for_object`` costs no query for any of them.
+
+        Args:
+            workflow_name (str, optional): Only prefetch the instances of this workflow.
+        """
+        clone = self._chain()
+        if workflow_name not in clone._workflow_prefetches:
+            clone._workflow_prefetches = (*clone._workflow_prefetches, workflow_name)
+        return clone
+
+    def _workflow_instances(self, workflow_name):
+        """
+        Returns the WorkflowDefinition of ``workflow_name`` and a queryset of its
+        instances for the outer object, to be used in subqueries.
+        """
+        from .definitions import get_workflow_definition_by_name
+        from .models import WorkflowInstance, object_id_field_name
+
+        definition = get_workflow_definition_by_name(workflow_name)
+        instances = WorkflowInstance.objects.filter(
+            workflow_id=definition.id,
+            content_type=ContentType.objects.get_for_model(self.model),
+            # The object id field of the same type as the primary key: no cast
+            **{object_id_field_name(self.model): OuterRef("pk")},
+        ).order_by()  # At most one instance per object and workflow
+        return definition, instances
+
+    def with_workflow_state(self, workflow_name: str):
+        """
+        Annotates the objects with the state of their instance of ``workflow_name``,
+        using correlated subqueries, so they can be filtered and ordered by it in SQL:
+
+        - ``workflow_step``: the name of the current step
+        - ``workflow_status``: the name of the current step status
+        - ``workflow_state``: the lifecycle state (see ``WorkflowInstance.State``)
+        - ``workflow_entered_step_at``: when the instance entered its current step
+
+        All of them are None for objects without an instance.
+
+        Raises:
+            Workflow.DoesNotExist: If there is no workflow called ``workflow_name``.
+        """
+        _, instances = self._workflow_instances(workflow_name)
+        return self.annotate(
+            workflow_step=Subquery(instances.values("current_step__name")[:1]),
+            workflow_status=Subquery(instances.values("current_step_status__name")[:1]),
+            workflow_state=Subquery(instances.values("state")[:1]),
+            workflow_entered_step_at=Subquery(instances.values("entered_step_at")[:1]),
+        )
+
+    def filter_by_workflow_step(
+        self, workflow_name: str, step_name: str, status_name: str | None = None
+    ):
+        """
+        Keeps the objects whose instance of ``workflow_name`` is at the step called
+        ``step_name`` (and, if given, has the status called ``status_name``).
+
+        Step and status names are resolved to ids from the cached workflow definition,
+        so the filter is a single ``EXISTS`` subquery without joins.
+
+        Raises:
+            Workflow.DoesNotExist: If there is no workflow called ``workflow_name``.
+        """
+        definition, instances = self._workflow_instances(workflow_name)
+        steps = [step for step in definition.steps if step.step.name == step_name]
+        instances = instances.filter(current_step_id__in=[step.id for step in steps])
+        if status_name is not None:
+            statuses = [step.get_status(status_name) for step in steps]
+            instances = instances.filter(
+                current_step_status_id__in=[status.pk for status in statuses if status]
+            )
+        return self.filter(Exists(instances))
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._workflow_prefetches = self._workflow_prefetches
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if (
+            fetched
+            or not self._workflow_prefetches
+            or not issubclass(self._iterable_class, ModelIterable)
+        ):
+            return
+
+        from .services import prefetch_workflow_instances
+
+        for workflow_name in self._workflow_prefetches:
+            prefetch_workflow_instances(self._result_cache, workflow_name)
+
+
+class WorkflowQuerySet(WorkflowQuerySetMixin, models.QuerySet):
+    pass
+
+
+class WorkflowManager(models.Manager.from_queryset(WorkflowQuerySet)):
+    pass
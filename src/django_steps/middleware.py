@@ -0,0 +1,31 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .history import workflow_actor
+from .scope import workflow_scope
+
+
+class WorkflowScopeMiddleware:
+    """
+    Opens a django_steps memoization scope around every request, so that
+    workflow data loaded while handling the request is reused until it ends,
+    and records the request's user as the actor of its workflow changes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with workflow_scope(), workflow_actor(getattr(request, "user", None)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with workflow_scope(), workflow_actor(getattr(request, "user", None)):
+            return await self.get_response(request)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflowinstance",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Incremented on every state change; used to detect concurrent updates.",
+            ),
+        ),
+    ]
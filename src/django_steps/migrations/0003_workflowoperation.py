@@ -0,0 +1,119 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0002_workflowinstance_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkflowOperation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("advance", "Advance"),
+                            ("update_status", "Update status"),
+                            ("cancel", "Cancel"),
+                            ("set_on_hold", "Set on hold"),
+                            ("resume", "Resume"),
+                        ],
+                        help_text="The operation to run on the workflow instance.",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status_name",
+                    models.CharField(
+                        blank=True,
+                        help_text="The new status name, for status updates.",
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "context_data",
+                    models.JSONField(
+                        blank=True,
+                        help_text="Data to provide to CEL expressions when the operation advances the workflow.",
+                        null=True,
+                    ),
+                ),
+                (
+                    "priority",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Operations with a higher priority are run first.",
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                (
+                    "available_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="The operation is not run before this time (used to retry failed attempts later).",
+                    ),
+                ),
+                (
+                    "claimed_by",
+                    models.CharField(
+                        blank=True,
+                        help_text="Token of the worker batch running the operation.",
+                        max_length=64,
+                    ),
+                ),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        help_text="The workflow instance this operation applies to.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="operations",
+                        to="django_steps.workflowinstance",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Workflow Operation",
+                "verbose_name_plural": "Workflow Operations",
+                "ordering": ["-priority", "available_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["state", "-priority", "available_at", "id"],
+                        name="django_steps_op_queue_idx",
+                    )
+                ],
+            },
+        ),
+    ]
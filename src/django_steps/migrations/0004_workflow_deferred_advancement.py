@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-17 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0003_workflowoperation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflow",
+            name="deferred_advancement",
+            field=models.BooleanField(
+                default=False,
+                help_text="Advance instances of this workflow in the background after the status update is committed, instead of during the status update.",
+            ),
+        ),
+    ]
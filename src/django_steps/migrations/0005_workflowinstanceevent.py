@@ -0,0 +1,147 @@
+# Generated by Django 5.2.3 on 2026-10-17 11:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0004_workflow_deferred_advancement"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WorkflowInstanceEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("started", "Started"),
+                            ("status_changed", "Status changed"),
+                            ("advanced", "Advanced"),
+                            ("completed", "Completed"),
+                            ("cancelled", "Cancelled"),
+                            ("on_hold", "Put on hold"),
+                            ("resumed", "Resumed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "actor",
+                    models.CharField(
+                        blank=True,
+                        help_text="Who made the change (see django_steps.history.workflow_actor).",
+                        max_length=150,
+                    ),
+                ),
+                ("timestamp", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "from_status",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="django_steps.workflowstepstatus",
+                    ),
+                ),
+                (
+                    "from_step",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="django_steps.workflowstep",
+                    ),
+                ),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="django_steps.workflowinstance",
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="django_steps.workflowstepstatus",
+                    ),
+                ),
+                (
+                    "to_step",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="django_steps.workflowstep",
+                    ),
+                ),
+                (
+                    "transition",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        db_index=False,
+                        help_text="The transition taken, for advancements.",
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="django_steps.workflowtransition",
+                    ),
+                ),
+                (
+                    "workflow",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="django_steps.workflow",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Workflow Instance Event",
+                "verbose_name_plural": "Workflow Instance Events",
+                "ordering": ["timestamp", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["instance", "timestamp"],
+                        name="django_steps_event_inst_idx",
+                    ),
+                    models.Index(
+                        fields=["workflow", "timestamp"],
+                        name="django_steps_event_wf_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
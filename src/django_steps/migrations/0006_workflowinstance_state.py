@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_state(apps, schema_editor):
+    """
+    Derives the state of the existing instances with a few set-based UPDATEs. The time
+    the instances entered their current step is unknown; their start time is used.
+    """
+    WorkflowInstance = apps.get_model("django_steps", "WorkflowInstance")
+    instances = WorkflowInstance.objects.using(schema_editor.connection.alias)
+
+    finished = Q(
+        current_step__is_final_step=True, current_step_status__is_completion_status=True
+    )
+    # Same precedence as WorkflowInstance._state_for, the later updates winning
+    started = instances.filter(current_step__isnull=False)
+    started.update(state="active", entered_step_at=F("started_at"))
+    started.filter(current_step_status__is_on_hold_status=True).update(state="on_hold")
+    started.filter(finished).update(state="completed")
+    started.filter(finished, current_step_status__is_cancellation_status=True).update(
+        state="cancelled"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("django_steps", "0005_workflowinstanceevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflowinstance",
+            name="entered_step_at",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="Timestamp when this workflow instance entered its current step.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workflowinstance",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("active", "Active"),
+                    ("on_hold", "On hold"),
+                    ("completed", "Completed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="pending",
+                editable=False,
+                help_text="The lifecycle state, derived from the current step and status.",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(backfill_state, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                fields=["workflow", "state", "current_step"],
+                name="django_steps_inst_state_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                condition=models.Q(("state", "active")),
+                fields=["workflow", "current_step", "entered_step_at"],
+                name="django_steps_inst_active_idx",
+            ),
+        ),
+    ]
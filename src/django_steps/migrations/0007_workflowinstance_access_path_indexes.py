@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("django_steps", "0006_workflowinstance_state"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                fields=["content_type", "object_id", "-started_at"],
+                name="django_steps_inst_object_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                fields=["current_step", "current_step_status", "-started_at"],
+                name="django_steps_inst_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                fields=["workflow", "started_at"], name="django_steps_inst_started_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.3 on 2026-10-17 11:20
+
+from django.apps import apps as global_apps
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_object_id_int(apps, schema_editor):
+    """
+    Copies the ids of the existing instances to ``object_id_int`` for the models with
+    integer primary keys, the only ones the former integer ``object_id`` could link.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    WorkflowInstance = apps.get_model("django_steps", "WorkflowInstance")
+    instances = WorkflowInstance.objects.using(schema_editor.connection.alias)
+
+    content_type_ids = instances.values_list("content_type_id", flat=True).distinct()
+    for content_type in ContentType.objects.using(
+        schema_editor.connection.alias
+    ).filter(pk__in=list(content_type_ids)):
+        # The current models: the primary key types aren't part of this app's history
+        try:
+            pk_field = global_apps.get_model(
+                content_type.app_label, content_type.model
+            )._meta.pk
+        except LookupError:
+            continue
+        while pk_field.is_relation:
+            pk_field = pk_field.target_field
+        if isinstance(pk_field, models.IntegerField):
+            instances.filter(content_type_id=content_type.pk).update(
+                object_id_int=F("object_id")
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("django_steps", "0007_workflowinstance_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflowinstance",
+            name="object_id_int",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="workflowinstance",
+            name="object_id_uuid",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_object_id_int, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="workflowinstance",
+            name="object_id",
+            field=models.CharField(
+                help_text="The ID of the object this workflow instance is associated with (e.g., a Claim ID).",
+                max_length=255,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                condition=models.Q(("object_id_int__isnull", False)),
+                fields=["content_type", "object_id_int", "-started_at"],
+                name="django_steps_inst_int_obj_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workflowinstance",
+            index=models.Index(
+                condition=models.Q(("object_id_uuid__isnull", False)),
+                fields=["content_type", "object_id_uuid", "-started_at"],
+                name="django_steps_inst_uuid_obj_idx",
+            ),
+        ),
+    ]
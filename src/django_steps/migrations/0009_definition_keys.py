@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0008_typed_object_ids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflow",
+            name="key",
+            field=models.SlugField(
+                blank=True,
+                editable=False,
+                help_text="The key of the workflow in the code defining it, if any.",
+                max_length=100,
+                null=True,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workflowstep",
+            name="key",
+            field=models.SlugField(
+                blank=True,
+                editable=False,
+                help_text="The key of the step in the code defining its workflow, if any.",
+                max_length=100,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="workflowstepstatus",
+            name="key",
+            field=models.SlugField(
+                blank=True,
+                editable=False,
+                help_text="The key of the status in the code defining its workflow, if any.",
+                max_length=100,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="workflowstep",
+            constraint=models.UniqueConstraint(
+                fields=("workflow", "key"), name="unique_step_key_per_workflow"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="workflowstepstatus",
+            constraint=models.UniqueConstraint(
+                fields=("step", "key"), name="unique_status_key_per_step"
+            ),
+        ),
+    ]
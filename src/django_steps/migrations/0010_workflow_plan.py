@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_steps", "0009_definition_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workflow",
+            name="plan",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="The compiled definition of the workflow, and the errors found compiling it.",
+                null=True,
+            ),
+        ),
+    ]
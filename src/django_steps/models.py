@@ -1,12 +1,17 @@
+import functools
 import logging
 
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.db.models.query import ModelIterable
 from django.utils import timezone
 from django.core.exceptions import ImproperlyConfigured
 
-from .utils import extract_context_data_from_content_object
+from .context import get_content_context
+from .exceptions import WorkflowConflictError
+from .results import BulkCounts
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +30,29 @@ class Workflow(models.Model):
     description = models.TextField(
         blank=True, help_text="A brief description of what this workflow entails."
     )
+    deferred_advancement = models.BooleanField(
+        default=False,
+        help_text=(
+            "Advance instances of this workflow in the background after the status "
+            "update is committed, instead of during the status update."
+        ),
+    )
+    # Stable key of code-defined workflows (see declarative.py), None for the others
+    key = models.SlugField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The key of the workflow in the code defining it, if any.",
+    )
+    # Compiled from the steps, statuses and transitions whenever they change (see plans.py)
+    plan = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The compiled definition of the workflow, and the errors found compiling it.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -36,6 +64,10 @@ class Workflow(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def is_code_defined(self):
+        return self.key is not None
+
 
 class WorkflowStep(models.Model):
     """
@@ -69,6 +101,14 @@ class WorkflowStep(models.Model):
         help_text="Designates if this is the last step of the workflow. "
         "Once an instance reaches this step, it can be marked as complete.",
     )
+    # Stable key of the steps of code-defined workflows, None for the others
+    key = models.SlugField(
+        max_length=100,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The key of the step in the code defining its workflow, if any.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -78,6 +118,12 @@ class WorkflowStep(models.Model):
         # Ensure unique order per workflow and order steps correctly
         unique_together = (("workflow", "order"),)
         ordering = ["workflow", "order"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["workflow", "key"],
+                name="unique_step_key_per_workflow",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.workflow.name}: {self.name} (Order: {self.order})"
@@ -122,15 +168,21 @@ class WorkflowStepStatus(models.Model):
         help_text="If checked, this status represents an 'on hold' state for the workflow instance. "
         "There should be only one on-hold status per step.",
     )
+    # Stable key of the statuses of code-defined workflows, None for the others
+    key = models.SlugField(
+        max_length=100,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="The key of the status in the code defining its workflow, if any.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Workflow Step Status"
         verbose_name_plural = "Workflow Step Statuses"
-        unique_together = (
-            ("step", "name"),
-        )
+        unique_together = (("step", "name"),)
         ordering = ["step", "name"]
 
         constraints = [
@@ -138,19 +190,23 @@ class WorkflowStepStatus(models.Model):
             models.UniqueConstraint(
                 fields=["step"],
                 condition=models.Q(is_default_status=True),
-                name="unique_default_status_per_step"
+                name="unique_default_status_per_step",
             ),
             # Ensure only one cancellation status per step
             models.UniqueConstraint(
                 fields=["step"],
                 condition=models.Q(is_cancellation_status=True),
-                name="unique_cancellation_status_per_step"
+                name="unique_cancellation_status_per_step",
             ),
             # Ensure only one on-hold status per step
             models.UniqueConstraint(
                 fields=["step"],
                 condition=models.Q(is_on_hold_status=True),
-                name="unique_on_hold_status_per_step"
+                name="unique_on_hold_status_per_step",
+            ),
+            models.UniqueConstraint(
+                fields=["step", "key"],
+                name="unique_status_key_per_step",
             ),
         ]
 
@@ -212,6 +268,429 @@ class WorkflowTransition(models.Model):
         return f"Transition from '{self.from_step.name}' to '{self.to_step.name}' ({self.workflow.name})"
 
 
+def get_default_status(definition, step):
+    """
+    Returns the default status of ``step``, preferably from the workflow ``definition``.
+
+    Raises:
+        ImproperlyConfigured: If the step has no default status.
+    """
+    step_definition = definition.get_step(step.pk)
+    if step_definition is not None:
+        default_status = step_definition.default_status
+    else:
+        default_status = step.possible_statuses.filter(is_default_status=True).first()
+    if not default_status:
+        error_msg = f"Next step '{step.name}' has no default status defined. Please define one default status for each step."
+        logger.error(error_msg)
+        raise ImproperlyConfigured(error_msg)
+    return default_status
+
+
+@functools.cache
+def object_id_field_name(model):
+    """
+    Returns the WorkflowInstance field that stores the ids of ``model``'s objects
+    in their own type: ``object_id_int`` for integer primary keys, ``object_id_uuid``
+    for UUIDs and the ``object_id`` string for any other primary key (or when the
+    model no longer exists).
+    """
+    if model is None:
+        return "object_id"
+    pk_field = model._meta.pk
+    while pk_field.is_relation:  # Multi-table inheritance: a link to the parent
+        pk_field = pk_field.target_field
+    if isinstance(pk_field, models.UUIDField):
+        return "object_id_uuid"
+    if isinstance(pk_field, models.IntegerField):
+        return "object_id_int"
+    return "object_id"
+
+
+def get_object_id_values(model, pk):
+    """
+    Returns the values of the object id fields of a WorkflowInstance for the
+    object of ``model`` whose primary key is ``pk``.
+    """
+    values = {"object_id": str(pk), "object_id_int": None, "object_id_uuid": None}
+    field_name = object_id_field_name(model)
+    if field_name != "object_id":
+        typed_pk = model._meta.pk.to_python(pk)
+        values[field_name] = typed_pk
+        values["object_id"] = str(typed_pk)
+    return values
+
+
+class WorkflowInstanceIterable(ModelIterable):
+    """
+    Yields WorkflowInstance objects whose ``workflow``, ``current_step`` and
+    ``current_step_status`` are taken from the cached workflow definitions, keyed by
+    the ids on each row, instead of being loaded with a query each on first access.
+    The step and status objects are shared by all the instances of a definition.
+
+    Relations loaded with ``select_related()``, instances whose foreign keys are
+    deferred, steps or statuses missing from the definition and workflows whose
+    definition can't be loaded are left as they are.
+    """
+
+    _hydrated_fields = frozenset(
+        ("workflow_id", "current_step_id", "current_step_status_id")
+    )
+
+    def __iter__(self):
+        from .definitions import get_workflow_definition
+
+        model = self.queryset.model
+        definitions = {}
+        for instance in super().__iter__():
+            if not self._hydrated_fields.isdisjoint(instance.get_deferred_fields()):
+                yield instance
+                continue
+
+            workflow_id = instance.workflow_id
+            if workflow_id not in definitions:
+                try:
+                    definitions[workflow_id] = get_workflow_definition(workflow_id)
+                except (Workflow.DoesNotExist, ImproperlyConfigured):
+                    # E.g. a code-defined workflow whose rows weren't synced yet
+                    definitions[workflow_id] = None
+            definition = definitions[workflow_id]
+            if definition is not None:
+                if not model.workflow.is_cached(instance):
+                    model.workflow.field.set_cached_value(instance, definition.workflow)
+                step_definition = definition.get_step(instance.current_step_id)
+                if step_definition is not None and not model.current_step.is_cached(
+                    instance
+                ):
+                    model.current_step.field.set_cached_value(
+                        instance, step_definition.step
+                    )
+                step_status = definition.get_status(instance.current_step_status_id)
+                if step_status is not None and not model.current_step_status.is_cached(
+                    instance
+                ):
+                    model.current_step_status.field.set_cached_value(
+                        instance, step_status
+                    )
+            yield instance
+
+
+class WorkflowInstanceQuerySet(models.QuerySet):
+    """
+    QuerySet of workflow instances with set-based lifecycle operations.
+
+    ``bulk_cancel``, ``bulk_set_on_hold`` and ``bulk_resume`` behave like the
+    instance methods of the same purpose, but resolve the target status once per
+    step and issue a single UPDATE per step (per thousand instances) instead of
+    saving each instance.
+
+    Instances are yielded by ``WorkflowInstanceIterable``, so reading their
+    workflow, current step and current step status costs no query.
+    """
+
+    # Instances updated by a single statement of the lifecycle operations
+    _BATCH_SIZE = 1000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._iterable_class = WorkflowInstanceIterable
+
+    def for_object(self, content_type, object_id):
+        """
+        Keeps the instances of the object of ``content_type`` whose primary key is
+        ``object_id``, comparing it with the typed object id field of its model so
+        the lookup is served by an index without casts.
+        """
+        field_name = object_id_field_name(content_type.model_class())
+        if field_name == "object_id":
+            object_id = str(object_id)
+        return self.filter(content_type=content_type, **{field_name: object_id})
+
+    def for_objects(self, content_type, object_ids):
+        """
+        Keeps the instances of the objects of ``content_type`` whose primary keys
+        are in ``object_ids`` (see ``for_object``).
+        """
+        field_name = object_id_field_name(content_type.model_class())
+        if field_name == "object_id":
+            object_ids = [str(object_id) for object_id in object_ids]
+        return self.filter(
+            content_type=content_type, **{f"{field_name}__in": object_ids}
+        )
+
+    def _steps(self):
+        """
+        Yields (WorkflowDefinition, step id, StepDefinition or None, {status id: count})
+        for every step the instances of this queryset are at, using one aggregate query.
+        """
+        from .definitions import get_workflow_definition
+
+        rows = (
+            self.order_by()
+            .values("workflow_id", "current_step_id", "current_step_status_id")
+            .annotate(count=models.Count("pk"))
+        )
+        steps = {}
+        for row in rows:
+            key = (row["workflow_id"], row["current_step_id"])
+            steps.setdefault(key, {})[row["current_step_status_id"]] = row["count"]
+
+        for (workflow_id, step_id), status_counts in steps.items():
+            definition = get_workflow_definition(workflow_id)
+            step_definition = (
+                definition.get_step(step_id) if step_id is not None else None
+            )
+            if step_definition is None:
+                logger.error(
+                    f"{sum(status_counts.values())} instances of workflow '{definition.name}' "
+                    f"have no current step in the workflow."
+                )
+            yield definition, step_id, step_definition, status_counts
+
+    @staticmethod
+    def _split(definition, status_counts, keep):
+        """
+        Returns the ids of the statuses whose instances are kept as they are
+        (``keep(status)`` is true) and the number of such instances.
+        """
+        kept = set()
+        for status_id in status_counts:
+            status = definition.get_status(status_id) if status_id is not None else None
+            if keep(status):
+                kept.add(status_id)
+        return kept, sum(status_counts[status_id] for status_id in kept)
+
+    def _update_step(
+        self, event_kind, definition, step_id, kept_status_ids=(), **fields
+    ):
+        queryset = self.filter(workflow_id=definition.id, current_step_id=step_id)
+        kept_status_ids = [
+            status_id for status_id in kept_status_ids if status_id is not None
+        ]
+        if kept_status_ids:
+            queryset = queryset.exclude(current_step_status_id__in=kept_status_ids)
+        return self._apply(queryset, event_kind, definition.id, step_id, **fields)
+
+    def _apply(self, queryset, event_kind, workflow_id, step_id, **fields):
+        """
+        Updates the instances of ``queryset`` (all at ``step_id`` of the workflow
+        ``workflow_id``) with ``fields``, records a history event for each of them
+        with an INSERT … SELECT and invalidates their cached state. The instances are
+        locked and their ids read first, so the events and the UPDATE cover exactly
+        them, ``_BATCH_SIZE`` at a time, even if others start matching ``queryset``
+        meanwhile. The mapped instances of the request, if any, are forgotten (see
+        ``identity.py``).
+        """
+        from .history import record_queryset_events
+        from .identity import forget_instances
+        from .state_cache import invalidate_instances
+
+        forget_instances()
+        instance_ids = list(
+            queryset.order_by().select_for_update().values_list("pk", flat=True)
+        )
+        if not instance_ids:
+            return 0
+
+        base_manager = self.model._base_manager.using(self.db)
+        now = timezone.now()
+        updated = 0
+        for start in range(0, len(instance_ids), self._BATCH_SIZE):
+            batch = base_manager.filter(
+                pk__in=instance_ids[start : start + self._BATCH_SIZE]
+            )
+            record_queryset_events(
+                batch,
+                instance=models.F("pk"),
+                workflow=workflow_id,
+                kind=event_kind,
+                from_step=step_id,
+                from_status=models.F("current_step_status"),
+                to_step=(
+                    fields["current_step"].pk if "current_step" in fields else step_id
+                ),
+                to_status=fields["current_step_status"].pk,
+                timestamp=now,
+            )
+            updated += batch.update(version=models.F("version") + 1, **fields)
+            invalidate_instances(batch, using=self.db)
+        return updated
+
+    def bulk_cancel(self):
+        """
+        Cancels the instances of this queryset, moving them to their workflow's final
+        step with a cancellation status.
+
+        Returns:
+            BulkCounts: Instances cancelled, skipped (already completed or cancelled)
+                        and failed (no current or final step).
+        """
+        counts = BulkCounts()
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            for definition, step_id, step_definition, status_counts in self._steps():
+                total = sum(status_counts.values())
+                if step_definition is None:
+                    counts.failed += total
+                    continue
+
+                kept, skipped = self._split(
+                    definition,
+                    status_counts,
+                    lambda status: status is not None
+                    and (
+                        status.is_cancellation_status
+                        or WorkflowInstance._is_completed_state(step_definition, status)
+                    ),
+                )
+                counts.skipped += skipped
+                if skipped == total:
+                    continue
+
+                final_step_definition = definition.final_step
+                if not final_step_definition:
+                    logger.error(
+                        f"Cannot cancel workflow '{definition.name}' as it has no final step defined."
+                    )
+                    counts.failed += total - skipped
+                    continue
+
+                cancellation_status = WorkflowInstance._cancellation_status_for(
+                    definition, step_definition
+                )
+
+                counts.applied += self._update_step(
+                    WorkflowInstanceEvent.Kind.CANCELLED,
+                    definition,
+                    step_id,
+                    kept,
+                    current_step=final_step_definition.step,
+                    current_step_status=cancellation_status,
+                    completed_at=now,
+                    state=WorkflowInstance._state_for(
+                        final_step_definition, cancellation_status
+                    ),
+                    entered_step_at=now,
+                )
+
+        logger.info(
+            f"Cancelled {counts.applied} workflow instances "
+            f"({counts.skipped} skipped, {counts.failed} failed)."
+        )
+        return counts
+
+    def bulk_set_on_hold(self):
+        """
+        Puts the instances of this queryset on hold, using the on-hold status of their current step.
+
+        Returns:
+            BulkCounts: Instances put on hold, skipped (already completed or on hold)
+                        and failed (no current step or no on-hold status for it).
+        """
+        counts = BulkCounts()
+        with transaction.atomic(using=self.db):
+            for definition, step_id, step_definition, status_counts in self._steps():
+                total = sum(status_counts.values())
+                if step_definition is None:
+                    counts.failed += total
+                    continue
+
+                kept, skipped = self._split(
+                    definition,
+                    status_counts,
+                    lambda status: status is not None
+                    and (
+                        status.is_on_hold_status
+                        or WorkflowInstance._is_completed_state(step_definition, status)
+                    ),
+                )
+                counts.skipped += skipped
+                if skipped == total:
+                    continue
+
+                on_hold_status = step_definition.on_hold_status
+                if not on_hold_status:
+                    logger.warning(
+                        f"No on-hold status defined for step '{step_definition.step.name}'. "
+                        "Please define a WorkflowStepStatus with 'is_on_hold_status=True' for this step."
+                    )
+                    counts.failed += total - skipped
+                    continue
+
+                counts.applied += self._update_step(
+                    WorkflowInstanceEvent.Kind.ON_HOLD,
+                    definition,
+                    step_id,
+                    kept,
+                    current_step_status=on_hold_status,
+                    state=WorkflowInstance._state_for(step_definition, on_hold_status),
+                )
+
+        logger.info(
+            f"Put {counts.applied} workflow instances on hold "
+            f"({counts.skipped} skipped, {counts.failed} failed)."
+        )
+        return counts
+
+    def bulk_resume(self):
+        """
+        Resumes the on-hold instances of this queryset, setting them back to the
+        default status of their current step.
+
+        Returns:
+            BulkCounts: Instances resumed, skipped (completed or not on hold) and
+                        failed (no default status for their current step).
+        """
+        counts = BulkCounts()
+        with transaction.atomic(using=self.db):
+            for definition, step_id, step_definition, status_counts in self._steps():
+                total = sum(status_counts.values())
+                if step_definition is None:
+                    counts.skipped += total  # Not started, so not on hold either
+                    continue
+
+                kept, skipped = self._split(
+                    definition,
+                    status_counts,
+                    lambda status: status is None
+                    or not status.is_on_hold_status
+                    or WorkflowInstance._is_completed_state(step_definition, status),
+                )
+                counts.skipped += skipped
+                if skipped == total:
+                    continue
+
+                default_status = step_definition.default_status
+                if not default_status:
+                    logger.warning(
+                        f"No default status defined for step '{step_definition.step.name}', cannot resume."
+                    )
+                    counts.failed += total - skipped
+                    continue
+
+                on_hold_ids = [
+                    status_id for status_id in status_counts if status_id not in kept
+                ]
+                counts.applied += self._apply(
+                    self.filter(
+                        workflow_id=definition.id,
+                        current_step_id=step_id,
+                        current_step_status_id__in=on_hold_ids,
+                    ),
+                    WorkflowInstanceEvent.Kind.RESUMED,
+                    definition.id,
+                    step_id,
+                    current_step_status=default_status,
+                    state=WorkflowInstance._state_for(step_definition, default_status),
+                )
+
+        logger.info(
+            f"Resumed {counts.applied} workflow instances "
+            f"({counts.skipped} skipped, {counts.failed} failed)."
+        )
+        return counts
+
+
 class WorkflowInstance(models.Model):
     """
     Represents a specific ongoing execution of a Workflow for a particular object.
@@ -261,10 +740,54 @@ class WorkflowInstance(models.Model):
         on_delete=models.CASCADE,
         help_text="The ContentType of the object this workflow instance is for.",
     )
-    object_id = models.IntegerField(
+    object_id = models.CharField(
+        max_length=255,
         help_text="The ID of the object this workflow instance is associated with (e.g., a Claim ID).",
     )
     content_object = GenericForeignKey("content_type", "object_id")
+    # The object id in the type of its model's primary key (see object_id_field_name),
+    # so lookups from any model compare like with like and hit an index without casts
+    object_id_int = models.BigIntegerField(null=True, blank=True, editable=False)
+    object_id_uuid = models.UUIDField(null=True, blank=True, editable=False)
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on every state change; used to detect concurrent updates.",
+    )
+
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        ACTIVE = "active", "Active"
+        ON_HOLD = "on_hold", "On hold"
+        COMPLETED = "completed", "Completed"
+        CANCELLED = "cancelled", "Cancelled"
+
+    # Denormalized from the current step and status, so instances can be filtered
+    # by lifecycle state without joining the step and status tables
+    state = models.CharField(
+        max_length=20,
+        choices=State.choices,
+        default=State.PENDING,
+        editable=False,
+        help_text="The lifecycle state, derived from the current step and status.",
+    )
+    entered_step_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Timestamp when this workflow instance entered its current step.",
+    )
+
+    # Only ever written with a compare-and-swap on the version (see _save_state)
+    STATE_FIELDS = (
+        "current_step",
+        "current_step_status",
+        "completed_at",
+        "state",
+        "entered_step_at",
+    )
+
+    objects = WorkflowInstanceQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Workflow Instance"
@@ -272,6 +795,45 @@ class WorkflowInstance(models.Model):
         # Ensure only one active workflow instance of a specific type per object
         unique_together = (("workflow", "content_type", "object_id"),)
         ordering = ["-started_at"]  # Order by most recently started
+        indexes = [
+            # get_workflow_instance_for_object: lookup by object, most recent first,
+            # for integer, UUID and other primary keys respectively
+            models.Index(
+                fields=["content_type", "object_id_int", "-started_at"],
+                condition=models.Q(object_id_int__isnull=False),
+                name="django_steps_inst_int_obj_idx",
+            ),
+            models.Index(
+                fields=["content_type", "object_id_uuid", "-started_at"],
+                condition=models.Q(object_id_uuid__isnull=False),
+                name="django_steps_inst_uuid_obj_idx",
+            ),
+            models.Index(
+                fields=["content_type", "object_id", "-started_at"],
+                name="django_steps_inst_object_idx",
+            ),
+            # Filters by step and status (admin list filters), in the default ordering
+            models.Index(
+                fields=["current_step", "current_step_status", "-started_at"],
+                name="django_steps_inst_status_idx",
+            ),
+            # The admin's date hierarchy and start-time listings within a workflow
+            models.Index(
+                fields=["workflow", "started_at"],
+                name="django_steps_inst_started_idx",
+            ),
+            # Counts and lists of instances per workflow, state and step (dashboards)
+            models.Index(
+                fields=["workflow", "state", "current_step"],
+                name="django_steps_inst_state_idx",
+            ),
+            # Worklists of active instances, oldest in their step first
+            models.Index(
+                fields=["workflow", "current_step", "entered_step_at"],
+                condition=models.Q(state="active"),
+                name="django_steps_inst_active_idx",
+            ),
+        ]
 
     def __str__(self):
         object_repr = getattr(
@@ -286,38 +848,378 @@ class WorkflowInstance(models.Model):
             f"('{object_repr}') - Step: {current_step_name} - Status: {current_step_status_name}"
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_state(fields)
+
+    def _remember_state(self, field_names=None):
+        """
+        Remembers the state fields as they are in the database, so full saves only
+        write the ones changed since.
+        """
+        saved = self.__dict__.setdefault("_saved_state", {})
+        for name in self.STATE_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if (
+                field_names is None or name in field_names or attname in field_names
+            ) and (attname in self.__dict__):
+                saved[attname] = self.__dict__[attname]
+
+    def _changed_state_fields(self):
+        saved = self.__dict__.get("_saved_state", {})
+        missing = object()
+        return [
+            name
+            for name in self.STATE_FIELDS
+            if (attname := self._meta.get_field(name).attname) in self.__dict__
+            and saved.get(attname, missing) != self.__dict__[attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        from .identity import instance_saved
+        from .state_cache import invalidate_instances
+
+        adding = self._state.adding
+        full_save = not args and kwargs.get("update_fields") is None
+        if full_save:
+            # Full saves (create(), admin forms) may set the object, step and status directly
+            self._sync_object_id()
+            if self.current_step_id is not None:
+                self._sync_lifecycle(
+                    entered_step=self._state.adding and self.entered_step_at is None
+                )
+        if adding or not full_save:
+            super().save(*args, **kwargs)
+        else:
+            # The version and the state fields are only written by compare-and-swap
+            # updates, so a full save of a stale copy can't overwrite a newer state.
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "version"
+                and field.name not in self.STATE_FIELDS
+            ]
+            changed = self._changed_state_fields()
+            with transaction.atomic(using=kwargs.get("using") or self._state.db):
+                if changed:
+                    self._write_state(changed)
+                super().save(*args, **kwargs)
+        self._remember_state()
+        instance_saved(self, created=adding)
+        invalidate_instances([self], started=adding, using=self._state.db)
+
+    def _write_state(self, field_names):
+        """
+        Writes ``field_names`` and increments the version in a single
+        ``UPDATE ... WHERE id = ? AND version = ?``.
+
+        Raises:
+            WorkflowConflictError: If the instance was modified since it was read.
+        """
+        expected_version = self.version
+        updated = self._versioned_queryset().update(
+            version=models.F("version") + 1, **self._state_values(field_names)
+        )
+        if not updated:
+            raise WorkflowConflictError(self, expected_version)
+        self.version = expected_version + 1
+        self._remember_state()
+
+    def _save_state(self, *field_names):
+        """
+        Writes ``field_names`` and increments the version in a single
+        ``UPDATE ... WHERE id = ? AND version = ?``, without taking any row lock.
+
+        The denormalized ``state`` and ``entered_step_at`` are written along with the
+        step and status, and the history events queued by ``_add_event`` are recorded
+        and the cached state is invalidated once the write succeeded.
+
+        Raises:
+            WorkflowConflictError: If the instance was modified since it was read;
+                                   nothing is written and the caller may reload and retry.
+        """
+        from .identity import instance_saved
+        from .state_cache import invalidate_instances
+
+        field_names = self._with_lifecycle_fields(field_names)
+        pending_events = self._take_events()
+        if self._state.adding:
+            self.save()
+        elif field_names:
+            self._write_state(field_names)
+            instance_saved(self)
+            invalidate_instances([self], using=self._state.db)
+        self._record_events(pending_events)
+
+    async def _asave_state(self, *field_names):
+        """
+        Async counterpart of ``_save_state``.
+        """
+        from .identity import instance_saved
+        from .state_cache import ainvalidate_instances
+
+        field_names = self._with_lifecycle_fields(field_names)
+        pending_events = self._take_events()
+        if self._state.adding:
+            await self.asave()
+        elif field_names:
+            expected_version = self.version
+            updated = await self._versioned_queryset().aupdate(
+                version=models.F("version") + 1, **self._state_values(field_names)
+            )
+            if not updated:
+                raise WorkflowConflictError(self, expected_version)
+            self.version = expected_version + 1
+            self._remember_state()
+            instance_saved(self)
+            await ainvalidate_instances([self], using=self._state.db)
+        if pending_events:
+            from .history import arecord_events
+
+            await arecord_events(
+                self._build_events(pending_events), using=self._state.db
+            )
+
+    @staticmethod
+    def _state_for(step, step_status):
+        """
+        Returns the lifecycle State of an instance at ``step`` (a WorkflowStep or a
+        StepDefinition) with ``step_status``.
+        """
+        State = WorkflowInstance.State
+        if step is None:
+            return State.PENDING
+        if step_status is None:
+            return State.ACTIVE
+        if step.is_final_step and step_status.is_completion_status:
+            return (
+                State.CANCELLED
+                if step_status.is_cancellation_status
+                else State.COMPLETED
+            )
+        if step_status.is_on_hold_status:
+            return State.ON_HOLD
+        # Like is_completed() always did, a cancellation status only ends the workflow
+        # on the final step
+        return State.ACTIVE
+
+    def _sync_object_id(self):
+        """
+        Normalizes ``object_id`` and sets the typed object id fields from it.
+        """
+        if self.object_id is None or self.content_type_id is None:
+            return
+        model = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        for name, value in get_object_id_values(model, self.object_id).items():
+            setattr(self, name, value)
+
+    def _sync_lifecycle(self, entered_step=False):
+        """
+        Derives ``state`` from the current step and status, and sets
+        ``entered_step_at`` if the instance just ``entered_step``.
+
+        Returns:
+            tuple: The names of the fields set.
+        """
+        self.state = self._state_for(self.current_step, self.current_step_status)
+        if not entered_step:
+            return ("state",)
+        self.entered_step_at = timezone.now()
+        return ("state", "entered_step_at")
+
+    def _with_lifecycle_fields(self, field_names):
+        if "current_step" in field_names:
+            return (*field_names, *self._sync_lifecycle(entered_step=True))
+        if "current_step_status" in field_names:
+            return (*field_names, *self._sync_lifecycle())
+        return field_names
+
+    def _add_event(self, kind, from_step_id, from_status_id, transition=None):
+        """
+        Queues a history event for the change just applied to this instance's
+        attributes; it is recorded by the next ``_save_state``.
+        """
+        if not hasattr(self, "_pending_events"):
+            self._pending_events = []
+        self._pending_events.append(
+            {
+                "kind": kind,
+                "from_step_id": from_step_id,
+                "from_status_id": from_status_id,
+                "to_step_id": self.current_step_id,
+                "to_status_id": self.current_step_status_id,
+                "transition_id": transition.pk if transition else None,
+                "timestamp": timezone.now(),
+            }
+        )
+
+    def _take_events(self):
+        return self.__dict__.pop("_pending_events", [])
+
+    def _build_events(self, pending_events):
+        return [
+            WorkflowInstanceEvent(
+                instance_id=self.pk, workflow_id=self.workflow_id, **event
+            )
+            for event in pending_events
+        ]
+
+    def _record_events(self, pending_events):
+        from .history import record_events
+
+        if pending_events:
+            record_events(self._build_events(pending_events), using=self._state.db)
+
+    def _versioned_queryset(self):
+        return (
+            type(self)
+            ._base_manager.using(self._state.db)
+            .filter(pk=self.pk, version=self.version)
+        )
+
+    def _state_values(self, field_names):
+        values = {}
+        for name in dict.fromkeys(field_names):
+            field = self._meta.get_field(name)
+            values[field.attname] = getattr(self, field.attname)
+        return values
+
+    def _get_definition(self):
+        """
+        Returns the cached WorkflowDefinition of this instance's workflow.
+        """
+        # Lazy import to avoid a circular import with definitions.py
+        from .definitions import get_workflow_definition
+
+        return get_workflow_definition(self.workflow_id)
+
+    async def _aget_definition(self):
+        """
+        Async counterpart of ``_get_definition``.
+        """
+        from .definitions import aget_workflow_definition
+
+        return await aget_workflow_definition(self.workflow_id)
+
+    def _resolve_state(self, definition=None):
+        """
+        Resolves the workflow definition, the current step definition and the current
+        step status from the in-memory definition snapshot, and hydrates the instance's
+        ``workflow``, ``current_step`` and ``current_step_status`` relations from it.
+
+        Args:
+            definition (WorkflowDefinition, optional): The definition of this instance's
+                                                       workflow, if already at hand.
+
+        Returns:
+            tuple: (WorkflowDefinition, StepDefinition or None, WorkflowStepStatus or None)
+        """
+        from .definitions import build_step_definition
+
+        if definition is None:
+            definition = self._get_definition()
+        cls = type(self)
+        if not cls.workflow.is_cached(self):
+            self.workflow = definition.workflow
+
+        step_definition = None
+        if self.current_step_id is not None:
+            step_definition = definition.get_step(self.current_step_id)
+            if step_definition is None:
+                # The step does not belong to this workflow; fall back to the database
+                logger.warning(
+                    f"Step {self.current_step_id} is not part of workflow '{definition.name}'."
+                )
+                step_definition = build_step_definition(self.current_step)
+            elif not cls.current_step.is_cached(self):
+                self.current_step = step_definition.step
+
+        step_status = None
+        if self.current_step_status_id is not None:
+            step_status = definition.get_status(self.current_step_status_id)
+            if step_status is None:
+                step_status = self.current_step_status
+            elif not cls.current_step_status.is_cached(self):
+                self.current_step_status = step_status
+
+        return definition, step_definition, step_status
+
+    @staticmethod
+    def _is_completed_state(step_definition, step_status):
+        return (
+            step_definition is not None
+            and step_definition.is_final_step
+            and step_status is not None
+            and step_status.is_completion_status
+        )
+
+    @staticmethod
+    def _cancellation_status_for(definition, step_definition):
+        """
+        Returns the status instances at ``step_definition`` are cancelled with: its own
+        cancellation status, else the one of the final step, else a "Cancelled" status
+        of the final step, created if it doesn't exist yet.
+        """
+        final_step_definition = definition.final_step
+        cancellation_status = (
+            step_definition.cancellation_status
+            or final_step_definition.cancellation_status
+        )
+        if not cancellation_status:
+            final_step = final_step_definition.step
+            cancellation_status, created = WorkflowStepStatus.objects.get_or_create(
+                step=final_step,
+                name="Cancelled",
+                defaults={"is_cancellation_status": True, "is_completion_status": True},
+            )
+            if created:
+                logger.info(
+                    f"Created cancellation status for final step '{final_step.name}' in workflow '{definition.name}'."
+                )
+        return cancellation_status
+
     def start_workflow(self):
         """
         Initializes the workflow instance by setting its current step to the
         first step of the associated workflow and its step-specific status.
         """
+        definition, _, _ = self._resolve_state()
+
         # A workflow instance is considered 'pending' if it hasn't started yet (current_step is None)
-        if self.current_step is not None:
+        if self.current_step_id is not None:
             logger.info(f"Workflow '{self.workflow.name}' already started.")
             return False
 
         try:
             # Get the first step (is_initial_step=True)
-            first_step = self.workflow.steps.filter(is_initial_step=True).first()
+            first_step = definition.initial_step
             if not first_step:
                 raise ImproperlyConfigured(
                     f"Workflow '{self.workflow.name}' has no steps defined or no initial step."
                 )
 
             # Get the default status for the first step
-            default_step_status = first_step.possible_statuses.filter(
-                is_default_status=True
-            ).first()
+            default_step_status = first_step.default_status
             if not default_step_status:
                 raise ImproperlyConfigured(
-                    f"First step '{first_step.name}' has no default status defined. "
+                    f"First step '{first_step.step.name}' has no default status defined. "
                     "Please define one default status for each step."
                 )
 
-            self.current_step = first_step
+            self.current_step = first_step.step
             self.current_step_status = default_step_status
-            self.save()
-            logger.debug(f"Started workflow '{self.workflow.name}' for object {self.object_id}")
+            self._add_event(WorkflowInstanceEvent.Kind.STARTED, None, None)
+            self._save_state("current_step", "current_step_status")
+            logger.debug(
+                f"Started workflow '{self.workflow.name}' for object {self.object_id}"
+            )
             return True
 
         except ImproperlyConfigured as e:
@@ -325,7 +1227,7 @@ class WorkflowInstance(models.Model):
             return False
 
     def update_step_status(
-        self, new_status_name, context_data: dict = None
+        self, new_status_name, context_data: dict = None, advance: bool = True
     ):
         """
         Updates the current step's status for this workflow instance.
@@ -336,36 +1238,85 @@ class WorkflowInstance(models.Model):
             new_status_name (str): The name of the new WorkflowStepStatus.
             context_data (dict, optional): Data to provide to CEL expressions for evaluation.
                                           If None, it will attempt to extract from content_object.
+            advance (bool): If False, only the status is written and the advancement is left
+                            to the caller (see ``services.update_workflow_step_status``).
         """
-        if self.is_completed():
-            logger.info(f"Workflow '{self.workflow.name}' is already completed.")
+        new_step_status = self._prepare_step_status(new_status_name)
+        if new_step_status is None:
             return False
 
-        if not self.current_step:
-            logger.error("Workflow instance has no current step. Call start_workflow() first.")
+        # If the new status is a completion status, attempt to advance the workflow;
+        # the new status and the advancement are written in a single update
+        if new_step_status.is_completion_status and advance:
+            return self._advance_to_next_workflow_step(
+                context_data=context_data, update_fields=("current_step_status",)
+            )
+
+        self._save_state("current_step_status")
+        return True  # Status updated, but workflow did not advance
+
+    async def aupdate_step_status(
+        self, new_status_name, context_data: dict = None, advance: bool = True
+    ):
+        """
+        Async counterpart of ``update_step_status``.
+        """
+        definition = await self._aget_definition()
+        new_step_status = self._prepare_step_status(new_status_name, definition)
+        if new_step_status is None:
             return False
 
-        new_step_status = self.current_step.possible_statuses.filter(
-            name=new_status_name
-        ).first()
+        if new_step_status.is_completion_status and advance:
+            return await self._aadvance_to_next_workflow_step(
+                context_data=context_data,
+                update_fields=("current_step_status",),
+                definition=definition,
+            )
+
+        await self._asave_state("current_step_status")
+        return True
+
+    def _prepare_step_status(self, new_status_name, definition=None):
+        """
+        Sets the current step's status to ``new_status_name`` without saving it.
+
+        Returns:
+            WorkflowStepStatus: The new status, or None if it can't be set.
+        """
+        _, step_definition, step_status = self._resolve_state(definition)
+
+        if self._is_completed_state(step_definition, step_status):
+            logger.info(f"Workflow '{self.workflow.name}' is already completed.")
+            return None
+
+        if step_definition is None:
+            logger.error(
+                "Workflow instance has no current step. Call start_workflow() first."
+            )
+            return None
+
+        new_step_status = step_definition.get_status(new_status_name)
         if not new_step_status:
             logger.error(
                 f"Status '{new_status_name}' is not a valid status for step '{self.current_step.name}'."
             )
-            return False
+            return None
 
+        previous_status_id = self.current_step_status_id
         self.current_step_status = new_step_status
-        self.save()
-        logger.debug(f"Updated workflow '{self.workflow.name}' status to '{new_status_name}'")
-
-        # If the new status is a completion status, attempt to advance the workflow
-        if new_step_status.is_completion_status:
-            # Pass context_data directly to the _advance_to_next_workflow_step method
-            return self._advance_to_next_workflow_step(context_data=context_data)
-
-        return True  # Status updated, but workflow did not advance
+        self._add_event(
+            WorkflowInstanceEvent.Kind.STATUS_CHANGED,
+            step_definition.id,
+            previous_status_id,
+        )
+        logger.debug(
+            f"Updated workflow '{self.workflow.name}' status to '{new_status_name}'"
+        )
+        return new_step_status
 
-    def _advance_to_next_workflow_step(self, context_data: dict = None):
+    def _advance_to_next_workflow_step(
+        self, context_data: dict = None, update_fields=()
+    ):
         """
         Internal method to move the workflow instance to the next workflow step based on defined transitions.
         Marks the workflow as completed if it reaches the final step and its completion status.
@@ -374,196 +1325,276 @@ class WorkflowInstance(models.Model):
         Args:
             context_data (dict, optional): Data to provide to CEL expressions for evaluation.
                                           If None, attempts to extract from content_object.
+            update_fields (iterable, optional): Fields already changed by the caller, written
+                                                together with the advancement in a single update.
+
+        Raises:
+            WorkflowConflictError: If the instance was modified concurrently.
         """
-        # Lazy import to avoid circular dependencies and ensure celparser is installed
-        from celparser.evaluator import evaluate
-        from celparser.parser import parse
+        advanced, changed_fields = self._prepare_advance(context_data)
+        self._save_state(*update_fields, *changed_fields)
+        return advanced
 
-        if not self.current_step:
-            logger.error("Workflow instance has no current step to advance from.")
-            return False
+    async def _aadvance_to_next_workflow_step(
+        self, context_data: dict = None, update_fields=(), definition=None
+    ):
+        """
+        Async counterpart of ``_advance_to_next_workflow_step``.
 
-        # If it's the final step and the status marks completion, then the workflow is truly done.
+        Conditions are evaluated in the event loop, unless the content object's context
+        has to be built from the database, in which case the evaluation runs in a
+        worker thread.
+        """
+        if definition is None:
+            definition = await self._aget_definition()
+        if self._advance_loads_context(definition, context_data):
+            advanced, changed_fields = await sync_to_async(self._prepare_advance)(
+                context_data, definition
+            )
+        else:
+            advanced, changed_fields = self._prepare_advance(context_data, definition)
+        await self._asave_state(*update_fields, *changed_fields)
+        return advanced
+
+    def _advance_loads_context(self, definition, context_data=None):
+        """
+        Tells whether advancing from the current step needs the context of the content
+        object, i.e. a condition has to be evaluated and no context data was given.
+        """
+        if context_data:
+            return False
+        step_definition = definition.get_step(self.current_step_id)
+        if step_definition is None:
+            return True
         if (
-            self.current_step.is_final_step
-            and self.current_step_status.is_completion_status
+            step_definition.is_final_step
+            or step_definition.default_transition is not None
         ):
+            return False
+        return any(transition.condition for transition in step_definition.transitions)
+
+    def _prepare_advance(self, context_data=None, definition=None):
+        """
+        Applies the advancement to the instance's attributes without saving them.
+
+        Returns:
+            tuple: (whether the workflow advanced or completed, names of the changed fields)
+        """
+        definition, step_definition, step_status = self._resolve_state(definition)
+
+        if step_definition is None:
+            logger.error("Workflow instance has no current step to advance from.")
+            return False, ()
+
+        # If it's the final step and the status marks completion, then the workflow is truly done.
+        if step_definition.is_final_step and step_status.is_completion_status:
             self.completed_at = timezone.now()
-            self.save()
+            self._add_event(
+                WorkflowInstanceEvent.Kind.COMPLETED, step_definition.id, step_status.pk
+            )
             logger.info(
                 f"Workflow '{self.workflow.name}' for object '{self.object_id}' completed."
             )
-            return True
-        elif (
-            self.current_step.is_final_step
-            and not self.current_step_status.is_completion_status
-        ):
+            return True, ("completed_at",)
+        elif step_definition.is_final_step and not step_status.is_completion_status:
             logger.warning(
                 f"Current step '{self.current_step.name}' is final, but current status "
-                f"'{self.current_step_status.name}' is not a completion status. Workflow not marked complete."
+                f"'{step_status.name}' is not a completion status. Workflow not marked complete."
             )
-            return False
-
-        # Attempt to find the next step via transitions
-        transitions = self.current_step.outgoing_transitions.all().order_by(
-            "-priority"
-        )  # Order by priority, highest first
-
-        logger.debug(f"Transaction are: {transitions}")
-
-        evaluated_next_step = None
-
-        # Prepare context for CEL evaluation
-        if context_data is None:
-            context_data = {}
-
-        # If context_data is empty or doesn't have expected structure, try to extract from content_object
-        if not context_data and self.content_object:
-            context_data = extract_context_data_from_content_object(self.content_object)
+            return False, ()
 
-        logger.debug(f"Context data is: {context_data}")
+        logger.debug(f"Transitions are: {step_definition.transitions}")
 
-        for transition in transitions:
-            if not transition.condition:  # Unconditional transition
-                evaluated_next_step = transition.to_step
-                logger.info(
-                    f"Unconditional transition from '{self.current_step.name}' to '{transition.to_step.name}' taken."
-                )
-                break
-
-            try:
-                # Parse the CEL expression
-                parsed_expression = parse(transition.condition)
-                result = evaluate(parsed_expression, context_data)
-                if result:
-                    evaluated_next_step = transition.to_step
-                    logger.info(
-                        f"Transition from '{self.current_step.name}' to '{transition.to_step.name}' taken. "
-                        f"Condition: '{transition.condition}' evaluated to TRUE."
-                    )
-                    break  # Take the first matching transition (due to priority ordering)
-                else:
-                    logger.debug(
-                        f"Condition '{transition.condition}' evaluated to FALSE for transition to '{transition.to_step.name}'."
-                    )
-            except Exception as e:
-                logger.error(
-                    f"Error evaluating CEL condition '{transition.condition}' for transition to '{transition.to_step.name}': {e}"
-                )
-                # Log the error but continue trying other transitions if parsing/evaluation fails
-                continue
+        # Transitions are already ordered by priority, highest first; the context
+        # is only built once a conditional transition is reached
+        transition = step_definition.select_transition(
+            lambda: self._get_condition_context(step_definition, context_data)
+        )
+        evaluated_next_step = transition.to_step if transition else None
 
         if evaluated_next_step:
-            # Find the default status for the next step
-            default_next_step_status = evaluated_next_step.possible_statuses.filter(
-                is_default_status=True
-            ).first()
-            if not default_next_step_status:
-                error_msg = f"Next step '{evaluated_next_step.name}' has no default status defined. Please define one default status for each step."
-                logger.error(error_msg)
-                raise ImproperlyConfigured(error_msg)
+            default_next_step_status = get_default_status(
+                definition, evaluated_next_step
+            )
 
             self.current_step = evaluated_next_step
             self.current_step_status = default_next_step_status
-            self.save()
-            return True
+            self._add_event(
+                WorkflowInstanceEvent.Kind.ADVANCED,
+                step_definition.id,
+                step_status.pk if step_status else None,
+                transition,
+            )
+            return True, ("current_step", "current_step_status")
         else:
             logger.warning(
                 f"No valid transition found from '{self.current_step.name}' for workflow '{self.workflow.name}'. "
                 "Workflow instance will remain at current step. Check WorkflowTransition definitions."
             )
-            return False
+            return False, ()
+
+    def _get_condition_context(self, step_definition, context_data=None):
+        """
+        Returns the data the conditions of ``step_definition``'s transitions are evaluated against.
+
+        Explicit ``context_data`` wins. Otherwise the context is built by the context
+        provider of the content object's model (see ``django_steps.context``), which
+        by default loads only the fields the conditions actually read.
+        """
+        if context_data:
+            return context_data
+
+        model = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        if model is None:
+            return context_data if context_data is not None else {}
+        return get_content_context(model, self.object_id, step_definition.context_paths)
 
     def is_completed(self):
         """
-        Checks if the workflow instance has reached a completed state.
-        This is determined if it is on the final step and its current status
-        is marked as a completion status.
+        Checks if the workflow instance has reached a completed state, i.e. it is on
+        the final step with a completion status (cancelled instances included).
+        Reads the denormalized ``state``, so no step or status has to be loaded.
         """
-        return (
-            self.current_step is not None
-            and self.current_step.is_final_step
-            and self.current_step_status is not None
-            and self.current_step_status.is_completion_status
-        )
+        return self.state in (self.State.COMPLETED, self.State.CANCELLED)
 
     def cancel_workflow(self):
         """
         Attempts to cancel the workflow by setting its current step status to a cancellation status.
         The workflow instance will be marked as completed (cancelled) if successful.
         """
-        if self.is_completed():
+        cancelled, changed_fields = self._prepare_cancel()
+        self._save_state(*changed_fields)
+        if changed_fields:
+            logger.info(
+                f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been cancelled and moved to final step."
+            )
+        return cancelled
+
+    async def acancel_workflow(self):
+        """
+        Async counterpart of ``cancel_workflow``.
+        """
+        definition = await self._aget_definition()
+        step_definition = definition.get_step(self.current_step_id)
+        if self.current_step_id is not None and (
+            step_definition is None or step_definition.cancellation_status is None
+        ):
+            # The cancellation status has to be created first (or the step is not
+            # part of the workflow's definition), which needs the database
+            return await sync_to_async(self.cancel_workflow)()
+
+        cancelled, changed_fields = self._prepare_cancel(definition)
+        await self._asave_state(*changed_fields)
+        if changed_fields:
+            logger.info(
+                f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been cancelled and moved to final step."
+            )
+        return cancelled
+
+    def _prepare_cancel(self, definition=None):
+        """
+        Moves the instance to the final step with a cancellation status without saving it.
+
+        Returns:
+            tuple: (whether the workflow is cancelled, names of the changed fields)
+        """
+        definition, step_definition, step_status = self._resolve_state(definition)
+
+        if self._is_completed_state(step_definition, step_status):
             logger.info(
                 f"Cannot cancel workflow '{self.workflow.name}' as it is already completed."
             )
-            return False
+            return False, ()
 
-        if self.current_step_status and self.current_step_status.is_cancellation_status:
+        if step_status and step_status.is_cancellation_status:
             logger.info(
                 f"Workflow '{self.workflow.name}' is already in a cancellation status."
             )
-            return True
+            return True, ()
 
         # Ensure current_step is not None
-        if not self.current_step:
-            logger.error(f"Cannot cancel workflow '{self.workflow.name}' as it has no current step.")
-            return False
+        if step_definition is None:
+            logger.error(
+                f"Cannot cancel workflow '{self.workflow.name}' as it has no current step."
+            )
+            return False, ()
 
         # Find a final step in the workflow
-        final_step = self.workflow.steps.filter(is_final_step=True).first()
-        if not final_step:
-            logger.error(f"Cannot cancel workflow '{self.workflow.name}' as it has no final step defined.")
-            return False
-
-        cancellation_status = self.current_step.possible_statuses.filter(
-            is_cancellation_status=True
-        ).first()
-        if not cancellation_status:
-            # Create a cancellation status for the final step if one doesn't exist
-            cancellation_status = WorkflowStepStatus.objects.create(
-                step=final_step,
-                name="Cancelled",
-                is_cancellation_status=True,
-                is_completion_status=True,
-            )
-            logger.info(
-                f"Created cancellation status for final step '{final_step.name}' in workflow '{self.workflow.name}'."
+        final_step_definition = definition.final_step
+        if not final_step_definition:
+            logger.error(
+                f"Cannot cancel workflow '{self.workflow.name}' as it has no final step defined."
             )
+            return False, ()
+        cancellation_status = self._cancellation_status_for(definition, step_definition)
 
         # Move to final step with cancellation status
-        self.current_step = final_step
+        self.current_step = final_step_definition.step
         self.current_step_status = cancellation_status
         self.completed_at = timezone.now()  # Mark cancellation time
-        self.save()
+        self._add_event(
+            WorkflowInstanceEvent.Kind.CANCELLED,
+            step_definition.id,
+            step_status.pk if step_status else None,
+        )
+        return True, ("current_step", "current_step_status", "completed_at")
 
+    def set_on_hold(self):
+        """
+        Attempts to put the workflow on hold by setting its current step status to an on-hold status.
+        """
+        if not self._prepare_on_hold():
+            return False
+        self._save_state("current_step_status")
         logger.info(
-            f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been cancelled and moved to final step."
+            f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been put on hold."
         )
         return True
 
+    async def aset_on_hold(self):
+        """
+        Async counterpart of ``set_on_hold``.
+        """
+        if not self._prepare_on_hold(await self._aget_definition()):
+            return False
+        await self._asave_state("current_step_status")
+        logger.info(
+            f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been put on hold."
+        )
+        return True
 
-    def set_on_hold(self):
+    def _prepare_on_hold(self, definition=None):
         """
-        Attempts to put the workflow on hold by setting its current step status to an on-hold status.
+        Sets the current step's on-hold status without saving it.
+
+        Returns:
+            bool: True if the status was set.
         """
-        if self.is_completed():
+        _, step_definition, step_status = self._resolve_state(definition)
+
+        if self._is_completed_state(step_definition, step_status):
             logger.info(
                 f"Cannot set workflow '{self.workflow.name}' on hold as it is completed."
             )
             return False
 
-        if self.current_step_status and self.current_step_status.is_on_hold_status:
+        if step_status and step_status.is_on_hold_status:
             logger.info(f"Workflow '{self.workflow.name}' is already on hold.")
             return False
 
-        on_hold_status = self.current_step.possible_statuses.filter(
-            is_on_hold_status=True
-        ).first()
+        if step_definition is None:
+            logger.error(
+                f"Cannot set workflow '{self.workflow.name}' on hold as it has no current step."
+            )
+            return False
+
+        on_hold_status = step_definition.on_hold_status
         if on_hold_status:
             self.current_step_status = on_hold_status
-            self.save()
-            logger.info(
-                f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been put on hold."
+            self._add_event(
+                WorkflowInstanceEvent.Kind.ON_HOLD,
+                step_definition.id,
+                step_status.pk if step_status else None,
             )
             return True
         else:
@@ -573,33 +1604,57 @@ class WorkflowInstance(models.Model):
             )
             return False
 
-
     def resume_workflow(self):
         """
         Attempts to resume the workflow from an on-hold state by setting its current
         step status back to the default status for the current step.
         """
-        if self.is_completed():
-            logger.info(f"Cannot resume workflow '{self.workflow.name}' as it is completed.")
+        if not self._prepare_resume():
             return False
+        self._save_state("current_step_status")
+        logger.info(
+            f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been resumed."
+        )
+        return True
 
-        if (
-            not self.current_step_status
-            or not self.current_step_status.is_on_hold_status
-        ):
+    async def aresume_workflow(self):
+        """
+        Async counterpart of ``resume_workflow``.
+        """
+        if not self._prepare_resume(await self._aget_definition()):
+            return False
+        await self._asave_state("current_step_status")
+        logger.info(
+            f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been resumed."
+        )
+        return True
+
+    def _prepare_resume(self, definition=None):
+        """
+        Sets the current step's default status back without saving it.
+
+        Returns:
+            bool: True if the status was set.
+        """
+        _, step_definition, step_status = self._resolve_state(definition)
+
+        if self._is_completed_state(step_definition, step_status):
+            logger.info(
+                f"Cannot resume workflow '{self.workflow.name}' as it is completed."
+            )
+            return False
+
+        if not step_status or not step_status.is_on_hold_status:
             logger.info(
                 f"Workflow '{self.workflow.name}' is not currently on hold, cannot resume."
             )
             return False
 
-        default_status = self.current_step.possible_statuses.filter(
-            is_default_status=True
-        ).first()
+        default_status = step_definition.default_status if step_definition else None
         if default_status:
             self.current_step_status = default_status
-            self.save()
-            logger.info(
-                f"Workflow '{self.workflow.name}' for object '{self.object_id}' has been resumed."
+            self._add_event(
+                WorkflowInstanceEvent.Kind.RESUMED, step_definition.id, step_status.pk
             )
             return True
         else:
@@ -608,3 +1663,188 @@ class WorkflowInstance(models.Model):
                 "Cannot resume workflow. Please define a default status for this step."
             )
             return False
+
+
+class WorkflowOperation(models.Model):
+    """
+    A pending operation on a workflow instance, queued to be run by a worker
+    (``manage.py steps_worker``) instead of during the web request.
+    """
+
+    class Kind(models.TextChoices):
+        ADVANCE = "advance", "Advance"
+        UPDATE_STATUS = "update_status", "Update status"
+        CANCEL = "cancel", "Cancel"
+        SET_ON_HOLD = "set_on_hold", "Set on hold"
+        RESUME = "resume", "Resume"
+
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    instance = models.ForeignKey(
+        WorkflowInstance,
+        on_delete=models.CASCADE,
+        related_name="operations",
+        help_text="The workflow instance this operation applies to.",
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=Kind.choices,
+        help_text="The operation to run on the workflow instance.",
+    )
+    status_name = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="The new status name, for status updates.",
+    )
+    context_data = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Data to provide to CEL expressions when the operation advances the workflow.",
+    )
+    priority = models.IntegerField(
+        default=0,
+        help_text="Operations with a higher priority are run first.",
+    )
+    state = models.CharField(
+        max_length=10,
+        choices=State.choices,
+        default=State.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="The operation is not run before this time (used to retry failed attempts later).",
+    )
+    claimed_by = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Token of the worker batch running the operation.",
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Workflow Operation"
+        verbose_name_plural = "Workflow Operations"
+        ordering = ["-priority", "available_at", "id"]
+        indexes = [
+            # Claiming the next batch of pending operations
+            models.Index(
+                fields=["state", "-priority", "available_at", "id"],
+                name="django_steps_op_queue_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of workflow instance {self.instance_id} ({self.state})"
+
+
+class WorkflowInstanceEvent(models.Model):
+    """
+    An append-only record of a change of step or status of a workflow instance.
+
+    Events are buffered and inserted in bulk once the transaction that made the change
+    commits (see ``django_steps.history``). The step, status and transition columns
+    are plain references without database constraints, so the history of an instance
+    survives changes to its workflow's definition.
+    """
+
+    class Kind(models.TextChoices):
+        STARTED = "started", "Started"
+        STATUS_CHANGED = "status_changed", "Status changed"
+        ADVANCED = "advanced", "Advanced"
+        COMPLETED = "completed", "Completed"
+        CANCELLED = "cancelled", "Cancelled"
+        ON_HOLD = "on_hold", "Put on hold"
+        RESUMED = "resumed", "Resumed"
+
+    # Lookups by instance or workflow are served by the composite indexes below
+    instance = models.ForeignKey(
+        WorkflowInstance,
+        on_delete=models.CASCADE,
+        related_name="events",
+        db_index=False,
+    )
+    workflow = models.ForeignKey(
+        Workflow,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    from_step = models.ForeignKey(
+        WorkflowStep,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    from_status = models.ForeignKey(
+        WorkflowStepStatus,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    to_step = models.ForeignKey(
+        WorkflowStep,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    to_status = models.ForeignKey(
+        WorkflowStepStatus,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    transition = models.ForeignKey(
+        WorkflowTransition,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="The transition taken, for advancements.",
+    )
+    actor = models.CharField(
+        max_length=150,
+        blank=True,
+        help_text="Who made the change (see django_steps.history.workflow_actor).",
+    )
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Workflow Instance Event"
+        verbose_name_plural = "Workflow Instance Events"
+        ordering = ["timestamp", "id"]
+        indexes = [
+            # Timeline of an instance
+            models.Index(
+                fields=["instance", "timestamp"], name="django_steps_event_inst_idx"
+            ),
+            # Reporting per workflow over a period
+            models.Index(
+                fields=["workflow", "timestamp"], name="django_steps_event_wf_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of workflow instance {self.instance_id} at {self.timestamp}"
@@ -0,0 +1,286 @@
+"""
+Compiled workflow plans stored on the Workflow row.
+
+Whenever a step, status or transition changes, the definition of its workflow is
+compiled again into a validated "plan" kept in the ``Workflow.plan`` JSON column: the
+steps in order, their statuses and flags, and the outgoing transitions of each step
+sorted by priority (the adjacency lists of the graph). Loading a workflow definition
+is then a single read of the Workflow row.
+
+Plans are compiled once the transaction changing the definition commits, once per
+workflow however many of its rows changed (e.g. in a cascading delete). Each change
+only clears the plan in the transaction itself, so the definition is loaded from its
+rows until the plan is compiled again, even if the process dies in between.
+
+Compiling also validates the workflow. The problems that make its instances fail at
+the step they are in (not exactly one initial step, steps without a default status,
+conditions that can't be parsed) are kept in the plan as ``errors``, and fail
+``manage.py check --database default``. Steps that can't be reached from the initial
+step (e.g. steps removed from a code-defined workflow while instances are still at
+them) are kept as ``warnings``. Both are shown in the admin, so they can be caught
+before deploys instead of in the middle of a request.
+
+Plans written by another version of django_steps, or for other definition fields,
+are ignored: the definition is loaded from the rows, and its plan written anew.
+"""
+
+import logging
+
+from django.core import checks
+from django.db import DatabaseError, models, transaction
+
+from .models import Workflow, WorkflowStep, WorkflowStepStatus, WorkflowTransition
+from .transactions import CommitHook, get_commit_hook, get_pending_hooks
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of the plans changes
+PLAN_FORMAT = 2
+
+
+def _plan_fields(model):
+    # Timestamps aren't needed to run instances; they are loaded on access
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if not isinstance(field, models.DateTimeField)
+    ]
+
+
+def _fields():
+    return {
+        "steps": _plan_fields(WorkflowStep),
+        "statuses": _plan_fields(WorkflowStepStatus),
+        "transitions": _plan_fields(WorkflowTransition),
+    }
+
+
+def get_plan_errors(steps, statuses, transitions):
+    """
+    Validates the rows of a workflow definition.
+
+    Returns:
+        list: A description of every problem keeping its instances from running; empty
+              if the workflow is valid.
+    """
+    from .cel import parse_condition
+
+    errors = []
+    names = {step.pk: step.name for step in steps}
+    initial = [step for step in steps if step.is_initial_step]
+    if len(initial) != 1:
+        errors.append(
+            f"The workflow needs exactly one initial step, not {len(initial)}."
+        )
+
+    with_default = {status.step_id for status in statuses if status.is_default_status}
+    errors += [
+        f"Step '{step.name}' has no default status."
+        for step in steps
+        if step.pk not in with_default
+    ]
+
+    for transition in transitions:
+        if transition.condition:
+            parsed = parse_condition(transition.condition)
+            if not parsed.is_valid:
+                errors.append(
+                    f"The condition of the transition from '{names.get(transition.from_step_id)}' "
+                    f"to '{names.get(transition.to_step_id)}' can't be parsed: {parsed.error}"
+                )
+    return errors
+
+
+def get_plan_warnings(steps, transitions):
+    """
+    Returns a description of the steps of a workflow definition that can't be reached
+    from its initial step. Instances still at them can run, but no new one gets there.
+    """
+    initial = [step for step in steps if step.is_initial_step]
+    if len(initial) != 1:
+        return []  # Reported as an error
+
+    next_steps = {}
+    for transition in transitions:
+        next_steps.setdefault(transition.from_step_id, []).append(transition.to_step_id)
+    names = {step.pk: step.name for step in steps}
+    reachable = {initial[0].pk}
+    pending = [initial[0].pk]
+    while pending:
+        for step_id in next_steps.get(pending.pop(), ()):
+            if step_id in names and step_id not in reachable:
+                reachable.add(step_id)
+                pending.append(step_id)
+    return [
+        f"Step '{step.name}' can't be reached from the initial step."
+        for step in steps
+        if step.pk not in reachable
+    ]
+
+
+def compile_plan(steps, statuses, transitions):
+    """
+    Compiles the rows of a workflow definition (see ``definitions.load_definition_rows``)
+    into a JSON-serializable plan, including the errors and warnings found validating
+    them.
+    """
+    fields = _fields()
+    rows = {"steps": steps, "statuses": statuses, "transitions": transitions}
+    plan = {"format": PLAN_FORMAT, "fields": fields}
+    for name, objects in rows.items():
+        plan[name] = [
+            [getattr(obj, attname) for attname in fields[name]] for obj in objects
+        ]
+    plan["errors"] = get_plan_errors(steps, statuses, transitions)
+    plan["warnings"] = get_plan_warnings(steps, transitions)
+    return plan
+
+
+def is_current_plan(plan):
+    """Whether ``plan`` was compiled by this version, for the current definition fields."""
+    return (
+        bool(plan)
+        and plan.get("format") == PLAN_FORMAT
+        and plan.get("fields") == _fields()
+    )
+
+
+def get_plan_rows(workflow):
+    """
+    Returns the steps, statuses and transitions stored in the plan of ``workflow``, as
+    model instances, or None if it has no current plan.
+    """
+    plan = workflow.plan
+    if not is_current_plan(plan):
+        return None
+    using = workflow._state.db
+    rows = []
+    for name, model in (
+        ("steps", WorkflowStep),
+        ("statuses", WorkflowStepStatus),
+        ("transitions", WorkflowTransition),
+    ):
+        attnames = plan["fields"][name]
+        rows.append([model.from_db(using, attnames, values) for values in plan[name]])
+    if plan["errors"]:
+        logger.warning(
+            f"Workflow '{workflow.name}' has definition errors: {plan['errors']}"
+        )
+    return tuple(rows)
+
+
+def store_plan(workflow, rows):
+    """
+    Compiles ``rows`` (read after ``workflow``) into the plan of ``workflow``, unless
+    its plan changed in the meantime, e.g. compiled by a concurrent definition change.
+    """
+    plan = compile_plan(*rows)
+    if workflow.plan is None:
+        unchanged = Workflow.objects.filter(pk=workflow.pk, plan__isnull=True)
+    else:
+        unchanged = Workflow.objects.filter(pk=workflow.pk, plan=workflow.plan)
+    if unchanged.update(plan=plan):
+        workflow.plan = plan
+    return plan
+
+
+def refresh_workflow_plans(workflow_ids):
+    """
+    Compiles the plans of the workflows with ``workflow_ids`` from their rows, in the
+    current transaction.
+    """
+    from .definitions import load_definition_rows
+
+    for workflow_id in workflow_ids:
+        plan = compile_plan(*load_definition_rows(workflow_id))
+        Workflow.objects.filter(pk=workflow_id).update(plan=plan)
+        if plan["errors"]:
+            logger.info(
+                f"Workflow {workflow_id} has definition errors: {plan['errors']}"
+            )
+
+
+class _PendingPlans(CommitHook):
+    """
+    Workflows whose plans to compile once the transaction (or savepoint) they changed
+    in commits.
+    """
+
+    def __init__(self, using):
+        super().__init__(using)
+        self.workflow_ids = set()
+
+    def run(self):
+        refresh_workflow_plans(sorted(self.workflow_ids))
+
+
+def schedule_plans(workflow_ids):
+    """
+    Clears the plans of the workflows with ``workflow_ids`` and compiles them once the
+    current transaction commits (straight away outside of one). Called whenever a
+    definition row is saved or deleted.
+    """
+    workflow_ids = set(workflow_ids)
+    if not transaction.get_connection().in_atomic_block:
+        refresh_workflow_plans(sorted(workflow_ids))
+        return
+    # Also undoes plans stored by loads since the previous change
+    Workflow.objects.filter(pk__in=workflow_ids, plan__isnull=False).update(plan=None)
+
+    for scheduled in get_pending_hooks(_PendingPlans):
+        workflow_ids -= scheduled.workflow_ids
+    if workflow_ids:
+        get_commit_hook(_PendingPlans).workflow_ids |= workflow_ids
+
+
+def get_workflow_errors(workflow):
+    """Returns the definition errors of ``workflow``, from its plan if it is current."""
+    from .definitions import load_definition_rows
+
+    if is_current_plan(workflow.plan):
+        return workflow.plan["errors"]
+    return get_plan_errors(*load_definition_rows(workflow))
+
+
+def get_workflow_warnings(workflow):
+    """Returns the definition warnings of ``workflow``, from its plan if it is current."""
+    from .definitions import load_definition_rows
+
+    if is_current_plan(workflow.plan):
+        return workflow.plan["warnings"]
+    steps, _, transitions = load_definition_rows(workflow)
+    return get_plan_warnings(steps, transitions)
+
+
+@checks.register(checks.Tags.database)
+def check_workflow_plans(app_configs=None, databases=None, **kwargs):
+    """
+    Reports the definition errors and warnings of every workflow
+    (``manage.py check --database default``).
+    """
+    if databases is None or "default" not in databases:
+        return []
+    try:
+        workflows = list(Workflow.objects.all())
+    except DatabaseError:  # Not migrated yet
+        return []
+    messages = []
+    for workflow in workflows:
+        messages += [
+            checks.Error(
+                f"Workflow '{workflow.name}' is invalid: {error}",
+                hint="Its instances fail at the affected steps until this is fixed.",
+                obj=workflow,
+                id="django_steps.E001",
+            )
+            for error in get_workflow_errors(workflow)
+        ]
+        messages += [
+            checks.Warning(
+                f"Workflow '{workflow.name}' has an unused step: {warning}",
+                obj=workflow,
+                id="django_steps.W001",
+            )
+            for warning in get_workflow_warnings(workflow)
+        ]
+    return messages
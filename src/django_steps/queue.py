@@ -0,0 +1,467 @@
+"""
+Durable queue of workflow operations.
+
+Operations (status updates, advancement, cancellation...) can be queued with
+``enqueue_operation`` instead of being run during the web request, and are run by
+workers started with ``manage.py steps_worker``. Workers claim batches of pending
+operations, highest priority first, using ``SELECT ... FOR UPDATE SKIP LOCKED`` where
+the database supports it, so any number of worker processes can drain the queue
+without waiting on each other. A worker renews its claim on each operation right
+before running it, and skips the operation if the claim was released meanwhile, so an
+operation released from a slow batch is not run twice.
+
+Deferred advancements (see ``schedule_advancement``) are queued operations as well,
+run by a local thread pool as soon as the status update is committed.
+"""
+
+import contextvars
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .conf import get_setting
+from .exceptions import WorkflowConflictError
+from .models import WorkflowOperation
+from .signals import operation_finished
+
+logger = logging.getLogger(__name__)
+
+Kind = WorkflowOperation.Kind
+State = WorkflowOperation.State
+
+
+def _run_update_status(instance, operation):
+    from .services import update_workflow_step_status
+
+    return update_workflow_step_status(
+        instance, operation.status_name, context_data=operation.context_data
+    )
+
+
+def _run_advance(instance, operation):
+    from .services import advance_workflow_instance
+
+    return advance_workflow_instance(instance, context_data=operation.context_data)
+
+
+def _run_cancel(instance, operation):
+    from .services import cancel_workflow_instance
+
+    return cancel_workflow_instance(instance)
+
+
+def _run_set_on_hold(instance, operation):
+    from .services import set_workflow_on_hold
+
+    return set_workflow_on_hold(instance)
+
+
+def _run_resume(instance, operation):
+    from .services import resume_workflow_instance
+
+    return resume_workflow_instance(instance)
+
+
+HANDLERS = {
+    Kind.UPDATE_STATUS: _run_update_status,
+    Kind.ADVANCE: _run_advance,
+    Kind.CANCEL: _run_cancel,
+    Kind.SET_ON_HOLD: _run_set_on_hold,
+    Kind.RESUME: _run_resume,
+}
+
+
+def enqueue_operation(
+    workflow_instance,
+    kind: str,
+    status_name: str = "",
+    context_data: dict = None,
+    priority: int = 0,
+    delay: float = None,
+) -> WorkflowOperation:
+    """
+    Queues an operation on a workflow instance, to be run by a worker.
+
+    Args:
+        workflow_instance (WorkflowInstance): The instance the operation applies to.
+        kind (str): One of WorkflowOperation.Kind.
+        status_name (str): The new status name, required for status updates.
+        context_data (dict, optional): Data to provide to CEL expressions (must be JSON serializable).
+        priority (int): Operations with a higher priority are run first.
+        delay (float, optional): Seconds to wait before the operation may run.
+
+    Returns:
+        WorkflowOperation: The queued operation.
+
+    Raises:
+        ValueError: If the operation is unknown or a status update has no status name.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown workflow operation '{kind}'.")
+    if kind == Kind.UPDATE_STATUS and not status_name:
+        raise ValueError("status_name is required to queue a status update.")
+
+    available_at = timezone.now()
+    if delay:
+        available_at += timedelta(seconds=delay)
+    operation = WorkflowOperation.objects.create(
+        instance=workflow_instance,
+        kind=kind,
+        status_name=status_name or "",
+        context_data=context_data,
+        priority=priority,
+        available_at=available_at,
+    )
+    logger.debug(f"Queued {operation}.")
+    return operation
+
+
+def claim_operations(batch_size: int = 10) -> list:
+    """
+    Claims up to ``batch_size`` pending operations, highest priority first, and marks
+    them as running.
+
+    Where the database supports it, the pending rows are selected with
+    ``FOR UPDATE SKIP LOCKED`` so concurrent workers skip each other's candidates
+    instead of waiting for them. Elsewhere (SQLite, which serializes writes anyway)
+    the conditional UPDATE on still-pending rows is what makes the claim exclusive.
+
+    Returns:
+        list: The claimed WorkflowOperation objects, with their instance loaded.
+    """
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    using = router.db_for_write(WorkflowOperation)
+
+    with transaction.atomic(using=using):
+        pending = (
+            WorkflowOperation.objects.using(using)
+            .filter(state=State.PENDING, available_at__lte=now)
+            .order_by("-priority", "available_at", "id")
+        )
+        if connections[using].features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        operation_ids = list(pending.values_list("pk", flat=True)[:batch_size])
+        if not operation_ids:
+            return []
+        WorkflowOperation.objects.using(using).filter(
+            pk__in=operation_ids, state=State.PENDING
+        ).update(
+            state=State.RUNNING,
+            claimed_by=token,
+            claimed_at=now,
+            attempts=F("attempts") + 1,
+        )
+
+    return list(
+        WorkflowOperation.objects.using(using)
+        .filter(claimed_by=token, state=State.RUNNING)
+        .select_related("instance")
+        .order_by("-priority", "available_at", "id")
+    )
+
+
+def claim_operation(operation_id) -> WorkflowOperation | None:
+    """
+    Claims a single pending operation, whether or not it is available yet.
+
+    Returns:
+        WorkflowOperation: The claimed operation, with its instance loaded.
+        None: If the operation is no longer pending (e.g. a worker claimed it first).
+    """
+    token = uuid.uuid4().hex
+    claimed = WorkflowOperation.objects.filter(
+        pk=operation_id, state=State.PENDING
+    ).update(
+        state=State.RUNNING,
+        claimed_by=token,
+        claimed_at=timezone.now(),
+        attempts=F("attempts") + 1,
+    )
+    if not claimed:
+        return None
+    return WorkflowOperation.objects.select_related("instance").get(
+        pk=operation_id, claimed_by=token
+    )
+
+
+def _record(operation, **fields):
+    # Only the holder of the claim, as last renewed, may record the outcome
+    return WorkflowOperation.objects.filter(
+        pk=operation.pk,
+        claimed_by=operation.claimed_by,
+        claimed_at=operation.claimed_at,
+        state=State.RUNNING,
+    ).update(**fields)
+
+
+def _renew_claim(operation):
+    """
+    Restarts the claim timeout of an operation about to run. Returns False if the
+    claim was released in the meantime (see ``release_stale_operations``).
+    """
+    claimed_at = timezone.now()
+    if not _record(operation, claimed_at=claimed_at):
+        return False
+    operation.claimed_at = claimed_at
+    return True
+
+
+def _finish(operation, success, error=""):
+    operation.state = State.DONE if success else State.FAILED
+    operation.last_error = error
+    operation.finished_at = timezone.now()
+    recorded = _record(
+        operation,
+        state=operation.state,
+        last_error=error,
+        finished_at=operation.finished_at,
+    )
+    if not recorded:
+        return False
+    operation_finished.send(
+        sender=WorkflowOperation,
+        operation=operation,
+        instance=operation.instance,
+        success=success,
+    )
+    return True
+
+
+def _retry_or_fail(operation, error, delay):
+    if operation.attempts >= get_setting("QUEUE_MAX_ATTEMPTS"):
+        logger.error(f"{operation} failed after {operation.attempts} attempts: {error}")
+        _finish(operation, False, error)
+        return
+    _record(
+        operation,
+        state=State.PENDING,
+        last_error=error,
+        claimed_by="",
+        available_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def run_operation(operation: WorkflowOperation) -> bool:
+    """
+    Runs a claimed operation and records its outcome. Operations whose claim was
+    released since they were claimed are skipped: they are run by another worker.
+
+    Operations that raise are retried later (conflicts with a concurrent update right
+    away) until ``QUEUE_MAX_ATTEMPTS`` is reached. Operations that can't be applied
+    (the service returns False) are marked as failed without retrying.
+
+    Returns:
+        bool: True if the operation was applied.
+    """
+    if not _renew_claim(operation):
+        logger.warning(f"{operation} was released before it could run, skipping it.")
+        return False
+
+    handler = HANDLERS[operation.kind]
+    try:
+        success = handler(operation.instance, operation)
+    except WorkflowConflictError as e:
+        logger.info(f"{operation} lost a race with a concurrent update, retrying.")
+        _retry_or_fail(operation, str(e), delay=0)
+        return False
+    except Exception as e:
+        logger.exception(f"Error running {operation}: {e}")
+        delay = get_setting("QUEUE_RETRY_DELAY") * operation.attempts
+        _retry_or_fail(operation, f"{type(e).__name__}: {e}", delay=delay)
+        return False
+
+    if success:
+        _finish(operation, True)
+    else:
+        _finish(
+            operation,
+            False,
+            "The operation could not be applied to the workflow instance.",
+        )
+    return success
+
+
+def process_operations(batch_size: int = 10) -> int:
+    """
+    Claims and runs one batch of pending operations.
+
+    Returns:
+        int: The number of operations claimed (0 when the queue is empty).
+    """
+    operations = claim_operations(batch_size)
+    for operation in operations:
+        run_operation(operation)
+    return len(operations)
+
+
+def release_stale_operations(timeout: float = None) -> int:
+    """
+    Puts back in the queue the operations claimed more than ``timeout`` seconds ago
+    (``QUEUE_CLAIM_TIMEOUT`` by default) by a worker that never finished them.
+    Operations already attempted ``QUEUE_MAX_ATTEMPTS`` times are marked as failed
+    instead, so an operation killing its worker isn't run forever.
+
+    Returns:
+        int: The number of operations released or marked as failed.
+    """
+    if timeout is None:
+        timeout = get_setting("QUEUE_CLAIM_TIMEOUT")
+    max_attempts = get_setting("QUEUE_MAX_ATTEMPTS")
+    stale = WorkflowOperation.objects.filter(
+        state=State.RUNNING,
+        claimed_at__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+
+    failed = 0
+    for operation in stale.filter(attempts__gte=max_attempts).select_related(
+        "instance"
+    ):
+        logger.error(
+            f"{operation} was not finished by its worker after {operation.attempts} "
+            f"attempts, marking it as failed."
+        )
+        # Unless the worker renewed its claim in the meantime
+        failed += _finish(
+            operation,
+            False,
+            f"The worker running the operation stopped before it finished "
+            f"{operation.attempts} times.",
+        )
+
+    released = stale.filter(attempts__lt=max_attempts).update(
+        state=State.PENDING, claimed_by=""
+    )
+    if released:
+        logger.warning(
+            f"Released {released} workflow operations claimed by a stalled worker."
+        )
+    return released + failed
+
+
+def _release_connections(close=False):
+    # Connections inside a transaction (e.g. a test case) are left alone
+    for connection in connections.all(initialized_only=True):
+        if connection.in_atomic_block:
+            continue
+        if close:
+            connection.close()
+        else:
+            connection.close_if_unusable_or_obsolete()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_setting("DEFERRED_ADVANCEMENT_THREADS"),
+                thread_name_prefix="django_steps",
+            )
+        return _executor
+
+
+def _run_deferred(operation_id):
+    try:
+        operation = claim_operation(operation_id)
+        if operation is not None:
+            run_operation(operation)
+    except Exception as e:
+        # The operation stays in the queue for the workers (or release_stale_operations)
+        logger.exception(
+            f"Error running deferred workflow operation {operation_id}: {e}"
+        )
+    finally:
+        _release_connections(close=True)
+
+
+def schedule_advancement(
+    workflow_instance, context_data: dict = None
+) -> WorkflowOperation:
+    """
+    Queues the advancement of a workflow instance whose status was just set to a
+    completion status, to run once the current transaction is committed.
+
+    With the ``"thread"`` backend (``DEFERRED_ADVANCEMENT_BACKEND``), the advancement is
+    submitted to a local thread pool on commit; it is left to the ``steps_worker``
+    workers otherwise, or if the process exits before running it.
+
+    Args:
+        workflow_instance (WorkflowInstance): The instance to advance.
+        context_data (dict, optional): Data to provide to CEL expressions (must be JSON serializable).
+
+    Returns:
+        WorkflowOperation: The queued advancement, whose state reports the outcome.
+    """
+    operation = enqueue_operation(
+        workflow_instance, Kind.ADVANCE, context_data=context_data
+    )
+    if get_setting("DEFERRED_ADVANCEMENT_BACKEND") == "thread":
+        transaction.on_commit(
+            # The worker thread keeps the context variables (e.g. the actor) of the request
+            lambda: _get_executor().submit(
+                contextvars.copy_context().run, _run_deferred, operation.pk
+            ),
+            using=router.db_for_write(WorkflowOperation),
+        )
+    return operation
+
+
+async def aschedule_advancement(
+    workflow_instance, context_data: dict = None
+) -> WorkflowOperation:
+    """
+    Async counterpart of ``schedule_advancement``. Outside of a transaction, the
+    advancement is handed to the thread pool as soon as it is queued.
+    """
+    return await sync_to_async(schedule_advancement)(workflow_instance, context_data)
+
+
+def get_latest_advancement(workflow_instance) -> WorkflowOperation | None:
+    """
+    Returns the most recently queued advancement of a workflow instance, to poll the
+    outcome of a deferred advancement, or None if none was ever queued.
+    """
+    return (
+        WorkflowOperation.objects.filter(instance=workflow_instance, kind=Kind.ADVANCE)
+        .order_by("-created_at", "-id")
+        .first()
+    )
+
+
+def run_worker(
+    stop_event, batch_size: int = 10, poll_interval: float = 1.0, once: bool = False
+):
+    """
+    Drains the queue until ``stop_event`` is set, waiting ``poll_interval`` seconds
+    whenever it is empty. With ``once``, returns as soon as the queue is empty.
+
+    Returns:
+        int: The number of operations processed.
+    """
+    processed = 0
+    try:
+        while not stop_event.is_set():
+            _release_connections()
+            claimed = process_operations(batch_size)
+            processed += claimed
+            if not claimed:
+                if release_stale_operations():
+                    continue
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+    finally:
+        _release_connections(close=True)
+    return processed
@@ -0,0 +1,48 @@
+"""
+Results returned by the bulk operations.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BulkResult:
+    """
+    Outcome of a bulk operation, as lists of object or instance ids.
+    """
+
+    # Objects the operation was applied to
+    succeeded: list = field(default_factory=list)
+    # Objects left untouched because they already were in the requested state
+    unchanged: list = field(default_factory=list)
+    # Objects the operation could not be applied to
+    skipped: list = field(default_factory=list)
+    # Objects the operation was only partially applied to (e.g. status updated but not advanced)
+    failed: list = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.succeeded)
+
+    def outcomes(self):
+        """Returns a dictionary mapping each id to its outcome ("succeeded", "skipped"...)."""
+        outcomes = {}
+        for outcome in ("succeeded", "unchanged", "skipped", "failed"):
+            outcomes.update(dict.fromkeys(getattr(self, outcome), outcome))
+        return outcomes
+
+
+@dataclass
+class BulkCounts:
+    """
+    Outcome of a set-based bulk operation, as numbers of instances.
+    """
+
+    # Instances the operation was applied to
+    applied: int = 0
+    # Instances left untouched because of their state (already completed, already on hold...)
+    skipped: int = 0
+    # Instances the operation could not be applied to (missing status, no current step...)
+    failed: int = 0
+
+    def __len__(self):
+        return self.applied
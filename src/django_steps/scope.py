@@ -0,0 +1,68 @@
+"""
+Request-scoped memoization.
+
+A scope is opened for the duration of each request by
+``django_steps.middleware.WorkflowScopeMiddleware``, or explicitly with
+``workflow_scope()`` (management commands, tasks, tests...). Outside of a scope
+nothing is memoized. The scope lives in a context variable, so it follows the
+request across threads and ``async`` code.
+"""
+
+import contextlib
+from contextvars import ContextVar
+
+_current_scope = ContextVar("django_steps_scope", default=None)
+
+
+class WorkflowScope:
+    """
+    Holds named memo dictionaries for the lifetime of a request.
+    """
+
+    __slots__ = ("_stores",)
+
+    def __init__(self):
+        self._stores = {}
+
+    def store(self, name):
+        """Returns the memo dictionary called ``name``, creating it if needed."""
+        store = self._stores.get(name)
+        if store is None:
+            store = self._stores[name] = {}
+        return store
+
+    def peek(self, name):
+        """Returns the memo dictionary called ``name`` if it was created, else None."""
+        return self._stores.get(name)
+
+    def clear(self, name=None):
+        """Empties the memo dictionary called ``name``, or all of them."""
+        if name is None:
+            self._stores.clear()
+        else:
+            self._stores.pop(name, None)
+
+
+def get_current_scope():
+    """Returns the active WorkflowScope, or None outside of a scope."""
+    return _current_scope.get()
+
+
+@contextlib.contextmanager
+def workflow_scope():
+    """
+    Opens a memoization scope for the enclosed block.
+
+    Nested scopes share the outermost one, which is discarded when it exits.
+    """
+    scope = _current_scope.get()
+    if scope is not None:
+        yield scope
+        return
+
+    scope = WorkflowScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
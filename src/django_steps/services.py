@@ -1,10 +1,32 @@
 import logging
+from itertools import islice
 
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
 
-from .models import Workflow, WorkflowInstance
+from .context import as_context_provider, get_content_contexts
+from .definitions import (
+    aget_workflow_definition,
+    aget_workflow_definition_by_name,
+    get_workflow_definition_by_name,
+)
+from .identity import NOT_MAPPED, forget_instances, get_mapped_instance, map_instance
+from .models import (
+    Workflow,
+    WorkflowInstance,
+    WorkflowInstanceEvent,
+    get_default_status,
+    get_object_id_values,
+    object_id_field_name,
+)
+from .queue import aschedule_advancement, schedule_advancement
+from .results import BulkResult
+from .scope import get_current_scope
+from .state_cache import invalidate_instances
 
 logger = logging.getLogger(__name__)
 
@@ -31,15 +53,15 @@ def start_workflow_instance(
         raise ValueError("content_object must be a saved Django model instance.")
 
     try:
-        workflow = Workflow.objects.get(name=workflow_name)
+        workflow = get_workflow_definition_by_name(workflow_name).workflow
         content_type = ContentType.objects.get_for_model(content_object)
 
         # Check if an active instance for this workflow already exists for this object
-        existing_instance = WorkflowInstance.objects.filter(
-            workflow=workflow,
-            content_type=content_type,
-            object_id=str(content_object.pk),
-        ).first()
+        existing_instance = (
+            WorkflowInstance.objects.filter(workflow=workflow)
+            .for_object(content_type, content_object.pk)
+            .first()
+        )
 
         # If an existing instance is found and it's not yet completed, return it.
         # This prevents duplicate active workflows for the same object.
@@ -60,14 +82,16 @@ def start_workflow_instance(
             # Use the method defined on the WorkflowInstance model to handle step/status initialization
             success = workflow_instance.start_workflow()
             if not success:
-                logger.error(f"Failed to start workflow '{workflow_name}' for {content_type.model} (ID: {content_object.pk}).")
+                logger.error(
+                    f"Failed to start workflow '{workflow_name}' for {content_type.model} (ID: {content_object.pk})."
+                )
                 return None
 
-            # Refresh the instance to ensure we have current data
-            workflow_instance.refresh_from_db()
             logger.info(
                 f"Workflow '{workflow_name}' started successfully for {content_type.model} (ID: {content_object.pk})."
             )
+            # Now the most recent instance of the object
+            _map_instance(content_object, content_type, None, workflow_instance)
             return workflow_instance
 
     except Workflow.DoesNotExist:
@@ -78,8 +102,216 @@ def start_workflow_instance(
         raise  # Re-raise the exception after logging for debugging
 
 
+async def _aget_content_type(content_object):
+    # Served from the ContentType manager's cache once the content type was looked up
+    return await sync_to_async(ContentType.objects.get_for_model)(content_object)
+
+
+async def astart_workflow_instance(
+    workflow_name: str, content_object
+) -> WorkflowInstance | None:
+    """
+    Async counterpart of ``start_workflow_instance``.
+
+    The instance is created directly at the initial step's default status, with a
+    single INSERT.
+
+    Args:
+        workflow_name (str): The name of the Workflow to instantiate.
+        content_object: The Django model instance for which the workflow is being started.
+
+    Returns:
+        WorkflowInstance: The newly created and started WorkflowInstance.
+        None: If the workflow cannot be started (e.g., Workflow not found, no initial step).
+
+    Raises:
+        ValueError: If the content_object is not a saved Django model instance.
+    """
+    if not hasattr(content_object, "pk") or content_object.pk is None:
+        raise ValueError("content_object must be a saved Django model instance.")
+
+    try:
+        definition = await aget_workflow_definition_by_name(workflow_name)
+    except Workflow.DoesNotExist:
+        logger.error(f"Workflow '{workflow_name}' not found.")
+        return None
+    content_type = await _aget_content_type(content_object)
+
+    existing_instance = (
+        await WorkflowInstance.objects.filter(workflow_id=definition.id)
+        .for_object(content_type, content_object.pk)
+        .afirst()
+    )
+    if existing_instance:
+        _, step_definition, step_status = existing_instance._resolve_state(definition)
+        if not WorkflowInstance._is_completed_state(step_definition, step_status):
+            logger.warning(
+                f"An active workflow instance for '{workflow_name}' "
+                f"already exists for {content_type.model} (ID: {content_object.pk}). "
+                "Returning existing instance."
+            )
+            return existing_instance
+
+    first_step = definition.initial_step
+    if not first_step or not first_step.default_status:
+        logger.error(
+            f"Failed to start workflow '{workflow_name}' for {content_type.model} (ID: {content_object.pk}): "
+            "no initial step or its initial step has no default status."
+        )
+        return None
+
+    workflow_instance = WorkflowInstance(
+        workflow=definition.workflow,
+        content_type=content_type,
+        **get_object_id_values(content_object._meta.concrete_model, content_object.pk),
+        current_step=first_step.step,
+        current_step_status=first_step.default_status,
+    )
+    workflow_instance._add_event(WorkflowInstanceEvent.Kind.STARTED, None, None)
+    await workflow_instance._asave_state()
+    logger.info(
+        f"Workflow '{workflow_name}' started successfully for {content_type.model} (ID: {content_object.pk})."
+    )
+    _map_instance(content_object, content_type, None, workflow_instance, definition)
+    return workflow_instance
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _iter_object_chunks(objects, batch_size):
+    """
+    Yields (ContentType, [pk, ...]) chunks of at most ``batch_size`` primary keys.
+
+    Querysets are streamed as primary keys without instantiating their objects.
+    """
+    if isinstance(objects, QuerySet):
+        content_type = ContentType.objects.get_for_model(objects.model)
+        pks = objects.order_by().values_list("pk", flat=True)
+        for chunk in _chunked(pks.iterator(chunk_size=batch_size), batch_size):
+            yield content_type, chunk
+        return
+
+    chunks = {}
+    for content_object in objects:
+        if getattr(content_object, "pk", None) is None:
+            raise ValueError("objects must be saved Django model instances.")
+        content_type = ContentType.objects.get_for_model(content_object)
+        chunk = chunks.setdefault(content_type, [])
+        chunk.append(content_object.pk)
+        if len(chunk) >= batch_size:
+            yield content_type, chunks.pop(content_type)
+    yield from chunks.items()
+
+
+def bulk_start_workflow_instances(
+    workflow_name: str, objects, batch_size: int = 1000
+) -> BulkResult | None:
+    """
+    Starts a workflow for many content objects at once.
+
+    The workflow definition is resolved once; each chunk of ``batch_size`` objects
+    costs one query to find the existing instances and one ``bulk_create`` of
+    instances already set to the initial step and its default status.
+
+    Args:
+        workflow_name (str): The name of the Workflow to instantiate.
+        objects: A QuerySet (streamed as primary keys, without loading the objects)
+                 or an iterable of saved Django model instances.
+        batch_size (int): The number of objects handled per query.
+
+    Returns:
+        BulkResult: ``succeeded`` holds the ids of the objects a workflow was started for,
+                    ``unchanged`` those that already have an active instance and
+                    ``skipped`` those whose instance is already completed.
+        None: If the workflow cannot be started (e.g., Workflow not found, no initial step).
+
+    Raises:
+        ValueError: If an object is not a saved Django model instance.
+    """
+    try:
+        definition = get_workflow_definition_by_name(workflow_name)
+    except Workflow.DoesNotExist:
+        logger.error(f"Workflow '{workflow_name}' not found.")
+        return None
+
+    first_step = definition.initial_step
+    if not first_step or not first_step.default_status:
+        logger.error(
+            f"Workflow '{workflow_name}' has no initial step or its initial step has no default status."
+        )
+        return None
+
+    initial_state = WorkflowInstance._state_for(first_step, first_step.default_status)
+    result = BulkResult()
+    for content_type, pks in _iter_object_chunks(objects, batch_size):
+        pks = list(dict.fromkeys(pks))
+        model = content_type.model_class()
+        with transaction.atomic():
+            existing = (
+                WorkflowInstance.objects.filter(workflow_id=definition.id)
+                .for_objects(content_type, pks)
+                .values_list(
+                    object_id_field_name(model),
+                    "current_step_id",
+                    "current_step_status_id",
+                )
+            )
+            existing_ids = set()
+            for object_id, step_id, status_id in existing:
+                existing_ids.add(object_id)
+                step_definition = definition.get_step(step_id)
+                step_status = definition.get_status(status_id)
+                if WorkflowInstance._is_completed_state(step_definition, step_status):
+                    result.skipped.append(object_id)
+                else:
+                    result.unchanged.append(object_id)
+
+            new_ids = [pk for pk in pks if pk not in existing_ids]
+            now = timezone.now()
+            created = WorkflowInstance.objects.bulk_create(
+                [
+                    WorkflowInstance(
+                        workflow=definition.workflow,
+                        content_type=content_type,
+                        **get_object_id_values(model, pk),
+                        current_step=first_step.step,
+                        current_step_status=first_step.default_status,
+                        state=initial_state,
+                        entered_step_at=now,
+                    )
+                    for pk in new_ids
+                ],
+                batch_size=batch_size,
+            )
+            forget_instances()
+            invalidate_instances(created, started=True)
+            # Backends that don't return the new primary keys can't record the start
+            for instance in created:
+                if instance.pk is not None:
+                    instance._add_event(WorkflowInstanceEvent.Kind.STARTED, None, None)
+                    instance._record_events(instance._take_events())
+            result.succeeded.extend(new_ids)
+        logger.debug(
+            f"Started {len(new_ids)} '{workflow_name}' instances for {content_type.model} "
+            f"({len(existing_ids)} already existed)."
+        )
+
+    logger.info(
+        f"Workflow '{workflow_name}' started for {len(result.succeeded)} objects "
+        f"({len(result.unchanged)} already active, {len(result.skipped)} already completed)."
+    )
+    return result
+
+
 def update_workflow_step_status(
-    workflow_instance: WorkflowInstance, new_status_name: str, context_data: dict = None
+    workflow_instance: WorkflowInstance,
+    new_status_name: str,
+    context_data: dict = None,
+    defer_advancement: bool = None,
 ) -> bool:
     """
     Updates the current step's status for a given workflow instance.
@@ -91,9 +323,17 @@ def update_workflow_step_status(
         new_status_name (str): The name of the new WorkflowStepStatus.
         context_data (dict, optional): Data to provide to CEL expressions for evaluation.
                                       If None, it will attempt to extract from content_object.
+        defer_advancement (bool, optional): Only write the new status, and advance the workflow
+                                            in the background once it is committed (see
+                                            ``queue.schedule_advancement``). Defaults to the
+                                            workflow's ``deferred_advancement`` flag.
 
     Returns:
-        bool: True if the status was updated and possibly advanced, False otherwise.
+        bool: True if the status was updated and possibly advanced (or its advancement
+              scheduled), False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
     """
     if not isinstance(workflow_instance, WorkflowInstance):
         raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
@@ -104,13 +344,27 @@ def update_workflow_step_status(
         )
         return False
 
+    if defer_advancement is None:
+        defer_advancement = (
+            workflow_instance._get_definition().workflow.deferred_advancement
+        )
+
     with transaction.atomic():
         # Pass the context_data to the model method
         # The model's update_step_status method will then call _advance_to_next_workflow_step
         # which now accepts context_data
         success = workflow_instance.update_step_status(
-            new_status_name, context_data=context_data
+            new_status_name, context_data=context_data, advance=not defer_advancement
         )
+        if (
+            success
+            and defer_advancement
+            and workflow_instance.current_step_status.is_completion_status
+        ):
+            schedule_advancement(workflow_instance, context_data=context_data)
+            logger.info(
+                f"Advancement of workflow instance {workflow_instance.id} deferred."
+            )
         if success:
             logger.info(
                 f"Workflow instance {workflow_instance.id} status updated to "
@@ -123,6 +377,351 @@ def update_workflow_step_status(
         return success
 
 
+async def aupdate_workflow_step_status(
+    workflow_instance: WorkflowInstance,
+    new_status_name: str,
+    context_data: dict = None,
+    defer_advancement: bool = None,
+) -> bool:
+    """
+    Async counterpart of ``update_workflow_step_status``.
+
+    The status and the advancement are written with a single compare-and-swap UPDATE.
+    Transition conditions are evaluated in the event loop, unless the content object's
+    context has to be loaded from the database, in which case they are evaluated in a
+    worker thread.
+
+    Returns:
+        bool: True if the status was updated and possibly advanced (or its advancement
+              scheduled), False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
+    """
+    if not isinstance(workflow_instance, WorkflowInstance):
+        raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
+
+    definition = await aget_workflow_definition(workflow_instance.workflow_id)
+    _, step_definition, step_status = workflow_instance._resolve_state(definition)
+    if WorkflowInstance._is_completed_state(step_definition, step_status):
+        logger.info(
+            f"Cannot update status: Workflow '{definition.name}' is already completed."
+        )
+        return False
+
+    if defer_advancement is None:
+        defer_advancement = definition.workflow.deferred_advancement
+
+    success = await workflow_instance.aupdate_step_status(
+        new_status_name, context_data=context_data, advance=not defer_advancement
+    )
+    if (
+        success
+        and defer_advancement
+        and workflow_instance.current_step_status.is_completion_status
+    ):
+        await aschedule_advancement(workflow_instance, context_data=context_data)
+        logger.info(
+            f"Advancement of workflow instance {workflow_instance.id} deferred."
+        )
+    if success:
+        logger.info(
+            f"Workflow instance {workflow_instance.id} status updated to "
+            f"'{workflow_instance.current_step_status.name}'."
+        )
+    else:
+        logger.error(
+            f"Failed to update workflow instance {workflow_instance.id} status to '{new_status_name}'."
+        )
+    return success
+
+
+def _load_group_contexts(instances, step_definition, context_provider=None):
+    """
+    Builds the CEL context of the content objects of ``instances`` with one query
+    per content type. Returns a dictionary keyed by instance id.
+    """
+    by_content_type = {}
+    for instance in instances:
+        by_content_type.setdefault(instance.content_type_id, []).append(instance)
+
+    contexts = {}
+    for content_type_id, members in by_content_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            contexts.update((instance.pk, {}) for instance in members)
+            continue
+        pks = {
+            instance.pk: model._meta.pk.to_python(instance.object_id)
+            for instance in members
+        }
+        if context_provider is None:
+            loaded = get_content_contexts(
+                model, pks.values(), step_definition.context_paths
+            )
+        else:
+            loaded = context_provider.load_contexts(
+                model, list(pks.values()), step_definition.context_paths
+            )
+        contexts.update(
+            (pk, loaded.get(object_pk, {})) for pk, object_pk in pks.items()
+        )
+    return contexts
+
+
+def _bulk_update_chunk(instances, new_status_name, context_provider, result):
+    """
+    Applies a status update to already loaded ``instances`` and returns the changed ones.
+    """
+    changed = []
+    # Instances reaching a completion status, grouped by current step
+    groups = {}
+    for instance in instances:
+        definition, step_definition, step_status = instance._resolve_state()
+        if step_definition is None or WorkflowInstance._is_completed_state(
+            step_definition, step_status
+        ):
+            result.skipped.append(instance.pk)
+            continue
+
+        new_step_status = step_definition.get_status(new_status_name)
+        if not new_step_status:
+            logger.error(
+                f"Status '{new_status_name}' is not a valid status for step '{step_definition.step.name}'."
+            )
+            result.skipped.append(instance.pk)
+            continue
+
+        previous_status_id = instance.current_step_status_id
+        if not new_step_status.is_completion_status:
+            if previous_status_id == new_step_status.pk:
+                result.unchanged.append(instance.pk)
+            else:
+                instance.current_step_status = new_step_status
+                instance._add_event(
+                    WorkflowInstanceEvent.Kind.STATUS_CHANGED,
+                    step_definition.id,
+                    previous_status_id,
+                )
+                changed.append(instance)
+                result.succeeded.append(instance.pk)
+            continue
+
+        instance.current_step_status = new_step_status
+        instance._add_event(
+            WorkflowInstanceEvent.Kind.STATUS_CHANGED,
+            step_definition.id,
+            previous_status_id,
+        )
+        changed.append(instance)
+        group = groups.setdefault(
+            (definition.id, step_definition.id), (definition, step_definition, [])
+        )
+        group[2].append(instance)
+
+    now = timezone.now()
+    for definition, step_definition, members in groups.values():
+        if step_definition.is_final_step:
+            for instance in members:
+                instance.completed_at = now
+                instance._add_event(
+                    WorkflowInstanceEvent.Kind.COMPLETED,
+                    step_definition.id,
+                    instance.current_step_status_id,
+                )
+            result.succeeded.extend(instance.pk for instance in members)
+            logger.info(
+                f"Workflow '{definition.name}' completed for {len(members)} instances."
+            )
+            continue
+
+        # Evaluated once for the whole group when no condition needs to be checked
+        transition = step_definition.default_transition
+        if transition is not None:
+            logger.info(
+                f"Unconditional transition from '{step_definition.step.name}' to "
+                f"'{transition.to_step.name}' taken for {len(members)} instances."
+            )
+            next_step_status = get_default_status(definition, transition.to_step)
+            for instance in members:
+                previous_status_id = instance.current_step_status_id
+                instance.current_step = transition.to_step
+                instance.current_step_status = next_step_status
+                instance.entered_step_at = now
+                instance._add_event(
+                    WorkflowInstanceEvent.Kind.ADVANCED,
+                    step_definition.id,
+                    previous_status_id,
+                    transition,
+                )
+            result.succeeded.extend(instance.pk for instance in members)
+            continue
+
+        contexts = _load_group_contexts(members, step_definition, context_provider)
+        for instance in members:
+            transition = step_definition.select_transition(
+                lambda: contexts[instance.pk]
+            )
+            if transition is None:
+                logger.warning(
+                    f"No valid transition found from '{step_definition.step.name}' for workflow "
+                    f"instance {instance.pk}. It will remain at the current step."
+                )
+                result.failed.append(instance.pk)
+                continue
+            previous_status_id = instance.current_step_status_id
+            instance.current_step = transition.to_step
+            instance.current_step_status = get_default_status(
+                definition, transition.to_step
+            )
+            instance.entered_step_at = now
+            instance._add_event(
+                WorkflowInstanceEvent.Kind.ADVANCED,
+                step_definition.id,
+                previous_status_id,
+                transition,
+            )
+            result.succeeded.append(instance.pk)
+
+    return changed
+
+
+def bulk_update_workflow_step_status(
+    instances, new_status_name: str, context_provider=None, batch_size: int = 1000
+) -> BulkResult:
+    """
+    Updates the current step's status of many workflow instances at once, advancing
+    the ones reaching a completion status like update_workflow_step_status would.
+
+    Instances reaching a completion status are grouped by current step: unconditional
+    transitions are resolved once per group, and the contexts needed by conditional
+    transitions are built with one query per content type. Each chunk of ``batch_size``
+    instances is loaded and locked with one query, and written back with ``bulk_update``.
+
+    Args:
+        instances: A QuerySet of WorkflowInstance or an iterable of instance ids.
+        new_status_name (str): The name of the new WorkflowStepStatus.
+        context_provider (optional): A ContextProvider (or a function taking a content
+                                     object) building the CEL contexts instead of the
+                                     providers registered in ``django_steps.context``.
+        batch_size (int): The number of instances handled per query.
+
+    Returns:
+        BulkResult: Instance ids that were updated (and advanced when needed) in
+                    ``succeeded``, already at a non-completion ``new_status_name`` in
+                    ``unchanged``, completed, not started or without such a status in
+                    ``skipped``, and updated but unable to advance in ``failed``. Each
+                    chunk is committed on its own: a chunk reaching a step without a
+                    default status is rolled back and its ids are all in ``failed``,
+                    while the other chunks are still written.
+    """
+    if isinstance(instances, QuerySet):
+        queryset = instances
+    else:
+        queryset = WorkflowInstance.objects.filter(pk__in=list(instances))
+    if context_provider is not None:
+        context_provider = as_context_provider(context_provider)
+
+    result = BulkResult()
+    # Materialize the ids: the rows are updated while going through them
+    instance_ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+    for chunk in _chunked(instance_ids, batch_size):
+        # Ids are only reported once their chunk is committed
+        chunk_result = BulkResult()
+        try:
+            with transaction.atomic():
+                # Locked until the chunk is written, so no concurrent update can be lost
+                instances = list(
+                    WorkflowInstance.objects.select_for_update()
+                    .filter(pk__in=chunk)
+                    .order_by("pk")
+                )
+                changed = _bulk_update_chunk(
+                    instances, new_status_name, context_provider, chunk_result
+                )
+                for instance in changed:
+                    instance.version += 1
+                    instance._sync_lifecycle()
+                WorkflowInstance.objects.bulk_update(
+                    changed,
+                    [
+                        "current_step",
+                        "current_step_status",
+                        "completed_at",
+                        "state",
+                        "entered_step_at",
+                        "version",
+                    ],
+                    batch_size=batch_size,
+                )
+                forget_instances()
+                invalidate_instances(changed)
+                # Inserted with one bulk_create once the chunk is committed
+                for instance in changed:
+                    instance._remember_state()
+                    instance._record_events(instance._take_events())
+        except ImproperlyConfigured as e:
+            logger.error(
+                f"Status '{new_status_name}' not applied to {len(chunk)} workflow instances, "
+                f"their chunk was rolled back: {e}"
+            )
+            result.failed.extend(chunk)
+            continue
+        for outcome in ("succeeded", "unchanged", "skipped", "failed"):
+            getattr(result, outcome).extend(getattr(chunk_result, outcome))
+
+    logger.info(
+        f"Status '{new_status_name}' applied to {len(result.succeeded)} workflow instances "
+        f"({len(result.unchanged)} unchanged, {len(result.skipped)} skipped, "
+        f"{len(result.failed)} could not advance)."
+    )
+    return result
+
+
+def advance_workflow_instance(
+    workflow_instance: WorkflowInstance, context_data: dict = None
+) -> bool:
+    """
+    Attempts to advance a workflow instance whose current status is a completion status,
+    e.g. after a transition could not be taken when the status was set.
+
+    Args:
+        workflow_instance (WorkflowInstance): The instance to advance.
+        context_data (dict, optional): Data to provide to CEL expressions for evaluation.
+                                      If None, it will attempt to extract from content_object.
+
+    Returns:
+        bool: True if the workflow advanced or completed, False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
+    """
+    if not isinstance(workflow_instance, WorkflowInstance):
+        raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
+
+    _, step_definition, step_status = workflow_instance._resolve_state()
+    if (
+        step_definition is None
+        or step_status is None
+        or not step_status.is_completion_status
+        or workflow_instance.completed_at is not None
+    ):
+        logger.info(
+            f"Workflow instance {workflow_instance.id} is not at a completion status, nothing to advance."
+        )
+        return False
+
+    with transaction.atomic():
+        success = workflow_instance._advance_to_next_workflow_step(
+            context_data=context_data
+        )
+        if success:
+            logger.info(f"Workflow instance {workflow_instance.id} has been advanced.")
+        else:
+            logger.error(f"Failed to advance workflow instance {workflow_instance.id}.")
+        return success
+
+
 def cancel_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
     """
     Attempts to cancel a workflow instance.
@@ -132,6 +731,9 @@ def cancel_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
 
     Returns:
         bool: True if the workflow was successfully cancelled, False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
     """
     if not isinstance(workflow_instance, WorkflowInstance):
         raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
@@ -145,6 +747,21 @@ def cancel_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
         return success
 
 
+async def acancel_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
+    """
+    Async counterpart of ``cancel_workflow_instance``.
+    """
+    if not isinstance(workflow_instance, WorkflowInstance):
+        raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
+
+    success = await workflow_instance.acancel_workflow()
+    if success:
+        logger.info(f"Workflow instance {workflow_instance.id} has been cancelled.")
+    else:
+        logger.error(f"Failed to cancel workflow instance {workflow_instance.id}.")
+    return success
+
+
 def set_workflow_on_hold(workflow_instance: WorkflowInstance) -> bool:
     """
     Attempts to put a workflow instance on hold.
@@ -154,6 +771,9 @@ def set_workflow_on_hold(workflow_instance: WorkflowInstance) -> bool:
 
     Returns:
         bool: True if the workflow was successfully put on hold, False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
     """
     if not isinstance(workflow_instance, WorkflowInstance):
         raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
@@ -161,12 +781,31 @@ def set_workflow_on_hold(workflow_instance: WorkflowInstance) -> bool:
     with transaction.atomic():
         success = workflow_instance.set_on_hold()
         if success:
-            logger.info(f"Workflow instance {workflow_instance.id} has been put on hold.")
+            logger.info(
+                f"Workflow instance {workflow_instance.id} has been put on hold."
+            )
         else:
-            logger.error(f"Failed to set workflow instance {workflow_instance.id} on hold.")
+            logger.error(
+                f"Failed to set workflow instance {workflow_instance.id} on hold."
+            )
         return success
 
 
+async def aset_workflow_on_hold(workflow_instance: WorkflowInstance) -> bool:
+    """
+    Async counterpart of ``set_workflow_on_hold``.
+    """
+    if not isinstance(workflow_instance, WorkflowInstance):
+        raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
+
+    success = await workflow_instance.aset_on_hold()
+    if success:
+        logger.info(f"Workflow instance {workflow_instance.id} has been put on hold.")
+    else:
+        logger.error(f"Failed to set workflow instance {workflow_instance.id} on hold.")
+    return success
+
+
 def resume_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
     """
     Attempts to resume a workflow instance from an on-hold state.
@@ -176,6 +815,9 @@ def resume_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
 
     Returns:
         bool: True if the workflow was successfully resumed, False otherwise.
+
+    Raises:
+        WorkflowConflictError: If the instance was modified concurrently; reload it and retry.
     """
     if not isinstance(workflow_instance, WorkflowInstance):
         raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
@@ -189,6 +831,21 @@ def resume_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
         return success
 
 
+async def aresume_workflow_instance(workflow_instance: WorkflowInstance) -> bool:
+    """
+    Async counterpart of ``resume_workflow_instance``.
+    """
+    if not isinstance(workflow_instance, WorkflowInstance):
+        raise TypeError("workflow_instance must be an instance of WorkflowInstance.")
+
+    success = await workflow_instance.aresume_workflow()
+    if success:
+        logger.info(f"Workflow instance {workflow_instance.id} has been resumed.")
+    else:
+        logger.error(f"Failed to resume workflow instance {workflow_instance.id}.")
+    return success
+
+
 def get_workflow_instance_for_object(
     content_object, workflow_name: str | None = None
 ) -> WorkflowInstance | None:
@@ -208,17 +865,22 @@ def get_workflow_instance_for_object(
             logger.warning("Content_object has no pk attribute or pk is None")
             return None
 
+        prefetched = _get_prefetched_instance(content_object, workflow_name)
+        if prefetched is not _NOT_PREFETCHED:
+            return prefetched
+
         content_type = ContentType.objects.get_for_model(content_object)
-        query = WorkflowInstance.objects.filter(
-            content_type=content_type, object_id=str(content_object.pk)
-        )
+        mapped = get_mapped_instance(content_type.pk, content_object.pk, workflow_name)
+        if mapped is not NOT_MAPPED:
+            return mapped
+        query = WorkflowInstance.objects.for_object(content_type, content_object.pk)
     except Exception as e:
         logger.error(f"Error getting workflow instance for object: {e}")
         return None
 
     if workflow_name:
         try:
-            workflow = Workflow.objects.get(name=workflow_name)
+            workflow = get_workflow_definition_by_name(workflow_name).workflow
             query = query.filter(workflow=workflow)
         except Workflow.DoesNotExist:
             logger.warning(
@@ -230,9 +892,185 @@ def get_workflow_instance_for_object(
         # Get the latest instance if multiple (e.g., if you allow re-starting workflows)
         # Or, refine logic to find the *active* instance based on your needs
         instance = query.order_by("-started_at").first()
-        return instance
     except ObjectDoesNotExist:
         return None
     except Exception as e:
-        logger.exception(f"An unexpected error occurred while fetching workflow instance: {e}")
+        logger.exception(
+            f"An unexpected error occurred while fetching workflow instance: {e}"
+        )
+        return None
+    return _map_instance(content_object, content_type, workflow_name, instance)
+
+
+def _map_instance(
+    content_object, content_type, workflow_name, instance, definition=None
+):
+    """
+    Maps the instance found for ``content_object`` in the request's identity map (see
+    ``identity.py``), hydrated from the workflow definition, and returns the object to use.
+    """
+    if get_current_scope() is None:
+        return instance
+    if instance is not None:
+        # Only touches the database if the step is not part of the definition
+        definition, _, _ = instance._resolve_state(definition)
+        WorkflowInstance.content_type.field.set_cached_value(instance, content_type)
+        WorkflowInstance.content_object.set_cached_value(instance, content_object)
+        if workflow_name is None:
+            # The most recent instance is also the most recent of its own workflow
+            map_instance(content_type.pk, content_object.pk, definition.name, instance)
+    return map_instance(content_type.pk, content_object.pk, workflow_name, instance)
+
+
+_NOT_PREFETCHED = object()
+
+
+def _prefetch_cache_name(workflow_name):
+    return f"django_steps:workflow_instance:{workflow_name or ''}"
+
+
+def _get_prefetched_instance(content_object, workflow_name):
+    cache = getattr(content_object, "_prefetched_objects_cache", None)
+    if not cache:
+        return _NOT_PREFETCHED
+    return cache.get(_prefetch_cache_name(workflow_name), _NOT_PREFETCHED)
+
+
+def _load_instances_for_objects(objects, workflow_name):
+    """
+    Returns {(model, pk): WorkflowInstance} for ``objects``, with one query per model.
+    """
+    workflow_id = None
+    if workflow_name:
+        try:
+            workflow_id = get_workflow_definition_by_name(workflow_name).id
+        except Workflow.DoesNotExist:
+            logger.warning(
+                f"Workflow '{workflow_name}' not found when querying for instances."
+            )
+            return {}
+
+    by_model = {}
+    for content_object in objects:
+        if getattr(content_object, "pk", None) is None:
+            logger.warning("Content_object has no pk attribute or pk is None")
+            continue
+        model = content_object._meta.concrete_model
+        by_model.setdefault(model, {})[str(content_object.pk)] = content_object
+
+    found = {}
+    for model, objects_by_id in by_model.items():
+        query = WorkflowInstance.objects.for_objects(
+            ContentType.objects.get_for_model(model),
+            [content_object.pk for content_object in objects_by_id.values()],
+        )
+        if workflow_id is not None:
+            query = query.filter(workflow_id=workflow_id)
+        # Most recently started first, so the first instance of each object wins
+        for instance in query.order_by("-started_at"):
+            content_object = objects_by_id[str(instance.object_id)]
+            key = (model, content_object.pk)
+            if key in found:
+                continue
+            # The workflow, step and status come from the cached definition
+            instance._resolve_state()
+            WorkflowInstance.content_object.set_cached_value(instance, content_object)
+            found[key] = instance
+    return found
+
+
+def get_workflow_instances_for_objects(
+    objects, workflow_name: str | None = None
+) -> dict:
+    """
+    Retrieves the workflow instances of many content objects at once, with one query
+    per model instead of one per object. The instances' workflow, current step and
+    current step status are taken from the cached workflow definitions, and their
+    content object is the one passed in, so none of them costs another query.
+
+    Args:
+        objects: An iterable of saved Django model instances.
+        workflow_name (str, optional): The name of the specific workflow to find.
+
+    Returns:
+        dict: The most recently started WorkflowInstance of each object that has one,
+              keyed by the object's pk. Objects of different models sharing a pk
+              collide; use ``prefetch_workflow_instances`` for such lists.
+    """
+    return {
+        pk: instance
+        for (_, pk), instance in _load_instances_for_objects(
+            objects, workflow_name
+        ).items()
+    }
+
+
+def prefetch_workflow_instances(objects, workflow_name: str | None = None) -> list:
+    """
+    Loads the workflow instances of ``objects`` like ``get_workflow_instances_for_objects``
+    and attaches them to the objects, so that ``get_workflow_instance_for_object`` (with
+    the same ``workflow_name``) returns them without a query. Like any prefetched data,
+    they are discarded by ``refresh_from_db()``.
+
+    See also ``django_steps.managers.WorkflowQuerySetMixin.prefetch_workflow_instances``.
+
+    Returns:
+        list: The objects.
+    """
+    objects = list(objects)
+    found = _load_instances_for_objects(objects, workflow_name)
+    cache_name = _prefetch_cache_name(workflow_name)
+    for content_object in objects:
+        if getattr(content_object, "pk", None) is None:
+            continue
+        if not hasattr(content_object, "_prefetched_objects_cache"):
+            content_object._prefetched_objects_cache = {}
+        content_object._prefetched_objects_cache[cache_name] = found.get(
+            (content_object._meta.concrete_model, content_object.pk)
+        )
+    return objects
+
+
+async def aget_workflow_instance_for_object(
+    content_object, workflow_name: str | None = None
+) -> WorkflowInstance | None:
+    """
+    Async counterpart of ``get_workflow_instance_for_object``.
+    """
+    if not hasattr(content_object, "pk") or content_object.pk is None:
+        logger.warning("Content_object has no pk attribute or pk is None")
+        return None
+
+    prefetched = _get_prefetched_instance(content_object, workflow_name)
+    if prefetched is not _NOT_PREFETCHED:
+        return prefetched
+
+    content_type = await _aget_content_type(content_object)
+    mapped = get_mapped_instance(content_type.pk, content_object.pk, workflow_name)
+    if mapped is not NOT_MAPPED:
+        return mapped
+    query = WorkflowInstance.objects.for_object(content_type, content_object.pk)
+    if workflow_name:
+        try:
+            definition = await aget_workflow_definition_by_name(workflow_name)
+        except Workflow.DoesNotExist:
+            logger.warning(
+                f"Workflow '{workflow_name}' not found when querying for instance."
+            )
+            return None
+        query = query.filter(workflow_id=definition.id)
+
+    try:
+        instance = await query.order_by("-started_at").afirst()
+    except Exception as e:
+        logger.exception(
+            f"An unexpected error occurred while fetching workflow instance: {e}"
+        )
         return None
+
+    definition = None
+    if instance is not None and get_current_scope() is not None:
+        definition = await aget_workflow_definition(instance.workflow_id)
+    return _map_instance(
+        content_object, content_type, workflow_name, instance, definition
+    )
@@ -0,0 +1,120 @@
+"""
+Signals sent by django_steps, and the receivers keeping cached workflow definitions
+coherent, in this process and (through the shared definition generations) in every
+other one, as well as the cached and mapped states of deleted instances.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .context import forget_content_contexts, has_content_contexts
+from .definitions import bump_definition_generation, registry
+from .models import (
+    Workflow,
+    WorkflowInstance,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
+)
+from .identity import forget_instances
+from .plans import schedule_plans
+from .state_cache import forget_instance
+
+# Sent once a queued operation (including a deferred advancement) is done or has
+# definitively failed, with the ``operation``, its workflow ``instance`` and ``success``.
+operation_finished = Signal()
+
+
+def _workflow_id_for_step(step_id):
+    workflow_id = registry.find_workflow_id_for_step(step_id)
+    if workflow_id is None:
+        workflow_id = (
+            WorkflowStep.objects.filter(pk=step_id)
+            .values_list("workflow_id", flat=True)
+            .first()
+        )
+    return workflow_id
+
+
+def _invalidate(workflow_ids=(), step_ids=()):
+    for workflow_id in workflow_ids:
+        registry.invalidate(workflow_id)
+    for step_id in step_ids:
+        registry.invalidate_step(step_id)
+
+
+def _definition_changed(workflow_ids=(), step_ids=()):
+    workflow_ids = set(workflow_ids)
+    workflow_ids.update(_workflow_id_for_step(step_id) for step_id in step_ids)
+    workflow_ids.discard(None)
+
+    def on_commit():
+        # Invalidate again in case another thread reloaded the old rows meanwhile,
+        # then let the other processes know.
+        _invalidate(workflow_ids, step_ids)
+        for workflow_id in workflow_ids:
+            bump_definition_generation(workflow_id)
+
+    # Compiled once the transaction commits, before the callback below runs
+    schedule_plans(workflow_ids)
+    # Invalidate straight away so the current transaction sees its own changes
+    _invalidate(workflow_ids, step_ids)
+    transaction.on_commit(on_commit)
+
+
+@receiver(post_save, sender=Workflow, dispatch_uid="django_steps_workflow_saved")
+@receiver(post_delete, sender=Workflow, dispatch_uid="django_steps_workflow_deleted")
+def workflow_changed(sender, instance, **kwargs):
+    _definition_changed(workflow_ids=[instance.pk])
+
+
+@receiver(post_save, sender=WorkflowStep, dispatch_uid="django_steps_step_saved")
+@receiver(post_delete, sender=WorkflowStep, dispatch_uid="django_steps_step_deleted")
+def workflow_step_changed(sender, instance, **kwargs):
+    _definition_changed(workflow_ids=[instance.workflow_id], step_ids=[instance.pk])
+
+
+@receiver(
+    post_save, sender=WorkflowStepStatus, dispatch_uid="django_steps_status_saved"
+)
+@receiver(
+    post_delete, sender=WorkflowStepStatus, dispatch_uid="django_steps_status_deleted"
+)
+def workflow_step_status_changed(sender, instance, **kwargs):
+    _definition_changed(step_ids=[instance.step_id])
+
+
+@receiver(
+    post_save, sender=WorkflowTransition, dispatch_uid="django_steps_transition_saved"
+)
+@receiver(
+    post_delete,
+    sender=WorkflowTransition,
+    dispatch_uid="django_steps_transition_deleted",
+)
+def workflow_transition_changed(sender, instance, **kwargs):
+    _definition_changed(
+        workflow_ids=[instance.workflow_id],
+        step_ids=[instance.from_step_id, instance.to_step_id],
+    )
+
+
+@receiver(
+    post_delete, sender=WorkflowInstance, dispatch_uid="django_steps_instance_deleted"
+)
+def workflow_instance_deleted(sender, instance, using, **kwargs):
+    forget_instances()
+    forget_instance(instance, using=using)
+
+
+@receiver(post_save, dispatch_uid="django_steps_content_saved")
+@receiver(post_delete, dispatch_uid="django_steps_content_deleted")
+def content_object_changed(sender, instance, **kwargs):
+    # Called for every model of the project: nothing to do unless contexts are memoized
+    if not has_content_contexts():
+        return
+    # Memoized CEL contexts may hold values of any other model (related objects,
+    # custom providers), so any change outside django_steps discards them.
+    if sender._meta.app_label != "django_steps":
+        forget_content_contexts()
@@ -0,0 +1,225 @@
+"""
+On-disk snapshots of workflow definitions and start-up warm-up.
+
+A fresh process loads each workflow definition from the database, and parses and
+compiles its conditions, the first time it runs an instance of the workflow, which
+slows down the first requests and operations it serves. ``manage.py steps_snapshot``
+writes every definition, together with the parsed AST of every transition condition,
+to a compact versioned file. With ``WARM_UP_DEFINITIONS`` enabled, processes load the
+file set as ``DEFINITION_SNAPSHOT`` when the app starts, in a few milliseconds and
+without any query, then load whatever the snapshot didn't cover from the database in
+a background thread (once the django_steps migrations are applied).
+
+Every definition is stored with the shared generation it had when the snapshot was
+written (see ``definitions.py``). Definitions changed since then have another
+generation: they are skipped and loaded from the database instead, as are definitions
+whose generation is unknown on either side. The generations must therefore live in a
+cache shared by every process (not the per-process ``LocMemCache``), which keeps them
+until the definitions change: otherwise nothing is loaded from the snapshot. Snapshots
+written by another version of django_steps or Django are ignored altogether.
+
+Snapshots are pickles, so only ever point ``DEFINITION_SNAPSHOT`` at files written
+by your own deployment.
+"""
+
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import django
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import __version__
+from .cel import ParsedCondition, condition_cache, parse_condition
+from .conf import get_setting
+from .definitions import (
+    build_workflow_definition,
+    get_definition_generations,
+    get_workflow_definition,
+    load_definition_rows,
+    registry,
+    seed_definition_generations,
+)
+from .models import Workflow
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of the snapshot files changes
+SNAPSHOT_FORMAT = 1
+
+
+def _snapshot_header():
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "django_steps": __version__,
+        "django": django.__version__,
+    }
+
+
+def write_definition_snapshot(path):
+    """
+    Writes every workflow definition, and the parsed conditions of its transitions,
+    to a snapshot file. The file is replaced atomically.
+
+    Args:
+        path (str | Path): Where to write the snapshot.
+
+    Returns:
+        int: The number of workflow definitions written.
+    """
+    workflows = list(Workflow.objects.order_by("pk"))
+    # Read the generations before the rows so a concurrent change can't be missed
+    generations = seed_definition_generations(workflow.pk for workflow in workflows)
+    definitions = []
+    conditions = {}
+    for workflow in workflows:
+        steps, statuses, transitions = load_definition_rows(workflow)
+        definitions.append(
+            (generations.get(workflow.pk), workflow, steps, statuses, transitions)
+        )
+        for transition in transitions:
+            if transition.condition and transition.condition not in conditions:
+                parsed = parse_condition(transition.condition)
+                if parsed.is_valid:
+                    conditions[transition.condition] = parsed.ast
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".steps_snapshot")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # The header comes first so other versions never unpickle the definitions
+            pickle.dump(_snapshot_header(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(
+                {"definitions": definitions, "conditions": conditions},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    logger.info(f"Wrote {len(definitions)} workflow definitions to snapshot '{path}'.")
+    return len(definitions)
+
+
+def load_definition_snapshot(path):
+    """
+    Loads the definitions of a snapshot file that are still current into the
+    definition cache, and their parsed conditions into the condition cache.
+
+    Args:
+        path (str | Path): A file written by ``write_definition_snapshot``.
+
+    Returns:
+        list: The ids of the workflows loaded from the snapshot. Workflows changed since
+              it was written are left to be loaded from the database.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = pickle.load(f)
+            if header != _snapshot_header():
+                logger.warning(
+                    f"Ignoring workflow definition snapshot '{path}' written by another version."
+                )
+                return []
+            data = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read workflow definition snapshot '{path}': {e}")
+        return []
+
+    entries = data["definitions"]
+    current = get_definition_generations(entry[1].pk for entry in entries)
+    loaded = []
+    for generation, workflow, steps, statuses, transitions in entries:
+        # Without a generation on both sides, a later change can't be ruled out
+        if generation is None or current.get(workflow.pk) != generation:
+            logger.debug(
+                f"Snapshot of workflow '{workflow.name}' may be stale, skipping it."
+            )
+            continue
+        definition = build_workflow_definition(workflow, steps, statuses, transitions)
+        registry.preload(definition, generation)
+        loaded.append(workflow.pk)
+
+    parsed = [
+        ParsedCondition(text, ast=ast) for text, ast in data["conditions"].items()
+    ]
+    condition_cache.preload(parsed)
+    for condition in parsed:
+        condition.prepare()
+    logger.info(f"Loaded {len(loaded)} workflow definitions from snapshot '{path}'.")
+    return loaded
+
+
+def _migrations_applied(using=DEFAULT_DB_ALIAS):
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections[using])
+    targets = [
+        key for key in executor.loader.graph.leaf_nodes() if key[0] == "django_steps"
+    ]
+    return not executor.migration_plan(targets)
+
+
+def load_workflow_definitions():
+    """
+    Loads every workflow definition that isn't cached yet from the database, and
+    prepares the conditions of all cached definitions.
+
+    Returns:
+        int: The number of workflow definitions loaded from the database.
+    """
+    cached = set(registry.cached_ids())
+    loaded = 0
+    for workflow_id in Workflow.objects.order_by("pk").values_list("pk", flat=True):
+        try:
+            definition = get_workflow_definition(workflow_id)
+        except Workflow.DoesNotExist:  # Deleted in the meantime
+            continue
+        loaded += workflow_id not in cached
+        for step in definition.steps:
+            for transition in step.transitions:
+                if transition.condition:
+                    parse_condition(transition.condition).prepare()
+    return loaded
+
+
+def _warm_up_from_database():
+    # Queries are only welcome once every app is ready
+    apps.ready_event.wait()
+    started = time.monotonic()
+    try:
+        if not _migrations_applied():
+            logger.info(
+                "Skipping the warm-up of workflow definitions: migrations are pending."
+            )
+            return
+        loaded = load_workflow_definitions()
+        logger.info(
+            f"Warmed up {loaded} workflow definitions from the database "
+            f"in {time.monotonic() - started:.3f}s."
+        )
+    except DatabaseError as e:
+        logger.info(f"Skipping the warm-up of workflow definitions: {e}")
+    except Exception as e:
+        logger.warning(f"Could not warm up workflow definitions: {e}")
+    finally:
+        connections.close_all()
+
+
+def warm_up_definitions():
+    """
+    Start-up hook run by ``DjangoStepsConfig.ready()`` when ``WARM_UP_DEFINITIONS`` is
+    enabled: loads the ``DEFINITION_SNAPSHOT`` file, if any, then loads the remaining
+    definitions from the database in a background thread.
+    """
+    path = get_setting("DEFINITION_SNAPSHOT")
+    if path:
+        load_definition_snapshot(path)
+    threading.Thread(
+        target=_warm_up_from_database, name="django-steps-warm-up", daemon=True
+    ).start()
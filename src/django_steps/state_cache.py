@@ -0,0 +1,311 @@
+"""
+Read-through cache of the state of workflow instances.
+
+Pages showing where an object is in its workflow only need a few ids, names and
+flags, which change rarely compared to how often they are displayed. With the
+``STATE_CACHE`` setting enabled, ``get_workflow_state`` reads them from the
+configured Django cache as a compact ``InstanceState`` record, and only loads the
+instance from the database on a miss. Every state write (model methods, services,
+bulk operations, admin saves) invalidates the records of the instances it changed once
+its transaction commits, so the next read loads them again.
+
+Records are keyed by content type, object id and workflow. Lookups without a
+workflow go through a pointer to the workflow of the object's most recently started
+instance. Only reads add records, only missing ones, and only once their transaction
+commits, so a state read in a transaction that is rolled back is never cached. Writes
+replace the records with a tombstone, kept ``STATE_CACHE_TOMBSTONE_TIMEOUT`` seconds,
+rather than with a state: writes committing out of order can't leave an older state
+behind, and a read that loaded a state before a write committed can't add it back
+afterwards (reads taking longer than that to commit add nothing).
+
+``InstanceState.cache_key`` changes with every state change, so templates can cache
+fragments depending on the state of an object::
+
+    {% load cache django_steps %}
+    {% workflow_state claim "Claim Processing" as state %}
+    {% cache 600 claim_workflow claim.pk state.cache_key %}
+        ...
+    {% endcache %}
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models import QuerySet
+
+from .conf import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of InstanceState changes
+_KEY_PREFIX = "django_steps:state:1"
+# Cached for objects without an instance of the workflow
+_NO_INSTANCE = ()
+# Cached as the workflow pointer of objects without any instance
+_NO_WORKFLOW = 0
+# Cached in place of invalidated records, which add() then leaves alone
+_INVALIDATED = "invalidated"
+
+
+class InstanceState(NamedTuple):
+    """
+    The state of a workflow instance, as cached by ``get_workflow_state``.
+    """
+
+    instance_id: int
+    workflow_id: int
+    workflow_name: str
+    step_id: int | None
+    step_name: str
+    status_id: int | None
+    status_name: str
+    # The lifecycle state (see WorkflowInstance.State)
+    state: str
+    version: int
+    started_at: datetime | None
+    completed_at: datetime | None
+
+    @property
+    def is_completed(self):
+        return self.state in ("completed", "cancelled")
+
+    @property
+    def is_cancelled(self):
+        return self.state == "cancelled"
+
+    @property
+    def is_on_hold(self):
+        return self.state == "on_hold"
+
+    @property
+    def cache_key(self):
+        """A key changing with every state change, to vary cached fragments on."""
+        return f"{self.instance_id}.{self.version}.{self.step_id}.{self.status_id}"
+
+    @classmethod
+    def from_instance(cls, instance):
+        """Builds the record of a WorkflowInstance from the cached workflow definition."""
+        definition, step_definition, step_status = instance._resolve_state()
+        return cls(
+            instance_id=instance.pk,
+            workflow_id=definition.id,
+            workflow_name=definition.name,
+            step_id=instance.current_step_id,
+            step_name=step_definition.step.name if step_definition else "",
+            status_id=instance.current_step_status_id,
+            status_name=step_status.name if step_status else "",
+            state=instance.state,
+            version=instance.version,
+            started_at=instance.started_at,
+            completed_at=instance.completed_at,
+        )
+
+
+def is_enabled():
+    return get_setting("STATE_CACHE")
+
+
+def _get_cache():
+    return caches[get_setting("CACHE_ALIAS")]
+
+
+def _key(content_type_id, object_id, workflow_id=None):
+    return f"{_KEY_PREFIX}:{content_type_id}:{object_id}:{workflow_id or ''}"
+
+
+def _instance_keys(instance, started=False):
+    keys = [_key(instance.content_type_id, instance.object_id, instance.workflow_id)]
+    if started:
+        # The instance is now the most recent one of its object
+        keys.append(_key(instance.content_type_id, instance.object_id))
+    return keys
+
+
+def _invalidate_keys(keys):
+    timeout = get_setting("STATE_CACHE_TOMBSTONE_TIMEOUT")
+    try:
+        _get_cache().set_many(dict.fromkeys(keys, _INVALIDATED), timeout=timeout)
+    except Exception as e:
+        logger.warning(
+            f"Could not invalidate {len(keys)} workflow instance states in cache: {e}"
+        )
+
+
+def invalidate_instances(instances, started=False, using=None, batch_size=1000):
+    """
+    Invalidates the cached state of ``instances`` once the current transaction
+    commits (straight away outside of a transaction); the next read loads it again.
+    States are replaced with tombstones rather than written, so writes committing in
+    another order than they were made can't leave an older state in the cache.
+
+    Does nothing unless the ``STATE_CACHE`` setting is enabled.
+
+    Args:
+        instances: An iterable of saved WorkflowInstance objects, or a QuerySet of them,
+                   read once the transaction commits, ``batch_size`` rows at a time.
+        started (bool): Whether the instances were just started, which makes them the
+                        most recent instance of their object.
+        using (str, optional): The database alias whose transaction to wait for.
+    """
+    if not is_enabled():
+        return
+    if isinstance(instances, QuerySet):
+        rows = (
+            instances.using(using)
+            .order_by()
+            .values_list("content_type_id", "object_id", "workflow_id")
+        )
+
+        def invalidate():
+            keys = []
+            for row in rows.iterator(chunk_size=batch_size):
+                keys.append(_key(*row))
+                if len(keys) >= batch_size:
+                    _invalidate_keys(keys)
+                    keys = []
+            if keys:
+                _invalidate_keys(keys)
+
+    else:
+        keys = [
+            key
+            for instance in instances
+            if instance.pk is not None
+            for key in _instance_keys(instance, started)
+        ]
+        if not keys:
+            return
+
+        def invalidate():
+            _invalidate_keys(keys)
+
+    transaction.on_commit(invalidate, using=using)
+
+
+async def ainvalidate_instances(instances, started=False, using=None):
+    """
+    Async counterpart of ``invalidate_instances``.
+    """
+    if is_enabled():
+        await sync_to_async(invalidate_instances)(instances, started, using)
+
+
+def forget_instance(instance, using=None):
+    """
+    Invalidates the cached state of a deleted instance once the current transaction
+    commits.
+    """
+    invalidate_instances([instance], started=True, using=using)
+
+
+def _get_cached(content_type_id, object_id, workflow_id):
+    """
+    Returns (True, InstanceState or None) on a hit, (False, workflow id or None) on a miss.
+    """
+    cache = _get_cache()
+    if workflow_id is None:
+        workflow_id = cache.get(_key(content_type_id, object_id))
+        if workflow_id is None or workflow_id == _INVALIDATED:
+            return False, None
+        if workflow_id == _NO_WORKFLOW:
+            return True, None
+    value = cache.get(_key(content_type_id, object_id, workflow_id))
+    if value is None or value == _INVALIDATED:
+        return False, workflow_id
+    if value == _NO_INSTANCE:
+        return True, None
+    return True, InstanceState(*value)
+
+
+def get_workflow_state(content_object, workflow_name: str | None = None):
+    """
+    Returns the state of the workflow instance of ``content_object``, from the cache
+    when the ``STATE_CACHE`` setting is enabled.
+
+    Args:
+        content_object: A saved Django model instance.
+        workflow_name (str, optional): The name of the workflow; without it, the state of
+                                       the object's most recently started instance.
+
+    Returns:
+        InstanceState | None: The state, or None if the object has no such instance.
+    """
+    from .definitions import get_workflow_definition_by_name
+    from .models import Workflow, WorkflowInstance, get_object_id_values
+    from .services import get_workflow_instance_for_object
+
+    if getattr(content_object, "pk", None) is None:
+        logger.warning("Content_object has no pk attribute or pk is None")
+        return None
+    if not is_enabled():
+        instance = get_workflow_instance_for_object(content_object, workflow_name)
+        return InstanceState.from_instance(instance) if instance else None
+
+    content_type = ContentType.objects.get_for_model(content_object)
+    object_id = get_object_id_values(
+        content_object._meta.concrete_model, content_object.pk
+    )["object_id"]
+    workflow_id = None
+    if workflow_name:
+        try:
+            workflow_id = get_workflow_definition_by_name(workflow_name).id
+        except Workflow.DoesNotExist:
+            logger.warning(
+                f"Workflow '{workflow_name}' not found when querying for state."
+            )
+            return None
+
+    try:
+        hit, value = _get_cached(content_type.pk, object_id, workflow_id)
+        if hit:
+            return value
+    except Exception as e:
+        logger.warning(f"Could not read workflow instance state from cache: {e}")
+
+    loaded_at = time.monotonic()
+    instance = get_workflow_instance_for_object(content_object, workflow_name)
+    record = InstanceState.from_instance(instance) if instance else None
+    if workflow_name:
+        values = {
+            _key(content_type.pk, object_id, workflow_id): (
+                tuple(record) if record else _NO_INSTANCE
+            )
+        }
+    elif record:
+        values = {
+            _key(content_type.pk, object_id, record.workflow_id): tuple(record),
+            _key(content_type.pk, object_id): record.workflow_id,
+        }
+    else:
+        values = {_key(content_type.pk, object_id): _NO_WORKFLOW}
+
+    def add():
+        # The tombstone of a write committed since the state was loaded keeps add()
+        # from caching it, as long as the tombstone hasn't expired
+        tombstone_timeout = get_setting("STATE_CACHE_TOMBSTONE_TIMEOUT")
+        if time.monotonic() - loaded_at >= tombstone_timeout:
+            return
+        timeout = get_setting("STATE_CACHE_TIMEOUT")
+        try:
+            cache = _get_cache()
+            for key, value in values.items():
+                cache.add(key, value, timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Could not write workflow instance state to cache: {e}")
+
+    # The state isn't committed yet if it was read in a transaction, which may roll back
+    transaction.on_commit(add, using=router.db_for_read(WorkflowInstance))
+    return record
+
+
+async def aget_workflow_state(content_object, workflow_name: str | None = None):
+    """
+    Async counterpart of ``get_workflow_state``.
+    """
+    return await sync_to_async(get_workflow_state)(content_object, workflow_name)
@@ -0,0 +1,23 @@
+"""
+Template tags of django_steps::
+
+    {% load django_steps %}
+    {% workflow_state claim "Claim Processing" as state %}
+    {{ state.step_name }} - {{ state.status_name }}
+"""
+
+from django import template
+
+from ..state_cache import get_workflow_state
+
+register = template.Library()
+
+
+@register.simple_tag
+def workflow_state(content_object, workflow_name=None):
+    """
+    Returns the InstanceState of the workflow instance of ``content_object``, or None
+    (see ``django_steps.state_cache.get_workflow_state``). Its ``cache_key`` can vary
+    cached fragments on the state of the object.
+    """
+    return get_workflow_state(content_object, workflow_name)
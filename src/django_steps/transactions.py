@@ -0,0 +1,124 @@
+"""
+Work collected during a transaction and done once it commits.
+
+History events are inserted with a single INSERT per transaction, and the plans of
+changed workflows compiled once per transaction, after it commits. ``get_commit_hook``
+returns the one callback of a kind registered with ``transaction.on_commit`` for the
+current transaction or savepoint, registering it on first use, so rolling a savepoint
+back drops exactly the work collected in it.
+
+Django has no rollback signal, and no public API telling whether a callback is still
+registered. A hook is only reused while it is still listed in the ``on_commit``
+callbacks of the connection (Django drops the callbacks of a savepoint when it is
+rolled back, and all of them when the transaction ends), for the same savepoint ids.
+Both are read from the connection, and checked by ``tests/test_history.py`` against
+the installed Django. Should a Django release no longer expose them, every call gets
+a hook of its own instead: the work is then done in more statements, but none of it
+is lost or done twice.
+"""
+
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+_local = threading.local()
+
+
+class CommitHook:
+    """
+    Work to do once the transaction (or savepoint) it was collected in commits. Hooks
+    are created and registered by ``get_commit_hook``; subclasses implement ``run``.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.done = False
+        # Where the hook was registered in the on_commit callbacks of the connection
+        self.position = None
+
+    def __call__(self):
+        self.done = True
+        self.run()
+
+    def run(self):
+        raise NotImplementedError
+
+
+def _can_inspect(connection):
+    return isinstance(getattr(connection, "run_on_commit", None), list) and hasattr(
+        connection, "savepoint_ids"
+    )
+
+
+def _is_registered(connection, hook):
+    """Whether ``hook`` is still in the on_commit callbacks of ``connection``."""
+    if hook.done:
+        return False
+    callbacks = connection.run_on_commit
+    position = hook.position
+    # Callbacks are only ever appended, unless a rollback drops some of them
+    if position is not None and position < len(callbacks):
+        if hook in callbacks[position]:
+            return True
+    for position, entry in enumerate(callbacks):
+        if hook in entry:
+            hook.position = position
+            return True
+    return False
+
+
+def _get_hooks(using, connection):
+    """Returns the hooks registered on ``connection``, by class and savepoint ids."""
+    states = getattr(_local, "states", None)
+    if states is None:
+        states = _local.states = {}
+    state = states.get(using)
+    if state is None or state[0] is not connection:
+        state = states[using] = (connection, {})
+    return state[1]
+
+
+def get_commit_hook(hook_class, using=None):
+    """
+    Returns the ``hook_class`` hook of the current transaction or savepoint on the
+    ``using`` database, creating it with ``hook_class(using)`` and registering it with
+    ``transaction.on_commit`` first if needed. Returns None outside of a transaction.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+
+    if not _can_inspect(connection):
+        hook = hook_class(using)
+        transaction.on_commit(hook, using=using)
+        return hook
+
+    hooks = _get_hooks(using, connection)
+    key = (hook_class, tuple(connection.savepoint_ids))
+    hook = hooks.get(key)
+    if hook is not None and _is_registered(connection, hook):
+        return hook
+    # Forgets the hooks that ran or were dropped by a rollback
+    for stale_key in [k for k, h in hooks.items() if not _is_registered(connection, h)]:
+        del hooks[stale_key]
+    hook = hooks[key] = hook_class(using)
+    hook.position = len(connection.run_on_commit)
+    transaction.on_commit(hook, using=using)
+    return hook
+
+
+def get_pending_hooks(hook_class, using=None):
+    """
+    Returns the ``hook_class`` hooks that will run once the current transaction on the
+    ``using`` database commits, as far as they can be told (see ``get_commit_hook``).
+    """
+    using = using or DEFAULT_DB_ALIAS
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block or not _can_inspect(connection):
+        return []
+    return [
+        hook
+        for hook in _get_hooks(using, connection).values()
+        if isinstance(hook, hook_class) and _is_registered(connection, hook)
+    ]
@@ -1,9 +1,11 @@
 import logging
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
 import uuid
 
 logger = logging.getLogger(__name__)
 
+
 def extract_context_data_from_content_object(content_object):
     """
     Extracts data from a content object for use in CEL expressions.
@@ -21,7 +23,7 @@ def extract_context_data_from_content_object(content_object):
 
     try:
         # Attempt to convert content_object fields to a dictionary for CEL evaluation
-        if hasattr(content_object, '_meta') and hasattr(content_object._meta, 'fields'):
+        if hasattr(content_object, "_meta") and hasattr(content_object._meta, "fields"):
             for field in content_object._meta.fields:
                 if field.name != "id":  # 'id' is already in object_id, avoid conflicts
                     value = getattr(content_object, field.name)
@@ -35,10 +37,128 @@ def extract_context_data_from_content_object(content_object):
             context_data.update(content_object.to_dict())
 
         # Add the entire object for direct attribute access
-        if hasattr(content_object, '_meta'):
+        if hasattr(content_object, "_meta"):
             content_type = ContentType.objects.get_for_model(content_object)
             context_data[content_type.model] = context_data  # Alias for clarity in CEL
     except (AttributeError, TypeError) as e:
         logger.warning(f"Could not extract context data from content_object: {e}")
 
     return context_data
+
+
+def resolve_context_lookups(model, paths):
+    """
+    Maps the member paths read by CEL conditions to ORM lookups on ``model``.
+
+    Paths may start with the model name (``claim.amount``) or directly with a field
+    name (``amount``), mirroring the layout of extract_context_data_from_content_object.
+    Forward ForeignKey/OneToOne fields are followed (``claim.policy.policy_type`` ->
+    ``policy__policy_type``). Names that are not fields of the model are ignored,
+    as they are never part of the extracted context.
+
+    Returns:
+        set: The lookups to pass to ``QuerySet.values()``.
+        None: If a path can't be answered by a projection (whole-object or
+              related-object access, reverse or many-to-many relations,
+              ``to_dict`` models...).
+    """
+    if hasattr(model, "to_dict"):
+        return None
+
+    model_name = model._meta.model_name
+    lookups = set()
+    for path in paths:
+        segments = path[1:] if path[0] == model_name else path
+        if not segments:
+            return None  # The whole object is used
+
+        current_model = model
+        lookup = []
+        for index, segment in enumerate(segments):
+            try:
+                field = current_model._meta.get_field(segment)
+            except FieldDoesNotExist:
+                if index == 0:
+                    break  # Not part of the extracted context
+                return None  # Attribute of a related object we can't project
+            if index == 0 and field.name == "id":
+                break  # 'id' is never part of the extracted context
+
+            if not field.concrete or field.many_to_many:
+                return None
+            lookup.append(field.name)
+            if field.is_relation:
+                if index == len(segments) - 1:
+                    return None  # The related object itself is used
+                current_model = field.related_model
+                continue
+            lookups.add("__".join(lookup))
+            break
+
+    return lookups
+
+
+def _context_from_row(model, row):
+    context_data = {}
+    for lookup, value in row.items():
+        # Convert UUIDs to string for CEL compatibility
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        *parents, name = lookup.split("__")
+        target = context_data
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+
+    # Alias for clarity in CEL
+    context_data[model._meta.model_name] = context_data
+    return context_data
+
+
+def extract_context_data_for_paths(model, pk, paths):
+    """
+    Extracts only the values read by CEL conditions from the object ``model``/``pk``,
+    using a single ``values()`` query.
+
+    Args:
+        model: The content object's model class.
+        pk: The content object's primary key.
+        paths: Member paths read by the conditions (see cel.collect_member_paths).
+
+    Returns:
+        dict: The context, laid out like extract_context_data_from_content_object
+              with related objects as nested dictionaries.
+        None: If the paths can't be answered by a projection; use
+              extract_context_data_from_content_object instead.
+    """
+    lookups = resolve_context_lookups(model, paths)
+    if lookups is None:
+        return None
+
+    row = {}
+    if lookups:
+        row = model._base_manager.filter(pk=pk).values(*sorted(lookups)).first()
+        if row is None:
+            return {}
+    return _context_from_row(model, row)
+
+
+def extract_contexts_for_paths(model, pks, paths):
+    """
+    Batch version of extract_context_data_for_paths: one ``values()`` query for all ``pks``.
+
+    Returns:
+        dict: The context of each primary key ({} for objects that don't exist).
+        None: If the paths can't be answered by a projection.
+    """
+    lookups = resolve_context_lookups(model, paths)
+    if lookups is None:
+        return None
+
+    pks = list(pks)
+    if not lookups:
+        return {pk: _context_from_row(model, {}) for pk in pks}
+
+    rows = model._base_manager.filter(pk__in=pks).values("pk", *sorted(lookups))
+    contexts = {row.pop("pk"): _context_from_row(model, row) for row in rows}
+    return {pk: contexts.get(pk, {}) for pk in pks}
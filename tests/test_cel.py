@@ -0,0 +1,94 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from django_steps.cel import ConditionCache, condition_cache, evaluate_condition
+
+
+class TestConditionCache:
+    """Tests for the LRU cache of parsed CEL conditions"""
+
+    def test_hits_and_misses(self):
+        """Test that a condition is parsed once and then served from the cache."""
+        cache = ConditionCache(maxsize=10)
+        first = cache.get("claim.amount > 100")
+        second = cache.get("claim.amount > 100")
+
+        assert first is second
+        assert first.evaluate({"claim": {"amount": 150}}) is True
+        assert cache.stats() == {
+            "hits": 1,
+            "misses": 1,
+            "evictions": 0,
+            "size": 1,
+            "maxsize": 10,
+        }
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays bounded and evicts the least recently used entry."""
+        cache = ConditionCache(maxsize=2)
+        a = cache.get("a == 1")
+        cache.get("b == 1")
+        cache.get("a == 1")  # 'a' becomes the most recently used entry
+        cache.get("c == 1")  # Evicts 'b'
+
+        assert len(cache) == 2
+        assert cache.evictions == 1
+        assert cache.get("a == 1") is a
+        cache.get("b == 1")
+        assert cache.misses == 4
+
+    def test_parse_errors_are_cached(self):
+        """Test that broken conditions are parsed once and keep raising."""
+        cache = ConditionCache(maxsize=10)
+        with mock.patch(
+            "celparser.parser.parse", side_effect=SyntaxError("boom")
+        ) as parse:
+            entry = cache.get("claim.amount >")
+            assert cache.get("claim.amount >") is entry
+            assert parse.call_count == 1
+
+        assert not entry.is_valid
+        for _ in range(2):
+            with pytest.raises(SyntaxError):
+                entry.evaluate({})
+
+    def test_concurrent_access(self):
+        """Test that the cache stays consistent when used from several threads."""
+        cache = ConditionCache(maxsize=8)
+        conditions = [f"claim.amount > {i}" for i in range(16)]
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(50):
+                    for condition in conditions:
+                        assert cache.get(condition).condition == condition
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert len(cache) == 8
+        stats = cache.stats()
+        assert stats["hits"] + stats["misses"] == 4 * 50 * 16
+
+    def test_evaluate_condition_uses_shared_cache(self):
+        """Test that evaluate_condition goes through the module level cache."""
+        condition_cache.clear()
+        assert evaluate_condition(
+            'claim.status == "Approved"', {"claim": {"status": "Approved"}}
+        )
+        assert (
+            evaluate_condition(
+                'claim.status == "Approved"', {"claim": {"status": "New"}}
+            )
+            is False
+        )
+        assert condition_cache.stats()["hits"] == 1
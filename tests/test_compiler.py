@@ -0,0 +1,126 @@
+import pytest
+from celparser.evaluator import evaluate
+from celparser.parser import parse
+
+from django_steps.cel import ParsedCondition
+from django_steps.compiler import compile_condition
+
+
+class Money:
+    """Plain object to exercise attribute access on non-dict values"""
+
+    def __init__(self, amount):
+        self.amount = amount
+
+
+EXPRESSIONS = [
+    "claim.amount > 10000",
+    "claim.amount <= 10000",
+    "claim.amount >= 10 && claim.amount < 20",
+    "claim.is_high_risk == true",
+    "claim.is_high_risk == false",
+    'claim.status_field == "Approved"',
+    'claim.status_field != "Approved" || claim.priority == "URGENT"',
+    "float(claim.amount_approved) > 0.0",
+    "float(claim.amount_approved) == 0.0",
+    "claim.amount_approved == null || float(claim.amount_approved) == 0.0",
+    "!claim.is_high_risk",
+    "-claim.amount < -5",
+    "claim.amount * 2 + 1 > 21 && claim.amount % 2 == 0",
+    "claim.amount / 4 > 2",
+    'claim.policy.policy_type == "AUTO"',
+    'claim.tags[0] == "fraud"',
+    "size(claim.tags) > 1",
+    'claim.amount > 100 ? claim.priority == "HIGH" : true',
+    "[1, 2, 3][1] == 2",
+    '{"a": 1}["a"] == 1',
+    "int(claim.amount) == 10",
+    'string(claim.amount) + "x" == "10x"',
+    "missing.field == null",
+    "false",
+    "true && claim.missing",
+    "double(claim.amount) > 1",
+    "money.amount > 5",
+    "claim.status_field < 3",
+]
+
+CONTEXTS = [
+    {},
+    {"claim": {}},
+    {
+        "claim": {
+            "amount": 10,
+            "is_high_risk": True,
+            "status_field": "Approved",
+            "priority": "HIGH",
+            "amount_approved": "12.5",
+            "tags": ["fraud", "auto"],
+            "policy": {"policy_type": "AUTO"},
+        }
+    },
+    {
+        "claim": {
+            "amount": 20000,
+            "is_high_risk": False,
+            "status_field": "Rejected",
+            "priority": "URGENT",
+            "amount_approved": None,
+            "tags": [],
+            "policy": {"policy_type": "HOME"},
+        }
+    },
+    {"claim": {"amount": 7.5, "amount_approved": 0}, "money": Money(7)},
+    {"claim": {"amount": "10", "status_field": "abc"}},
+    {"claim": {"amount": 10}, "double": lambda value: value * 2},
+]
+
+
+def _outcome(function, context):
+    try:
+        return ("value", function(context))
+    except Exception as e:
+        return ("error", type(e))
+
+
+class TestConditionCompiler:
+    """Tests that compiled conditions behave exactly like the interpreter"""
+
+    @pytest.mark.parametrize("expression", EXPRESSIONS)
+    def test_compiled_matches_interpreter(self, expression):
+        """Test compiled and interpreted results (or errors) agree for every context."""
+        ast = parse(expression)
+        compiled = compile_condition(ast, expression)
+        assert compiled is not None
+
+        for context in CONTEXTS:
+            expected = _outcome(lambda ctx: evaluate(ast, ctx), context)
+            assert _outcome(compiled, context) == expected, (expression, context)
+
+    def test_context_function_shadows_builtin(self):
+        """Test that a callable in the context takes precedence over a built-in."""
+        ast = parse("float(claim.amount) == 42")
+        compiled = compile_condition(ast)
+        context = {"claim": {"amount": 1}, "float": lambda value: 42}
+        assert compiled(context) is evaluate(ast, context) is True
+
+    def test_unsupported_expression_falls_back(self):
+        """Test that method calls are left to the interpreter."""
+        ast = parse('claim.name.startsWith("A")')
+        assert compile_condition(ast) is None
+
+        condition = ParsedCondition('claim.name.startsWith("A")', ast=ast)
+        assert condition.evaluate({"claim": {"name": "Alice"}}) is True
+        assert condition.is_compiled is False
+
+    def test_parsed_condition_compiles_on_first_evaluation(self):
+        """Test that ParsedCondition uses the compiler when enabled."""
+        condition = ParsedCondition("claim.amount > 1", ast=parse("claim.amount > 1"))
+        assert condition.evaluate({"claim": {"amount": 2}}) is True
+        assert condition.is_compiled is True
+
+    def test_compiler_can_be_disabled(self, settings):
+        """Test that COMPILE_CONDITIONS=False keeps using the interpreter."""
+        settings.DJANGO_STEPS = {"COMPILE_CONDITIONS": False}
+        condition = ParsedCondition("claim.amount > 1", ast=parse("claim.amount > 1"))
+        assert condition.evaluate({"claim": {"amount": 2}}) is True
+        assert condition.is_compiled is False
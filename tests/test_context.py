@@ -0,0 +1,205 @@
+import asyncio
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from django_steps.cel import evaluate_condition
+from django_steps.context import (
+    ContextProvider,
+    LazyContext,
+    default_context_provider,
+    get_content_context,
+    get_content_contexts,
+    get_context_provider,
+    register_context_provider,
+    unregister_context_provider,
+)
+from django_steps.middleware import WorkflowScopeMiddleware
+from django_steps.scope import get_current_scope, workflow_scope
+
+USERNAME_PATHS = frozenset({("user", "username")})
+
+
+@pytest.fixture
+def user_provider():
+    """Register a context provider for User and remove it afterwards"""
+    calls = []
+
+    def provider(user):
+        calls.append(user.pk)
+        return {"claim": {"is_high_risk": user.username.endswith("high_risk")}}
+
+    register_context_provider(User, provider)
+    yield calls
+    unregister_context_provider(User)
+
+
+@pytest.mark.django_db
+class TestContextProviders:
+    """Tests for the per-model context provider registry"""
+
+    def test_default_provider(self, test_users):
+        """Test that models without a registered provider keep the default behavior."""
+        assert get_context_provider(User) is default_context_provider
+        user = test_users["low_risk"]
+        context = get_content_context(User, str(user.pk), USERNAME_PATHS)
+        assert context["username"] == "user_low_risk"
+
+    def test_registered_provider_is_used_to_advance(self, workflow_data, user_provider):
+        """Test that advancing evaluates the conditions against the registered provider's context."""
+        instance = workflow_data["instance_high_risk"]
+        instance.update_step_status("Review Complete")
+        instance.refresh_from_db()
+
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+        assert user_provider == [workflow_data["test_users"]["high_risk"].pk]
+
+    def test_register_by_content_type_and_decorator(self, test_users):
+        """Test that providers can be registered for a ContentType with a decorator."""
+
+        @register_context_provider(ContentType.objects.get_for_model(User))
+        class UserProvider(ContextProvider):
+            def get_context(self, user):
+                return {"name": user.username}
+
+        try:
+            assert isinstance(get_context_provider(User), UserProvider)
+            assert get_content_context(User, test_users["another"].pk) == {
+                "name": "user_another"
+            }
+        finally:
+            unregister_context_provider(User)
+        assert get_context_provider(User) is default_context_provider
+
+    def test_lazy_context(self):
+        """Test that lazy values are only computed when a condition reads them."""
+        calls = []
+
+        def load_claim():
+            calls.append("claim")
+            return {"amount": 150}
+
+        context = LazyContext(claim=load_claim, policy=lambda: calls.append("policy"))
+        assert (
+            evaluate_condition("claim.amount > 100 && claim.amount < 200", context)
+            is True
+        )
+        assert calls == ["claim"]
+
+    def test_batch_contexts(self, test_users, django_assert_num_queries):
+        """Test that the contexts of many objects are built with a single query."""
+        pks = [user.pk for user in test_users.values()]
+
+        with django_assert_num_queries(1):
+            contexts = get_content_contexts(User, pks + [0], USERNAME_PATHS)
+        assert [contexts[pk]["username"] for pk in pks] == [
+            u.username for u in test_users.values()
+        ]
+        assert contexts[0] == {}
+
+    def test_batch_contexts_with_provider(
+        self, test_users, user_provider, django_assert_num_queries
+    ):
+        """Test that registered providers load their objects with a single query too."""
+        pks = [user.pk for user in test_users.values()]
+
+        with django_assert_num_queries(1):
+            contexts = get_content_contexts(User, pks)
+        assert contexts[test_users["high_risk"].pk]["claim"]["is_high_risk"] is True
+
+
+@pytest.mark.django_db
+class TestContextMemoization:
+    """Tests for the request-scoped memoization of contexts"""
+
+    def test_not_memoized_outside_a_scope(self, test_users, django_assert_num_queries):
+        """Test that contexts are loaded every time without a scope."""
+        user = test_users["low_risk"]
+        with django_assert_num_queries(2):
+            get_content_context(User, user.pk, USERNAME_PATHS)
+            get_content_context(User, user.pk, USERNAME_PATHS)
+
+    def test_memoized_inside_a_scope(self, test_users, django_assert_num_queries):
+        """Test that contexts are reused within a scope until a model instance is saved."""
+        user = test_users["low_risk"]
+        with workflow_scope():
+            with django_assert_num_queries(1):
+                first = get_content_context(User, user.pk, USERNAME_PATHS)
+                assert get_content_context(User, str(user.pk), USERNAME_PATHS) is first
+                # Batch lookups reuse it as well
+                assert (
+                    get_content_contexts(User, [user.pk], USERNAME_PATHS)[user.pk]
+                    is first
+                )
+
+            # Reading more paths reloads everything read so far
+            with django_assert_num_queries(1):
+                context = get_content_context(User, user.pk, {("user", "email")})
+            assert context["username"] == user.username
+            assert context["email"] == user.email
+
+            user.username = "renamed"
+            user.save()
+            assert (
+                get_content_context(User, user.pk, USERNAME_PATHS)["username"]
+                == "renamed"
+            )
+
+    def test_saves_ignored_without_memoized_contexts(self, test_users):
+        """Test that saving other models doesn't touch a scope without memoized contexts."""
+        from unittest import mock
+
+        user = test_users["low_risk"]
+        with mock.patch("django_steps.signals.forget_content_contexts") as forget:
+            user.save()
+            with workflow_scope():
+                user.save()
+                get_content_context(User, user.pk, USERNAME_PATHS)
+                user.save()
+        assert forget.call_count == 1
+
+    def test_repeated_advances_reuse_context(self, workflow_data, user_provider):
+        """Test that advancing the same object twice in one scope builds its context once."""
+        instance = workflow_data["instance_high_risk"]
+        with workflow_scope():
+            instance.update_step_status("Review Complete")
+            assert instance.current_step == workflow_data["step_int_3_interview"]
+            instance.update_step_status("Interview Complete")
+
+        assert user_provider == [workflow_data["test_users"]["high_risk"].pk]
+
+
+class TestWorkflowScopeMiddleware:
+    """Tests for the middleware opening a scope around each request"""
+
+    def test_sync(self):
+        """Test that a scope is active while the view runs and discarded afterwards."""
+        scopes = []
+
+        def view(request):
+            scopes.append(get_current_scope())
+            return HttpResponse()
+
+        middleware = WorkflowScopeMiddleware(view)
+        middleware(RequestFactory().get("/"))
+        middleware(RequestFactory().get("/"))
+
+        assert None not in scopes
+        assert scopes[0] is not scopes[1]
+        assert get_current_scope() is None
+
+    def test_async(self):
+        """Test that the middleware also works with async views."""
+        scopes = []
+
+        async def view(request):
+            scopes.append(get_current_scope())
+            return HttpResponse()
+
+        middleware = WorkflowScopeMiddleware(view)
+        asyncio.run(middleware(RequestFactory().get("/")))
+
+        assert scopes[0] is not None
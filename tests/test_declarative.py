@@ -0,0 +1,210 @@
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from django_steps.declarative import (
+    StatusSpec,
+    StepSpec,
+    TransitionSpec,
+    WorkflowSpec,
+    register_workflow,
+    sync_workflow,
+    unregister_workflow,
+)
+from django_steps.definitions import (
+    bump_definition_generation,
+    clear_workflow_definitions,
+    get_workflow_definition,
+    get_workflow_definition_by_name,
+    sync_workflow_definitions,
+)
+from django_steps.models import Workflow, WorkflowInstance, WorkflowStep
+from django_steps.services import start_workflow_instance, update_workflow_step_status
+
+
+def _step(key, name, transitions=(), **kwargs):
+    return StepSpec(
+        key=key,
+        name=name,
+        statuses=[
+            StatusSpec("pending", "Pending", is_default_status=True),
+            StatusSpec("done", "Done", is_completion_status=True),
+            StatusSpec("cancelled", "Cancelled", is_cancellation_status=True),
+        ],
+        transitions=list(transitions),
+        **kwargs,
+    )
+
+
+def _spec(**kwargs):
+    return WorkflowSpec(
+        key="payouts",
+        name="Payouts",
+        steps=[
+            _step(
+                "review",
+                "Review",
+                [
+                    TransitionSpec(
+                        to="approval", condition="claim.amount > 1000", priority=10
+                    ),
+                    TransitionSpec(to="payment"),
+                ],
+            ),
+            _step("approval", "Approval", [TransitionSpec(to="payment")]),
+            _step("payment", "Payment"),
+        ],
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def payouts():
+    spec = register_workflow(_spec())
+    sync_workflow(spec)
+    yield spec
+    unregister_workflow(spec.key)
+
+
+@pytest.mark.django_db
+class TestCodeDefinedWorkflows:
+    """Tests for workflows declared in Python"""
+
+    def test_definition_from_code(self, payouts, test_users, django_assert_num_queries):
+        """Test that a code-defined workflow runs without reading its definition again."""
+        definition = get_workflow_definition_by_name("Payouts")
+        assert definition.workflow.key == "payouts"
+        assert [s.step.key for s in definition.steps] == [
+            "review",
+            "approval",
+            "payment",
+        ]
+        assert definition.initial_step.step.key == "review"
+        assert definition.final_step.step.key == "payment"
+
+        instance = start_workflow_instance("Payouts", test_users["another"])
+        with django_assert_num_queries(0):
+            assert get_workflow_definition_by_name("Payouts") is definition
+            assert get_workflow_definition(definition.id) is definition
+        assert update_workflow_step_status(
+            instance, "Done", {"claim": {"amount": 5000}}
+        )
+        assert instance.current_step.key == "approval"
+
+    def test_code_definitions_skip_generation_checks(self, payouts, settings):
+        """Test that code-defined definitions are only rebuilt from code."""
+        settings.DJANGO_STEPS = {"DEFINITION_CHECK_INTERVAL": 0}
+        definition = get_workflow_definition_by_name("Payouts")
+
+        bump_definition_generation(definition.id)
+
+        assert sync_workflow_definitions() == []
+        assert get_workflow_definition(definition.id) is definition
+
+    def test_sync_follows_keys(self, payouts, test_users):
+        """Test that renamed and reordered steps keep their rows, and instances at them."""
+        instance = start_workflow_instance("Payouts", test_users["another"])
+        review = WorkflowStep.objects.get(key="review")
+
+        spec = payouts
+        spec.steps[0].name = "First Review"
+        spec.steps[1], spec.steps[2] = spec.steps[2], spec.steps[1]
+        spec.steps[0].statuses[0].is_default_status = False
+        spec.steps[0].statuses[1].is_default_status = True
+        spec.steps[0].transitions.pop()
+        sync_workflow(spec)
+
+        review.refresh_from_db()
+        assert review.name == "First Review"
+        assert list(
+            WorkflowStep.objects.filter(key__isnull=False).values_list("key", flat=True)
+        ) == [
+            "review",
+            "payment",
+            "approval",
+        ]
+        assert review.possible_statuses.get(is_default_status=True).key == "done"
+        assert review.outgoing_transitions.count() == 1
+        instance = WorkflowInstance.objects.get(pk=instance.pk)
+        assert instance.current_step == review
+
+    def test_removed_steps_in_use_are_kept(self, payouts, test_users):
+        """Test that steps removed from the code are only deleted once no instance is at them."""
+        start_workflow_instance("Payouts", test_users["another"])
+        spec = _spec()
+        spec.steps = spec.steps[1:]
+        spec.steps[0].is_initial_step = True
+        spec = WorkflowSpec(key=spec.key, name=spec.name, steps=spec.steps)
+        unregister_workflow(spec.key)
+        register_workflow(spec)
+
+        workflow, steps, _, _ = sync_workflow(spec)
+        assert [step.key for step in steps] == ["approval", "payment", "review"]
+        assert not steps[-1].is_initial_step
+
+        WorkflowInstance.objects.filter(workflow=workflow).delete()
+        workflow, steps, _, _ = sync_workflow(spec)
+        assert [step.key for step in steps] == ["approval", "payment"]
+
+    def test_existing_workflow_is_adopted(self, workflow_data):
+        """Test that a database workflow with the same name is moved to code."""
+        existing = workflow_data["workflow_fasttrack"]
+        steps = [
+            _step(f"step-{step.order}", step.name)
+            for step in existing.steps.order_by("order")
+        ]
+        for step in steps:
+            step.statuses[0].name = "Ready for Check"
+        spec = register_workflow(
+            WorkflowSpec(key="fast-track", name=existing.name, steps=steps)
+        )
+        try:
+            clear_workflow_definitions()
+            sync_workflow(spec)
+            definition = get_workflow_definition(existing.pk)
+        finally:
+            unregister_workflow(spec.key)
+
+        assert definition.workflow.pk == existing.pk
+        assert Workflow.objects.get(pk=existing.pk).is_code_defined
+        assert definition.initial_step.step.name == "Initial Check"
+
+    def test_lookup_never_writes(self, payouts):
+        """Test that definitions are only read at lookup, and out of date rows rejected."""
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        clear_workflow_definitions()
+        payouts.steps[1].name = "Manager Approval"
+        with CaptureQueriesContext(connection) as queries:
+            with pytest.raises(ImproperlyConfigured, match="steps_sync"):
+                get_workflow_definition_by_name("Payouts")
+        assert all(query["sql"].startswith("SELECT") for query in queries)
+        assert WorkflowStep.objects.get(key="approval").name == "Approval"
+
+        call_command("steps_sync")
+        definition = get_workflow_definition_by_name("Payouts")
+        assert definition.steps[1].step.name == "Manager Approval"
+
+    def test_invalid_declarations(self):
+        """Test that inconsistent declarations are rejected."""
+        with pytest.raises(ImproperlyConfigured):
+            WorkflowSpec(
+                key="broken",
+                name="Broken",
+                steps=[_step("a", "A", [TransitionSpec(to="b")])],
+            )
+        with pytest.raises(ImproperlyConfigured):
+            WorkflowSpec(
+                key="broken", name="Broken", steps=[StepSpec(key="a", name="A")]
+            )
+        with pytest.raises(ImproperlyConfigured):
+            WorkflowSpec(key="not a slug", name="Broken", steps=[_step("a", "A")])
+        register_workflow(_spec())
+        try:
+            with pytest.raises(ImproperlyConfigured):
+                register_workflow(
+                    WorkflowSpec(key="other", name="Payouts", steps=[_step("a", "A")])
+                )
+        finally:
+            unregister_workflow("payouts")
@@ -0,0 +1,497 @@
+import pytest
+
+from django_steps.definitions import (
+    bump_definition_generation,
+    get_definition_generations,
+    get_workflow_definition,
+    get_workflow_definition_by_name,
+    sync_workflow_definitions,
+)
+from django_steps.models import (
+    WorkflowInstance,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
+)
+
+
+@pytest.mark.django_db
+class TestWorkflowDefinitionCache:
+    """Tests for the in-process workflow definition snapshots"""
+
+    def test_definition_snapshot_contents(self, workflow_data):
+        """Test that the snapshot exposes steps, statuses and sorted transitions."""
+        definition = get_workflow_definition_by_name("Investigation Workflow")
+
+        assert definition.workflow == workflow_data["workflow_investigation"]
+        assert [s.step.name for s in definition.steps] == [
+            "Initial Review",
+            "Document Collection",
+            "Interview Stakeholders",
+            "Schedule Inspection",
+            "Final Report",
+        ]
+        assert definition.initial_step.step == workflow_data["step_int_1_init"]
+        assert definition.final_step.step == workflow_data["step_int_5_report"]
+
+        initial = definition.get_step(workflow_data["step_int_1_init"].pk)
+        assert initial.default_status == workflow_data["status_int_1_default"]
+        assert initial.cancellation_status == workflow_data["status_int_1_cancelled"]
+        assert initial.on_hold_status == workflow_data["status_int_1_on_hold"]
+        assert initial.get_status("Assigned") == workflow_data["status_int_1_assigned"]
+        assert [t.priority for t in initial.transitions] == [20, 10]
+
+    def test_definition_is_loaded_once(self, workflow_data, django_assert_num_queries):
+        """Test that repeated lookups are served from memory."""
+        workflow_id = workflow_data["workflow_investigation"].pk
+        get_workflow_definition(workflow_id)
+
+        with django_assert_num_queries(0):
+            definition = get_workflow_definition(workflow_id)
+            assert (
+                get_workflow_definition_by_name("Investigation Workflow") is definition
+            )
+
+    def test_definition_invalidated_on_change(self, workflow_data):
+        """Test that saving or deleting a definition model drops the snapshot."""
+        step = workflow_data["step_int_2_doc_collection"]
+        definition = get_workflow_definition_by_name("Investigation Workflow")
+        assert definition.get_step(step.pk).get_status("Lost Docs") is None
+
+        WorkflowStepStatus.objects.create(step=step, name="Lost Docs")
+        refreshed = get_workflow_definition_by_name("Investigation Workflow")
+        assert refreshed is not definition
+        assert refreshed.get_step(step.pk).get_status("Lost Docs") is not None
+
+        WorkflowTransition.objects.filter(from_step=step).delete()
+        # Queryset deletes send post_delete for each row
+        assert (
+            not get_workflow_definition(step.workflow_id).get_step(step.pk).transitions
+        )
+
+    def test_status_update_costs_a_single_write(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that a status update on a warm definition does no reads."""
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+        instance._get_definition()  # Warm the definition cache
+
+        with django_assert_num_queries(1):
+            assert instance.update_step_status("Assigned") is True
+
+
+@pytest.mark.django_db
+class TestInstanceHydration:
+    """Tests for filling the relations of loaded instances from the definition snapshots"""
+
+    def test_relations_from_definitions(self, workflow_data, django_assert_num_queries):
+        """Test that many instances are loaded with one query and share their steps and statuses."""
+        from django.contrib.auth.models import User
+
+        users = User.objects.bulk_create(
+            User(username=f"report_{i}") for i in range(20)
+        )
+        for user in users:
+            WorkflowInstance.objects.create(
+                workflow=workflow_data["workflow_investigation"],
+                content_type=workflow_data["generic_content_type"],
+                object_id=user.pk,
+            ).start_workflow()
+        get_workflow_definition(workflow_data["workflow_investigation"].pk)
+        get_workflow_definition(workflow_data["workflow_fasttrack"].pk)
+
+        with django_assert_num_queries(1):
+            instances = list(WorkflowInstance.objects.order_by("pk"))
+            assert len(instances) == 23
+            rows = {
+                (i.workflow.name, i.current_step.name, i.current_step_status.name)
+                for i in instances
+            }
+        assert rows == {
+            ("Investigation Workflow", "Initial Review", "Pending Assignment"),
+            ("Fast-Track Workflow", "Initial Check", "Ready for Check"),
+        }
+        investigation = [
+            i
+            for i in instances
+            if i.workflow_id == workflow_data["workflow_investigation"].pk
+        ]
+        assert len({id(i.current_step) for i in investigation}) == 1
+        assert len({id(i.current_step_status) for i in investigation}) == 1
+
+    def test_select_related_and_deferred_fields(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that joined relations are kept and deferred foreign keys left alone."""
+        get_workflow_definition(workflow_data["workflow_investigation"].pk)
+        pk = workflow_data["instance_low_risk"].pk
+
+        instance = WorkflowInstance.objects.select_related("current_step").get(pk=pk)
+        definition = get_workflow_definition(instance.workflow_id)
+        assert (
+            instance.current_step
+            is not definition.get_step(instance.current_step_id).step
+        )
+        assert instance.current_step_status is definition.get_status(
+            instance.current_step_status_id
+        )
+
+        # The instance, then the deferred step id and the step, as without hydration
+        with django_assert_num_queries(3):
+            instance = WorkflowInstance.objects.only("pk", "workflow").get(pk=pk)
+            assert instance.current_step == workflow_data["step_int_1_init"]
+
+
+@pytest.mark.django_db
+class TestWorkflowPlans:
+    """Tests for the compiled definition plans stored on the workflows"""
+
+    def test_plan_compiled_with_changes(
+        self,
+        workflow_data,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test that plans follow definition changes, and load a definition in one query."""
+        from django_steps.definitions import clear_workflow_definitions
+        from django_steps.models import Workflow
+
+        step = workflow_data["step_int_2_doc_collection"]
+        with django_capture_on_commit_callbacks(execute=True):
+            WorkflowStepStatus.objects.create(step=step, name="Lost Docs")
+        workflow = Workflow.objects.get(pk=step.workflow_id)
+        assert workflow.plan["errors"] == []
+        clear_workflow_definitions()
+
+        with django_assert_num_queries(1):
+            definition = get_workflow_definition(workflow.pk)
+            step_definition = definition.get_step(step.pk)
+            assert step_definition.get_status("Lost Docs").step is step_definition.step
+            assert (
+                step_definition.transitions[0].to_step.workflow is definition.workflow
+            )
+        assert (
+            definition.initial_step.default_status
+            == workflow_data["status_int_1_default"]
+        )
+
+    def test_plan_compiled_once_per_transaction(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that a transaction changing many rows compiles the plan once, on commit."""
+        from unittest import mock
+
+        from django.db import transaction
+
+        from django_steps import plans
+        from django_steps.models import Workflow
+
+        workflow = workflow_data["workflow_investigation"]
+        step = workflow_data["step_int_2_doc_collection"]
+        refresh = mock.patch.object(
+            plans, "refresh_workflow_plans", wraps=plans.refresh_workflow_plans
+        )
+        with refresh as refresh_workflow_plans:
+            with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+                for name in ("Lost Docs", "Late Docs", "Forged Docs"):
+                    WorkflowStepStatus.objects.create(step=step, name=name)
+                # Read from the rows until the plan is compiled
+                assert Workflow.objects.get(pk=workflow.pk).plan is None
+                definition = get_workflow_definition(workflow.pk)
+                assert definition.get_step(step.pk).get_status("Late Docs") is not None
+                # Cascades to the statuses and transitions of the step
+                WorkflowStep.objects.filter(
+                    workflow=workflow, name="Schedule Inspection"
+                ).delete()
+                refresh_workflow_plans.assert_not_called()
+
+        refresh_workflow_plans.assert_called_once_with([workflow.pk])
+        plan = Workflow.objects.get(pk=workflow.pk).plan
+        assert len(plan["steps"]) == 4
+        name = plan["fields"]["statuses"].index("name")
+        assert [row[name] for row in plan["statuses"]].count("Forged Docs") == 1
+
+    def test_missing_plan_compiled_on_load(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that workflows without a current plan are loaded from their rows once."""
+        from django_steps.definitions import clear_workflow_definitions
+        from django_steps.models import Workflow
+
+        workflow_id = workflow_data["workflow_fasttrack"].pk
+        Workflow.objects.update(plan=None)
+        clear_workflow_definitions()
+
+        with django_assert_num_queries(5):
+            get_workflow_definition(workflow_id)
+        assert Workflow.objects.get(pk=workflow_id).plan is not None
+        clear_workflow_definitions()
+        with django_assert_num_queries(1):
+            get_workflow_definition(workflow_id)
+
+    def test_invalid_workflows_are_reported(self, workflow_data):
+        """Test that unreachable steps, missing default statuses and bad conditions are reported."""
+        from django_steps.plans import check_workflow_plans
+
+        workflow = workflow_data["workflow_fasttrack"]
+        orphan = WorkflowStep.objects.create(workflow=workflow, name="Orphan", order=9)
+        WorkflowTransition.objects.create(
+            workflow=workflow,
+            from_step=workflow_data["step_ft_1_init"],
+            to_step=workflow_data["step_ft_2_approve"],
+            condition="claim.amount >",
+            priority=99,
+        )
+
+        errors = check_workflow_plans(databases=["default"])
+        assert [error.id for error in errors] == ["django_steps.E001"] * 2 + [
+            "django_steps.W001"
+        ]
+        messages = [error.msg for error in errors]
+        assert "Orphan' has no default status" in messages[0]
+        assert "can't be parsed" in messages[1]
+        assert "Orphan' can't be reached" in messages[2]
+        assert all(error.obj.pk == orphan.workflow_id for error in errors)
+        assert check_workflow_plans(databases=None) == []
+
+    def test_invalid_workflows_fail_at_the_affected_step(
+        self, workflow_data, test_users
+    ):
+        """Test that definition errors only fail the instances at the affected steps."""
+        from django_steps.plans import get_workflow_errors
+        from django_steps.services import (
+            bulk_update_workflow_step_status,
+            start_workflow_instance,
+        )
+
+        instance = workflow_data["instance_low_risk"]
+        WorkflowTransition.objects.create(
+            workflow=instance.workflow,
+            from_step=workflow_data["step_int_2_doc_collection"],
+            to_step=workflow_data["step_int_5_report"],
+            condition="claim.amount >",
+            priority=99,
+        )
+        assert get_workflow_errors(instance.workflow)
+
+        # The rest of the workflow still runs
+        assert (
+            start_workflow_instance("Investigation Workflow", test_users["another"])
+            is not None
+        )
+        instance = WorkflowInstance.objects.get(pk=instance.pk)
+        context = {"claim": {"is_high_risk": False}}
+        assert instance.update_step_status("Review Complete", context) is True
+        assert instance.current_step == workflow_data["step_int_2_doc_collection"]
+
+        high_risk = WorkflowInstance.objects.filter(
+            pk=workflow_data["instance_high_risk"].pk
+        )
+        result = bulk_update_workflow_step_status(
+            high_risk,
+            "Review Complete",
+            context_provider=lambda claim: {"claim": {"is_high_risk": True}},
+        )
+        assert result.succeeded == [workflow_data["instance_high_risk"].pk]
+        assert high_risk.get().current_step == workflow_data["step_int_3_interview"]
+
+
+@pytest.mark.django_db
+class TestDefinitionGenerations:
+    """Tests for the cross-process definition generations kept in the Django cache"""
+
+    def test_committed_change_bumps_generation(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that committing a definition change bumps the shared generation."""
+        workflow_id = workflow_data["workflow_investigation"].pk
+        before = get_definition_generations([workflow_id])[workflow_id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            WorkflowStepStatus.objects.create(
+                step=workflow_data["step_int_2_doc_collection"], name="Lost Docs"
+            )
+
+        after = get_definition_generations([workflow_id])[workflow_id]
+        assert after is not None
+        assert after != before
+
+    def test_stale_definition_reloaded_after_remote_change(
+        self, workflow_data, settings
+    ):
+        """Test that a generation bumped by another process drops only that definition."""
+        settings.DJANGO_STEPS = {"DEFINITION_CHECK_INTERVAL": 0}
+        investigation = get_workflow_definition_by_name("Investigation Workflow")
+        fasttrack = get_workflow_definition_by_name("Fast-Track Workflow")
+
+        # Simulate an admin edit committed by another process
+        bump_definition_generation(investigation.id)
+
+        assert get_workflow_definition(investigation.id) is not investigation
+        assert get_workflow_definition(fasttrack.id) is fasttrack
+
+    def test_generations_checked_at_most_once_per_interval(
+        self, workflow_data, settings
+    ):
+        """Test that the shared generations are not read on every lookup."""
+        settings.DJANGO_STEPS = {"DEFINITION_CHECK_INTERVAL": 3600}
+        definition = get_workflow_definition_by_name("Investigation Workflow")
+        sync_workflow_definitions()
+
+        bump_definition_generation(definition.id)
+        assert get_workflow_definition(definition.id) is definition
+        assert sync_workflow_definitions() == [definition.id]
+        assert get_workflow_definition(definition.id) is not definition
+
+    def test_definitions_reloaded_during_a_check_are_kept(
+        self, workflow_data, settings
+    ):
+        """Test that a check only drops definitions still at the generation it compared."""
+        from unittest import mock
+
+        from django_steps import definitions
+
+        settings.DJANGO_STEPS = {"DEFINITION_CHECK_INTERVAL": 3600}
+        definition = get_workflow_definition_by_name("Investigation Workflow")
+        sync_workflow_definitions()
+        bump_definition_generation(definition.id)
+
+        reloaded = []
+
+        def read_generations(workflow_ids):
+            generations = get_definition_generations(workflow_ids)
+            patch.stop()
+            # Another thread reloads the definition while the generations are read
+            definitions.invalidate_workflow_definition(definition.id)
+            reloaded.append(get_workflow_definition(definition.id))
+            return generations
+
+        patch = mock.patch.object(
+            definitions, "get_definition_generations", read_generations
+        )
+        patch.start()
+        assert sync_workflow_definitions() == []
+        assert get_workflow_definition(definition.id) is reloaded[0]
+
+
+@pytest.mark.django_db
+class TestDefinitionSnapshots:
+    """Tests for the on-disk definition snapshots and the start-up warm-up"""
+
+    def test_snapshot_round_trip(
+        self, workflow_data, tmp_path, django_assert_num_queries
+    ):
+        """Test that a snapshot is loaded without queries, conditions included."""
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        from django_steps.cel import condition_cache
+        from django_steps.definitions import clear_workflow_definitions
+        from django_steps.snapshot import load_definition_snapshot
+
+        path = tmp_path / "definitions.snapshot"
+        out = StringIO()
+        call_command("steps_snapshot", str(path), stdout=out)
+        assert "Wrote 2 workflow definitions" in out.getvalue()
+        clear_workflow_definitions()
+        condition_cache.clear()
+
+        with django_assert_num_queries(0):
+            assert len(load_definition_snapshot(path)) == 2
+            definition = get_workflow_definition_by_name("Investigation Workflow")
+            initial = definition.get_step(workflow_data["step_int_1_init"].pk)
+            transition = initial.select_transition(
+                lambda: {"claim": {"is_high_risk": True}}
+            )
+            assert transition.to_step == workflow_data["step_int_3_interview"]
+            assert transition.to_step.workflow is definition.workflow
+        assert condition_cache.stats()["misses"] == 0
+
+    def test_stale_definitions_are_skipped(
+        self, workflow_data, tmp_path, django_assert_num_queries
+    ):
+        """Test that definitions changed since the snapshot are loaded from the database."""
+        from django_steps.definitions import clear_workflow_definitions
+        from django_steps.snapshot import (
+            load_definition_snapshot,
+            write_definition_snapshot,
+        )
+
+        path = tmp_path / "definitions.snapshot"
+        write_definition_snapshot(path)
+        investigation = workflow_data["workflow_investigation"]
+        fasttrack = workflow_data["workflow_fasttrack"]
+        bump_definition_generation(investigation.pk)
+        clear_workflow_definitions()
+
+        assert load_definition_snapshot(path) == [fasttrack.pk]
+        with django_assert_num_queries(0):
+            get_workflow_definition(fasttrack.pk)
+        # A single read of the workflow and its compiled plan
+        with django_assert_num_queries(1):
+            get_workflow_definition(investigation.pk)
+
+    def test_unknown_generations_are_stale(self, workflow_data, tmp_path):
+        """Test that definitions are loaded from the database when generations are lost."""
+        from django.core.cache import cache
+
+        from django_steps.definitions import (
+            clear_workflow_definitions,
+            get_definition_generations,
+        )
+        from django_steps.snapshot import (
+            load_definition_snapshot,
+            write_definition_snapshot,
+        )
+
+        investigation = workflow_data["workflow_investigation"]
+        cache.delete(f"django_steps:definition_generation:{investigation.pk}")
+        path = tmp_path / "definitions.snapshot"
+        write_definition_snapshot(path)
+        # Definitions without a generation got one, so the snapshot can be checked
+        assert (
+            get_definition_generations([investigation.pk])[investigation.pk] is not None
+        )
+
+        # The generations were lost (cache flushed, evicted or not shared)
+        cache.clear()
+        clear_workflow_definitions()
+        assert load_definition_snapshot(path) == []
+
+    def test_snapshot_of_another_version_is_ignored(self, workflow_data, tmp_path):
+        """Test that snapshots in another format, and missing files, load nothing."""
+        from unittest import mock
+
+        from django_steps.snapshot import (
+            load_definition_snapshot,
+            write_definition_snapshot,
+        )
+
+        path = tmp_path / "definitions.snapshot"
+        write_definition_snapshot(path)
+
+        with mock.patch("django_steps.snapshot.SNAPSHOT_FORMAT", 2):
+            assert load_definition_snapshot(path) == []
+        assert load_definition_snapshot(tmp_path / "missing.snapshot") == []
+
+    def test_warm_up_from_database(self, workflow_data, django_assert_num_queries):
+        """Test that the warm-up loads every definition and prepares its conditions."""
+        from django_steps.cel import parse_condition
+        from django_steps.definitions import clear_workflow_definitions
+        from django_steps.snapshot import load_workflow_definitions
+
+        clear_workflow_definitions()
+        assert load_workflow_definitions() == 2
+        assert load_workflow_definitions() == 0
+
+        with django_assert_num_queries(0):
+            definition = get_workflow_definition_by_name("Investigation Workflow")
+        condition = (
+            definition.get_step(workflow_data["step_int_1_init"].pk)
+            .transitions[0]
+            .condition
+        )
+        assert parse_condition(condition).is_compiled
@@ -0,0 +1,193 @@
+from unittest import mock
+
+import pytest
+from django.db import transaction
+
+from django_steps.history import workflow_actor
+from django_steps.models import WorkflowInstance, WorkflowInstanceEvent
+from django_steps.services import bulk_update_workflow_step_status
+from django_steps.transactions import CommitHook, get_commit_hook, get_pending_hooks
+
+Kind = WorkflowInstanceEvent.Kind
+
+
+class _Hook(CommitHook):
+    def run(self):
+        pass
+
+
+@pytest.mark.django_db
+class TestWorkflowInstanceHistory:
+    """
+    Tests for the transition history of workflow instances. Changes are made in a
+    transaction of their own (as with ATOMIC_REQUESTS), whose events are flushed
+    by the on_commit callback it registers.
+    """
+
+    CONTEXT = {"claim": {"is_high_risk": True}}
+
+    def test_status_update_and_advance(
+        self,
+        workflow_data,
+        django_capture_on_commit_callbacks,
+        django_assert_num_queries,
+    ):
+        """Test that a status update that advances records two events with one INSERT."""
+        instance = workflow_data["instance_high_risk"]
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            with transaction.atomic(), workflow_actor("claims-bot"):
+                assert instance.update_step_status("Review Complete", self.CONTEXT)
+            # Nothing is written until the transaction commits
+            assert not instance.events.exists()
+
+        assert len(callbacks) == 1
+        with django_assert_num_queries(1):
+            callbacks[0]()
+
+        changed, advanced = instance.events.all()
+        assert changed.kind == Kind.STATUS_CHANGED
+        assert changed.from_status == workflow_data["status_int_1_default"]
+        assert changed.to_status == workflow_data["status_int_1_complete"]
+        assert advanced.kind == Kind.ADVANCED
+        assert advanced.from_step == workflow_data["step_int_1_init"]
+        assert advanced.to_step == workflow_data["step_int_3_interview"]
+        assert advanced.transition is not None
+        assert {changed.actor, advanced.actor} == {"claims-bot"}
+
+    def test_rolled_back_savepoint(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that the events of a rolled back savepoint are discarded."""
+        instance = workflow_data["instance_low_risk"]
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            assert instance.set_on_hold()
+            try:
+                with transaction.atomic():
+                    WorkflowInstance.objects.get(pk=instance.pk).resume_workflow()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        assert list(instance.events.values_list("kind", flat=True)) == [Kind.ON_HOLD]
+
+    def test_rolled_back_buffer_not_reused(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that a buffer dropped by a rollback isn't reused by the next transaction."""
+        instance = workflow_data["instance_low_risk"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            # Both blocks get the same savepoint id
+            transaction.clean_savepoints()
+            try:
+                with transaction.atomic():
+                    assert instance.set_on_hold()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            transaction.clean_savepoints()
+            with transaction.atomic():
+                assert WorkflowInstance.objects.get(pk=instance.pk).cancel_workflow()
+
+        assert list(instance.events.values_list("kind", flat=True)) == [Kind.CANCELLED]
+
+    def test_user_actor(
+        self, workflow_data, test_users, django_capture_on_commit_callbacks
+    ):
+        """Test that users are recorded by username."""
+        instance = workflow_data["instance_low_risk"]
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            with workflow_actor(test_users["another"]):
+                assert instance.cancel_workflow()
+
+        event = instance.events.get()
+        assert event.kind == Kind.CANCELLED
+        assert event.actor == test_users["another"].get_username()
+
+    def test_bulk_operations(self, workflow_data, django_capture_on_commit_callbacks):
+        """Test that bulk operations record an event per instance they change."""
+        instances = WorkflowInstance.objects.filter(
+            pk__in=[
+                workflow_data["instance_low_risk"].pk,
+                workflow_data["instance_high_risk"].pk,
+            ]
+        )
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            assert instances.bulk_set_on_hold().applied == 2
+            bulk_update_workflow_step_status(instances, "Assigned")
+
+        kinds = WorkflowInstanceEvent.objects.filter(
+            instance__in=instances
+        ).values_list("kind", flat=True)
+        assert sorted(kinds) == [Kind.ON_HOLD] * 2 + [Kind.STATUS_CHANGED] * 2
+
+    def test_history_disabled(
+        self, workflow_data, settings, django_capture_on_commit_callbacks
+    ):
+        """Test that nothing is recorded when RECORD_HISTORY is off."""
+        settings.DJANGO_STEPS = {"RECORD_HISTORY": False}
+        instance = workflow_data["instance_low_risk"]
+
+        with django_capture_on_commit_callbacks(
+            execute=True
+        ) as callbacks, transaction.atomic():
+            assert instance.set_on_hold()
+
+        assert callbacks == []
+        assert not WorkflowInstanceEvent.objects.exists()
+
+
+@pytest.mark.django_db
+class TestCommitHooks:
+    """Tests for the per-savepoint on_commit hooks buffering the history events"""
+
+    def test_hooks_follow_savepoints(self, django_capture_on_commit_callbacks):
+        """
+        Test that hooks are reused within a savepoint and dropped with it. This checks
+        the on_commit internals of the installed Django that get_commit_hook relies on.
+        """
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            outer = get_commit_hook(_Hook)
+            assert get_commit_hook(_Hook) is outer
+            try:
+                with transaction.atomic():
+                    rolled_back = get_commit_hook(_Hook)
+                    assert rolled_back is not outer
+                    assert set(get_pending_hooks(_Hook)) == {outer, rolled_back}
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            assert get_pending_hooks(_Hook) == [outer]
+            assert get_commit_hook(_Hook) is outer
+
+            with transaction.atomic():
+                released = get_commit_hook(_Hook)
+            assert released is not outer
+            assert set(get_pending_hooks(_Hook)) == {outer, released}
+
+        assert outer.done and released.done
+        assert not rolled_back.done
+
+    def test_hooks_without_inspection(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that every event is recorded once if on_commit can't be inspected."""
+        instance = workflow_data["instance_low_risk"]
+
+        with mock.patch(
+            "django_steps.transactions._can_inspect", return_value=False
+        ), django_capture_on_commit_callbacks(
+            execute=True
+        ) as callbacks, transaction.atomic():
+            assert instance.set_on_hold()
+            assert WorkflowInstance.objects.get(pk=instance.pk).resume_workflow()
+            assert get_pending_hooks(_Hook) == []
+
+        assert len(callbacks) >= 2
+        assert sorted(instance.events.values_list("kind", flat=True)) == sorted(
+            [Kind.ON_HOLD, Kind.RESUMED]
+        )
@@ -2,7 +2,11 @@ import pytest
 from django.db import IntegrityError, transaction
 
 from django_steps.models import (
-    Workflow, WorkflowInstance, WorkflowStep, WorkflowStepStatus, WorkflowTransition
+    Workflow,
+    WorkflowInstance,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
 )
 
 
@@ -42,7 +46,9 @@ class TestWorkflowModels:
         assert complete_status.is_completion_status is True
         assert on_hold_status.is_on_hold_status is True
         assert cancel_status.is_cancellation_status is True
-        assert cancel_status.is_completion_status is True  # Cancellation can also be completion
+        assert (
+            cancel_status.is_completion_status is True
+        )  # Cancellation can also be completion
 
     def test_workflow_transition_creation(self, workflow_data):
         """Test the creation and properties of WorkflowTransition model."""
@@ -53,12 +59,14 @@ class TestWorkflowModels:
         to_step = workflow_data["step_int_3_interview"]
 
         transition = WorkflowTransition.objects.get(
-            from_step=from_step, 
-            to_step=to_step
+            from_step=from_step, to_step=to_step
         )
         assert transition.condition == "claim.is_high_risk == true"
         assert transition.priority == 20
-        assert str(transition) == "Transition from 'Initial Review' to 'Interview Stakeholders' (Investigation Workflow)"
+        assert (
+            str(transition)
+            == "Transition from 'Initial Review' to 'Interview Stakeholders' (Investigation Workflow)"
+        )
 
     def test_workflow_instance_creation(self, workflow_data):
         """Test the basic creation and initialization of WorkflowInstance for User model."""
@@ -78,9 +86,17 @@ class TestWorkflowModels:
         assert instance_cancelled.workflow == workflow_data["workflow_fasttrack"]
 
         # Verify the content_objects are the User instances
-        assert instance_low_risk.content_object == workflow_data["test_users"]["low_risk"]
-        assert instance_high_risk.content_object == workflow_data["test_users"]["high_risk"]
-        assert instance_cancelled.content_object == workflow_data["test_users"]["cancelled"]
+        assert (
+            instance_low_risk.content_object == workflow_data["test_users"]["low_risk"]
+        )
+        assert (
+            instance_high_risk.content_object
+            == workflow_data["test_users"]["high_risk"]
+        )
+        assert (
+            instance_cancelled.content_object
+            == workflow_data["test_users"]["cancelled"]
+        )
 
         # Verify the workflows were initialized
         assert instance_low_risk.current_step is not None
@@ -161,3 +177,61 @@ class TestWorkflowValidation:
                     condition="claim.amount == 123",  # Condition here is different, but priority is same
                     priority=20,  # Duplicates existing priority for this from/to pair
                 )
+
+
+@pytest.mark.django_db
+class TestTypedObjectIds:
+    """Tests for storing object ids in the type of their model's primary key"""
+
+    def test_object_id_fields(self, workflow_data, test_users):
+        """Test that the ids of integer, UUID and other primary keys go to their own field."""
+        import uuid
+
+        from django.db import models
+
+        from django_steps.models import get_object_id_values, object_id_field_name
+
+        class UUIDModel:
+            class _meta:
+                pk = models.UUIDField(primary_key=True)
+
+        class SlugModel:
+            class _meta:
+                pk = models.SlugField(primary_key=True)
+
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+        assert instance.object_id == str(test_users["low_risk"].pk)
+        assert instance.object_id_int == test_users["low_risk"].pk
+        assert instance.object_id_uuid is None
+
+        pk = uuid.uuid4()
+        assert object_id_field_name(UUIDModel) == "object_id_uuid"
+        assert get_object_id_values(UUIDModel, str(pk).upper()) == {
+            "object_id": str(pk),
+            "object_id_int": None,
+            "object_id_uuid": pk,
+        }
+        assert object_id_field_name(SlugModel) == "object_id"
+        assert get_object_id_values(SlugModel, "claim-1") == {
+            "object_id": "claim-1",
+            "object_id_int": None,
+            "object_id_uuid": None,
+        }
+
+    def test_lookup_without_cast(self, workflow_data, test_users):
+        """Test that lookups by object compare the typed field, served by its index."""
+        from django.contrib.auth.models import User
+        from django.contrib.contenttypes.models import ContentType
+
+        content_type = ContentType.objects.get_for_model(User)
+        query = WorkflowInstance.objects.for_object(
+            content_type, test_users["high_risk"].pk
+        )
+
+        assert list(query) == [workflow_data["instance_high_risk"]]
+        sql = str(query.query)
+        assert '"object_id_int" =' in sql
+        assert "CAST" not in sql
+        assert "django_steps_inst_int_obj_idx" in query.explain()
@@ -0,0 +1,305 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_steps.models import WorkflowInstance, WorkflowOperation
+from django_steps.queue import (
+    claim_operations,
+    enqueue_operation,
+    get_latest_advancement,
+    process_operations,
+    release_stale_operations,
+    run_operation,
+    run_worker,
+)
+from django_steps.services import update_workflow_step_status
+from django_steps.signals import operation_finished
+
+Kind = WorkflowOperation.Kind
+State = WorkflowOperation.State
+
+
+@pytest.mark.django_db
+class TestWorkflowOperationQueue:
+    """Tests for the database-backed queue of workflow operations"""
+
+    def test_claim_by_priority(self, workflow_data):
+        """Test that operations are claimed highest priority first, and only once."""
+        instance = workflow_data["instance_low_risk"]
+        normal = enqueue_operation(instance, Kind.SET_ON_HOLD)
+        urgent = enqueue_operation(
+            instance, Kind.UPDATE_STATUS, "Assigned", priority=100
+        )
+        enqueue_operation(instance, Kind.RESUME, delay=60)  # Not available yet
+
+        claimed = claim_operations(batch_size=1)
+        assert [operation.pk for operation in claimed] == [urgent.pk]
+        assert claimed[0].state == State.RUNNING
+        assert claimed[0].attempts == 1
+
+        assert [operation.pk for operation in claim_operations()] == [normal.pk]
+        assert claim_operations() == []
+
+    def test_enqueue_validation(self, workflow_data):
+        """Test that unknown operations and status updates without a status are rejected."""
+        instance = workflow_data["instance_low_risk"]
+        with pytest.raises(ValueError):
+            enqueue_operation(instance, "explode")
+        with pytest.raises(ValueError):
+            enqueue_operation(instance, Kind.UPDATE_STATUS)
+
+    def test_process_operations(self, workflow_data):
+        """Test that claimed operations are run through the services."""
+        instance = workflow_data["instance_high_risk"]
+        update = enqueue_operation(
+            instance,
+            Kind.UPDATE_STATUS,
+            "Review Complete",
+            context_data={"claim": {"is_high_risk": True}},
+        )
+        invalid = enqueue_operation(
+            instance, Kind.UPDATE_STATUS, "No Such Status", priority=-1
+        )
+
+        assert process_operations() == 2
+
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+        update.refresh_from_db()
+        assert update.state == State.DONE
+        assert update.finished_at is not None
+        invalid.refresh_from_db()
+        assert invalid.state == State.FAILED
+
+    def test_advance_operation(self, workflow_data):
+        """Test that advancement can be retried for instances stuck at a completion status."""
+        instance = workflow_data["instance_low_risk"]
+        # No context: neither condition holds and the instance stays at 'Initial Review'
+        assert instance.update_step_status("Review Complete") is False
+
+        enqueue_operation(
+            instance, Kind.ADVANCE, context_data={"claim": {"is_high_risk": False}}
+        )
+        assert process_operations() == 1
+
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_2_doc_collection"]
+
+    def test_errors_are_retried(self, workflow_data, settings):
+        """Test that failing operations are retried later, then marked as failed."""
+        settings.DJANGO_STEPS = {"QUEUE_MAX_ATTEMPTS": 2, "QUEUE_RETRY_DELAY": 0}
+        instance = workflow_data["instance_low_risk"]
+        operation = enqueue_operation(instance, Kind.CANCEL)
+
+        with mock.patch.dict(
+            "django_steps.queue.HANDLERS",
+            {Kind.CANCEL: mock.Mock(side_effect=RuntimeError("boom"))},
+        ):
+            run_operation(claim_operations()[0])
+            operation.refresh_from_db()
+            assert operation.state == State.PENDING
+            assert operation.last_error == "RuntimeError: boom"
+
+            run_operation(claim_operations()[0])
+            operation.refresh_from_db()
+            assert operation.state == State.FAILED
+            assert operation.attempts == 2
+
+    def test_conflicts_are_retried(self, workflow_data):
+        """Test that an operation losing a race is run again on fresh state."""
+        instance = workflow_data["instance_low_risk"]
+        operation = enqueue_operation(instance, Kind.SET_ON_HOLD)
+        claimed = claim_operations()[0]
+        # Another writer changes the instance after the worker loaded it
+        WorkflowInstance.objects.get(pk=instance.pk).update_step_status("Assigned")
+
+        assert run_operation(claimed) is False
+        operation.refresh_from_db()
+        assert operation.state == State.PENDING
+
+        assert process_operations() == 1
+        instance.refresh_from_db()
+        assert instance.current_step_status == workflow_data["status_int_1_on_hold"]
+
+    def test_release_stale_operations(self, workflow_data):
+        """Test that operations claimed by a worker that died are queued again."""
+        operation = enqueue_operation(
+            workflow_data["instance_low_risk"], Kind.SET_ON_HOLD
+        )
+        claim_operations()
+        assert release_stale_operations() == 0
+
+        WorkflowOperation.objects.filter(pk=operation.pk).update(
+            claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        assert release_stale_operations() == 1
+        assert [op.pk for op in claim_operations()] == [operation.pk]
+
+    def test_released_operations_run_once(self, workflow_data):
+        """Test that a worker doesn't run an operation released from its batch."""
+        instance = workflow_data["instance_low_risk"]
+        enqueue_operation(instance, Kind.UPDATE_STATUS, "Assigned", priority=1)
+        operation = enqueue_operation(instance, Kind.SET_ON_HOLD)
+        first, second = claim_operations()
+        assert run_operation(first)
+
+        # The batch outlives the claim timeout: another worker takes the second one
+        WorkflowOperation.objects.filter(pk=operation.pk).update(
+            claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        assert release_stale_operations() == 1
+        assert process_operations() == 1
+        operation.refresh_from_db()
+        assert operation.state == State.DONE
+
+        handler = mock.Mock()
+        with mock.patch.dict(
+            "django_steps.queue.HANDLERS", {Kind.SET_ON_HOLD: handler}
+        ):
+            assert run_operation(second) is False
+        handler.assert_not_called()
+        operation.refresh_from_db()
+        assert operation.state == State.DONE
+
+    def test_stale_operations_fail_after_max_attempts(self, workflow_data, settings):
+        """Test that an operation whose worker keeps dying is eventually failed."""
+        settings.DJANGO_STEPS = {"QUEUE_MAX_ATTEMPTS": 2}
+        operation = enqueue_operation(
+            workflow_data["instance_low_risk"], Kind.SET_ON_HOLD
+        )
+        finished = []
+
+        def receiver(sender, operation, instance, success, **kwargs):
+            finished.append((operation.pk, success))
+
+        operation_finished.connect(receiver)
+        try:
+            for expected_state in (State.PENDING, State.FAILED):
+                claim_operations()
+                WorkflowOperation.objects.filter(pk=operation.pk).update(
+                    claimed_at=timezone.now() - timedelta(hours=1)
+                )
+                assert release_stale_operations() == 1
+                operation.refresh_from_db()
+                assert operation.state == expected_state
+        finally:
+            operation_finished.disconnect(receiver)
+
+        assert operation.attempts == 2
+        assert operation.last_error
+        assert claim_operations() == []
+        assert finished == [(operation.pk, False)]
+
+    def test_worker(self, workflow_data):
+        """Test that a worker drains the queue and stops once it is empty."""
+        for instance in (
+            workflow_data["instance_low_risk"],
+            workflow_data["instance_high_risk"],
+        ):
+            enqueue_operation(instance, Kind.SET_ON_HOLD)
+
+        assert run_worker(threading.Event(), batch_size=1, once=True) == 2
+        assert not WorkflowOperation.objects.exclude(state=State.DONE).exists()
+
+    def test_steps_worker_command(self, workflow_data):
+        """Test the steps_worker management command."""
+        enqueue_operation(workflow_data["instance_low_risk"], Kind.SET_ON_HOLD)
+        out = StringIO()
+
+        call_command("steps_worker", "--once", stdout=out)
+
+        assert "Processed 1 workflow operations." in out.getvalue()
+
+
+class _InlineExecutor:
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.mark.django_db
+class TestDeferredAdvancement:
+    """Tests for advancing workflows in the background after a status update"""
+
+    CONTEXT = {"claim": {"is_high_risk": True}}
+
+    def test_defer_per_call(self, workflow_data, django_capture_on_commit_callbacks):
+        """Test that only the status is written, and the advancement runs on commit."""
+        instance = workflow_data["instance_high_risk"]
+        finished = []
+
+        def receiver(sender, operation, instance, success, **kwargs):
+            finished.append((operation.kind, instance.pk, success))
+
+        operation_finished.connect(receiver)
+        try:
+            with mock.patch(
+                "django_steps.queue._get_executor", return_value=_InlineExecutor()
+            ):
+                with django_capture_on_commit_callbacks(execute=True):
+                    assert update_workflow_step_status(
+                        instance,
+                        "Review Complete",
+                        self.CONTEXT,
+                        defer_advancement=True,
+                    )
+                    stored = WorkflowInstance.objects.get(pk=instance.pk)
+                    assert stored.current_step == workflow_data["step_int_1_init"]
+                    assert (
+                        stored.current_step_status
+                        == workflow_data["status_int_1_complete"]
+                    )
+                    assert get_latest_advancement(instance).state == State.PENDING
+        finally:
+            operation_finished.disconnect(receiver)
+
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+        assert get_latest_advancement(instance).state == State.DONE
+        assert finished == [(Kind.ADVANCE, instance.pk, True)]
+
+    def test_defer_per_workflow(self, workflow_data, settings):
+        """Test that workflows flagged for deferred advancement are advanced by the workers."""
+        settings.DJANGO_STEPS = {"DEFERRED_ADVANCEMENT_BACKEND": "queue"}
+        workflow = workflow_data["workflow_investigation"]
+        workflow.deferred_advancement = True
+        workflow.save()
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_high_risk"].pk
+        )
+
+        assert update_workflow_step_status(instance, "Review Complete", self.CONTEXT)
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_1_init"]
+
+        assert process_operations() == 1
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+
+    def test_non_completion_status_is_not_deferred(self, workflow_data):
+        """Test that status updates that don't complete the step queue nothing."""
+        instance = workflow_data["instance_low_risk"]
+
+        assert update_workflow_step_status(instance, "Assigned", defer_advancement=True)
+
+        assert get_latest_advancement(instance) is None
+
+    def test_deferred_advancement_failure(self, workflow_data, settings):
+        """Test that an advancement that can't be taken is reported as failed."""
+        settings.DJANGO_STEPS = {"DEFERRED_ADVANCEMENT_BACKEND": "queue"}
+        instance = workflow_data["instance_low_risk"]
+
+        # Neither transition condition holds without the claim's risk
+        assert update_workflow_step_status(
+            instance, "Review Complete", {"claim": {}}, defer_advancement=True
+        )
+        process_operations()
+
+        operation = get_latest_advancement(instance)
+        assert operation.state == State.FAILED
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_1_init"]
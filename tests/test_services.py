@@ -7,7 +7,7 @@ from django_steps.services import (
     cancel_workflow_instance,
     set_workflow_on_hold,
     resume_workflow_instance,
-    get_workflow_instance_for_object
+    get_workflow_instance_for_object,
 )
 
 
@@ -19,8 +19,7 @@ class TestWorkflowServices:
         """Test the service function for starting a workflow instance."""
         test_obj = test_users["another"]
         instance = start_workflow_instance(
-            workflow_data["workflow_investigation"].name,
-            test_obj
+            workflow_data["workflow_investigation"].name, test_obj
         )
         assert instance is not None
         assert instance.workflow == workflow_data["workflow_investigation"]
@@ -31,7 +30,9 @@ class TestWorkflowServices:
     def test_service_start_workflow_instance_invalid_object(self):
         """Test service function handles unsaved content_object."""
         with pytest.raises(ValueError):
-            start_workflow_instance("Any Workflow", {})  # Pass a dict to simulate unsaved object
+            start_workflow_instance(
+                "Any Workflow", {}
+            )  # Pass a dict to simulate unsaved object
 
     def test_service_start_workflow_instance_not_found(self, test_users, workflow_data):
         """Test service function when workflow name does not exist."""
@@ -39,7 +40,9 @@ class TestWorkflowServices:
         instance = start_workflow_instance("NonExistentWorkflow", test_obj)
         assert instance is None
 
-    def test_service_start_workflow_instance_duplicate_active(self, workflow_data, test_users):
+    def test_service_start_workflow_instance_duplicate_active(
+        self, workflow_data, test_users
+    ):
         """Test service function returns existing active instance to prevent duplicates."""
         test_obj = test_users["another"]
 
@@ -53,13 +56,19 @@ class TestWorkflowServices:
         second_instance = start_workflow_instance(
             workflow_data["workflow_investigation"].name, test_obj
         )
-        assert first_instance.id == second_instance.id  # Should return the same instance
+        assert (
+            first_instance.id == second_instance.id
+        )  # Should return the same instance
 
-    def test_service_update_workflow_step_status_success(self, workflow_data, test_users):
+    def test_service_update_workflow_step_status_success(
+        self, workflow_data, test_users
+    ):
         """Test the service function for updating step status."""
         test_obj = test_users["another"]
 
-        instance = start_workflow_instance(workflow_data["workflow_fasttrack"].name, test_obj)
+        instance = start_workflow_instance(
+            workflow_data["workflow_fasttrack"].name, test_obj
+        )
         assert instance is not None
 
         # Update status, which should trigger advancement
@@ -78,7 +87,9 @@ class TestWorkflowServices:
     def test_service_cancel_workflow_instance(self, workflow_data, test_users):
         """Test the service function for cancelling a workflow."""
         test_obj = test_users["another"]
-        instance = start_workflow_instance(workflow_data["workflow_investigation"].name, test_obj)
+        instance = start_workflow_instance(
+            workflow_data["workflow_investigation"].name, test_obj
+        )
         assert instance is not None
 
         # Ensure the current step has a cancellation status defined for this test
@@ -91,7 +102,9 @@ class TestWorkflowServices:
     def test_service_set_workflow_on_hold(self, workflow_data, test_users):
         """Test the service function for putting a workflow on hold."""
         test_obj = test_users["another"]
-        instance = start_workflow_instance(workflow_data["workflow_investigation"].name, test_obj)
+        instance = start_workflow_instance(
+            workflow_data["workflow_investigation"].name, test_obj
+        )
         assert instance is not None
 
         assert set_workflow_on_hold(instance) is True
@@ -101,7 +114,9 @@ class TestWorkflowServices:
     def test_service_resume_workflow_instance(self, workflow_data, test_users):
         """Test the service function for resuming a workflow."""
         test_obj = test_users["another"]
-        instance = start_workflow_instance(workflow_data["workflow_investigation"].name, test_obj)
+        instance = start_workflow_instance(
+            workflow_data["workflow_investigation"].name, test_obj
+        )
         assert instance is not None
 
         set_workflow_on_hold(instance)  # Put on hold first
@@ -151,3 +166,549 @@ class TestWorkflowServices:
             test_obj, workflow_name="AnotherNonExistentWorkflow"
         )
         assert no_instance_specific is None
+
+
+@pytest.mark.django_db
+class TestBulkStartWorkflowInstances:
+    """Tests for starting workflows for many objects at once"""
+
+    def test_bulk_start_from_queryset(self, workflow_data, django_assert_num_queries):
+        """Test that a queryset is started chunk by chunk with a constant number of queries."""
+        from django.contrib.auth.models import User
+        from django_steps.models import WorkflowInstance
+        from django_steps.services import bulk_start_workflow_instances
+
+        User.objects.bulk_create(User(username=f"bulk_{i}") for i in range(7))
+        workflow = workflow_data["workflow_investigation"]
+        users = workflow_data["test_users"]
+
+        # 11 users in chunks of 4: each chunk reads the existing instances and inserts the new ones
+        with django_assert_num_queries(1 + 3 * 4):
+            result = bulk_start_workflow_instances(
+                workflow.name, User.objects.all(), batch_size=4
+            )
+
+        assert sorted(result.unchanged) == sorted(
+            [users["low_risk"].pk, users["high_risk"].pk]
+        )
+        assert len(result) == 9
+        assert result.skipped == []
+        instances = WorkflowInstance.objects.filter(
+            workflow=workflow, object_id__in=result.succeeded
+        )
+        assert instances.count() == 9
+        for instance in instances:
+            assert instance.current_step == workflow_data["step_int_1_init"]
+            assert instance.current_step_status == workflow_data["status_int_1_default"]
+            assert not instance.is_completed()
+
+    def test_bulk_start_from_objects(self, workflow_data, test_users):
+        """Test that completed instances are skipped and duplicates started once."""
+        from django_steps.services import bulk_start_workflow_instances
+
+        workflow = workflow_data["workflow_fasttrack"]
+        cancelled = workflow_data["instance_cancelled"]
+        assert cancelled.cancel_workflow()
+
+        objects = [
+            test_users["cancelled"],
+            test_users["another"],
+            test_users["another"],
+        ]
+        result = bulk_start_workflow_instances(workflow.name, objects)
+
+        assert result.succeeded == [test_users["another"].pk]
+        assert result.skipped == [test_users["cancelled"].pk]
+        assert (
+            get_workflow_instance_for_object(test_users["another"], workflow.name)
+            is not None
+        )
+
+    def test_bulk_start_invalid_input(self, workflow_data, test_users):
+        """Test that unknown workflows and unsaved objects are reported."""
+        from django.contrib.auth.models import User
+        from django_steps.services import bulk_start_workflow_instances
+
+        assert (
+            bulk_start_workflow_instances(
+                "NonExistentWorkflow", [test_users["another"]]
+            )
+            is None
+        )
+        with pytest.raises(ValueError):
+            bulk_start_workflow_instances(
+                workflow_data["workflow_fasttrack"].name, [User(username="unsaved")]
+            )
+
+
+def claim_context(user):
+    """Context provider deriving a claim from the test users' names"""
+    return {
+        "claim": {
+            "is_high_risk": user.username.endswith("high_risk"),
+            "status_field": "Approved",
+        }
+    }
+
+
+@pytest.mark.django_db
+class TestBulkUpdateWorkflowStepStatus:
+    """Tests for updating the status of many workflow instances at once"""
+
+    def test_bulk_update_advances_per_condition(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that conditional transitions are evaluated per instance with batched contexts."""
+        from django_steps.models import WorkflowInstance
+        from django_steps.services import bulk_update_workflow_step_status
+
+        low_risk = workflow_data["instance_low_risk"]
+        high_risk = workflow_data["instance_high_risk"]
+        fasttrack = workflow_data["instance_cancelled"]
+
+        # Ids, then per chunk: savepoint, instances, content objects, bulk_update, release
+        with django_assert_num_queries(6):
+            result = bulk_update_workflow_step_status(
+                WorkflowInstance.objects.all(),
+                "Review Complete",
+                context_provider=claim_context,
+            )
+
+        assert result.outcomes() == {
+            low_risk.pk: "succeeded",
+            high_risk.pk: "succeeded",
+            fasttrack.pk: "skipped",
+        }
+        low_risk.refresh_from_db()
+        high_risk.refresh_from_db()
+        assert low_risk.current_step == workflow_data["step_int_2_doc_collection"]
+        assert low_risk.current_step_status == workflow_data["status_int_2_default"]
+        assert high_risk.current_step == workflow_data["step_int_3_interview"]
+
+    def test_bulk_update_unconditional_transition(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that unconditional transitions need no context at all."""
+        from django_steps.services import bulk_update_workflow_step_status
+
+        low_risk = workflow_data["instance_low_risk"]
+        bulk_update_workflow_step_status(
+            [low_risk.pk], "Review Complete", claim_context
+        )
+
+        with django_assert_num_queries(5):
+            result = bulk_update_workflow_step_status([low_risk.pk], "Docs Complete")
+
+        assert result.succeeded == [low_risk.pk]
+        low_risk.refresh_from_db()
+        assert low_risk.current_step == workflow_data["step_int_5_report"]
+
+    def test_bulk_update_without_advancing(self, workflow_data):
+        """Test non-completion statuses and completion statuses without a matching transition."""
+        from django_steps.services import bulk_update_workflow_step_status
+
+        low_risk = workflow_data["instance_low_risk"]
+        high_risk = workflow_data["instance_high_risk"]
+        ids = [low_risk.pk, high_risk.pk]
+
+        assert bulk_update_workflow_step_status(ids, "Assigned").succeeded == ids
+        assert bulk_update_workflow_step_status(ids, "Assigned").unchanged == ids
+
+        # The users have no 'claim', so none of the conditions hold
+        result = bulk_update_workflow_step_status(ids, "Review Complete")
+        assert result.failed == ids
+        low_risk.refresh_from_db()
+        assert low_risk.current_step == workflow_data["step_int_1_init"]
+        assert low_risk.current_step_status == workflow_data["status_int_1_complete"]
+
+    def test_bulk_update_rolls_back_failing_chunks(
+        self, workflow_data, django_capture_on_commit_callbacks
+    ):
+        """Test that a chunk reaching a step without a default status fails on its own."""
+        from django_steps.services import bulk_update_workflow_step_status
+
+        low_risk = workflow_data["instance_low_risk"]
+        high_risk = workflow_data["instance_high_risk"]
+        default_status = workflow_data["status_int_3_default"]
+        with django_capture_on_commit_callbacks(execute=True):
+            default_status.is_default_status = False
+            default_status.save()
+
+        # High risk claims go to 'Interview Stakeholders', which has no default status
+        result = bulk_update_workflow_step_status(
+            [low_risk.pk, high_risk.pk],
+            "Review Complete",
+            context_provider=claim_context,
+            batch_size=1,
+        )
+
+        assert result.outcomes() == {low_risk.pk: "succeeded", high_risk.pk: "failed"}
+        low_risk.refresh_from_db()
+        high_risk.refresh_from_db()
+        assert low_risk.current_step == workflow_data["step_int_2_doc_collection"]
+        assert high_risk.current_step == workflow_data["step_int_1_init"]
+        assert high_risk.current_step_status == workflow_data["status_int_1_default"]
+
+    def test_bulk_update_completes_workflows(self, workflow_data):
+        """Test that completion statuses of the final step complete the workflows."""
+        from django_steps.services import bulk_update_workflow_step_status
+
+        instance = workflow_data["instance_cancelled"]
+        bulk_update_workflow_step_status([instance.pk], "Check Passed", claim_context)
+        result = bulk_update_workflow_step_status([instance.pk], "Approved Final")
+
+        assert result.succeeded == [instance.pk]
+        instance.refresh_from_db()
+        assert instance.completed_at is not None
+        assert instance.is_completed()
+        assert bulk_update_workflow_step_status(
+            [instance.pk], "Approved Final"
+        ).skipped == [instance.pk]
+
+
+@pytest.mark.django_db
+class TestWorkflowInstancesForObjects:
+    """Tests for loading the workflow instances of many content objects at once"""
+
+    def test_get_workflow_instances_for_objects(
+        self, workflow_data, test_users, django_assert_num_queries
+    ):
+        """Test that instances are loaded with one query and come with their step and status."""
+        from django_steps.definitions import get_workflow_definition
+        from django_steps.services import get_workflow_instances_for_objects
+
+        users = [
+            test_users[name]
+            for name in ("low_risk", "high_risk", "cancelled", "another")
+        ]
+        get_workflow_definition(workflow_data["workflow_investigation"].pk)
+        get_workflow_definition(workflow_data["workflow_fasttrack"].pk)
+
+        with django_assert_num_queries(1):
+            instances = get_workflow_instances_for_objects(users)
+            assert (
+                instances[test_users["low_risk"].pk].current_step_status.name
+                == "Pending Assignment"
+            )
+            assert (
+                instances[test_users["cancelled"].pk].workflow.name
+                == "Fast-Track Workflow"
+            )
+            assert (
+                instances[test_users["high_risk"].pk].content_object
+                is test_users["high_risk"]
+            )
+        assert set(instances) == {
+            test_users["low_risk"].pk,
+            test_users["high_risk"].pk,
+            test_users["cancelled"].pk,
+        }
+
+        by_workflow = get_workflow_instances_for_objects(users, "Fast-Track Workflow")
+        assert set(by_workflow) == {test_users["cancelled"].pk}
+        assert get_workflow_instances_for_objects(users, "No Such Workflow") == {}
+
+    def test_prefetch_workflow_instances(
+        self, workflow_data, test_users, django_assert_num_queries
+    ):
+        """Test that prefetched instances are returned without a query."""
+        from django.contrib.auth.models import User
+        from django_steps.definitions import get_workflow_definition
+        from django_steps.managers import WorkflowQuerySet
+
+        get_workflow_definition(workflow_data["workflow_investigation"].pk)
+        get_workflow_definition(workflow_data["workflow_fasttrack"].pk)
+        users = WorkflowQuerySet(User).order_by("pk").prefetch_workflow_instances()
+
+        # The users, then their workflow instances
+        with django_assert_num_queries(2):
+            statuses = [
+                getattr(
+                    get_workflow_instance_for_object(user), "current_step_status", None
+                )
+                for user in users.filter(username__startswith="user_")
+            ]
+        assert [status.name if status else None for status in statuses] == [
+            "Pending Assignment",
+            "Pending Assignment",
+            "Ready for Check",
+            None,
+        ]
+
+        # Another workflow name needs its own prefetch
+        user = users.get(pk=test_users["low_risk"].pk)
+        with django_assert_num_queries(1):
+            assert (
+                get_workflow_instance_for_object(user, "Investigation Workflow")
+                is not None
+            )
+
+
+@pytest.mark.django_db
+class TestInstanceIdentityMap:
+    """Tests for the request-scoped identity map of workflow instances"""
+
+    def test_repeated_lookups(
+        self, workflow_data, test_users, django_assert_num_queries
+    ):
+        """Test that an object's instance is loaded once per scope, with its relations."""
+        from django_steps.definitions import get_workflow_definition
+        from django_steps.scope import workflow_scope
+
+        get_workflow_definition(workflow_data["workflow_investigation"].pk)
+        user = test_users["low_risk"]
+
+        with workflow_scope():
+            with django_assert_num_queries(1):
+                instance = get_workflow_instance_for_object(user)
+            with django_assert_num_queries(0):
+                assert get_workflow_instance_for_object(user) is instance
+                assert (
+                    get_workflow_instance_for_object(user, "Investigation Workflow")
+                    is instance
+                )
+                assert (
+                    get_workflow_instance_for_object(test_users["low_risk"]) is instance
+                )
+                assert "Initial Review" in str(instance)
+                assert instance.current_step_status.name == "Pending Assignment"
+
+            # Status updates change the mapped object itself
+            assert update_workflow_step_status(instance, "Assigned")
+            with django_assert_num_queries(0):
+                assert (
+                    get_workflow_instance_for_object(user).current_step_status.name
+                    == "Assigned"
+                )
+
+        assert get_workflow_instance_for_object(user) is not instance
+
+    def test_stale_instances_are_forgotten(self, workflow_data, test_users):
+        """Test that bulk operations, other copies and new instances empty the map."""
+        from django_steps.models import WorkflowInstance
+        from django_steps.scope import workflow_scope
+
+        user = test_users["low_risk"]
+        with workflow_scope():
+            instance = get_workflow_instance_for_object(user)
+            WorkflowInstance.objects.filter(pk=instance.pk).bulk_set_on_hold()
+            reloaded = get_workflow_instance_for_object(user)
+            assert reloaded is not instance
+            assert reloaded.current_step_status == workflow_data["status_int_1_on_hold"]
+
+            WorkflowInstance.objects.get(pk=instance.pk).resume_workflow()
+            assert get_workflow_instance_for_object(user).current_step_status == (
+                workflow_data["status_int_1_default"]
+            )
+
+            another = test_users["another"]
+            assert get_workflow_instance_for_object(another) is None
+            started = start_workflow_instance("Fast-Track Workflow", another)
+            assert get_workflow_instance_for_object(another) is started
+
+
+@pytest.mark.django_db
+class TestWorkflowStateAnnotations:
+    """Tests for filtering and ordering content objects by workflow state in SQL"""
+
+    @pytest.fixture
+    def users(self, workflow_data):
+        from django.contrib.auth.models import User
+        from django_steps.managers import WorkflowQuerySet
+
+        return (
+            WorkflowQuerySet(User).filter(username__startswith="user_").order_by("pk")
+        )
+
+    def test_with_workflow_state(
+        self, workflow_data, test_users, users, django_assert_num_queries
+    ):
+        """Test that the state of each object's instance is annotated in a single query."""
+        from django_steps.models import WorkflowInstance
+
+        workflow_data["instance_high_risk"].update_step_status(
+            "Review Complete", {"claim": {"is_high_risk": True}}
+        )
+        annotated = users.with_workflow_state("Investigation Workflow")
+
+        with django_assert_num_queries(1):
+            rows = list(
+                annotated.values_list(
+                    "username", "workflow_step", "workflow_status", "workflow_state"
+                )
+            )
+        assert rows == [
+            (
+                "user_low_risk",
+                "Initial Review",
+                "Pending Assignment",
+                WorkflowInstance.State.ACTIVE,
+            ),
+            (
+                "user_high_risk",
+                "Interview Stakeholders",
+                "Pending Assignment",
+                WorkflowInstance.State.ACTIVE,
+            ),
+            ("user_cancelled", None, None, None),  # Fast-track workflow
+            ("user_another", None, None, None),
+        ]
+
+        latest = annotated.filter(workflow_state="active").order_by(
+            "-workflow_entered_step_at"
+        )
+        assert latest.first() == test_users["high_risk"]
+
+    def test_filter_by_workflow_step(self, workflow_data, test_users, users):
+        """Test filtering objects by the step and status of their instance."""
+        from django_steps.models import Workflow
+
+        workflow_data["instance_low_risk"].update_step_status("Assigned")
+
+        at_review = users.filter_by_workflow_step(
+            "Investigation Workflow", "Initial Review"
+        )
+        assert list(at_review) == [test_users["low_risk"], test_users["high_risk"]]
+        assigned = users.filter_by_workflow_step(
+            "Investigation Workflow", "Initial Review", status_name="Assigned"
+        )
+        assert list(assigned) == [test_users["low_risk"]]
+        assert not users.filter_by_workflow_step(
+            "Investigation Workflow", "No Such Step"
+        ).exists()
+
+        with pytest.raises(Workflow.DoesNotExist):
+            users.filter_by_workflow_step("No Such Workflow", "Initial Review")
+
+
+@pytest.mark.django_db
+class TestAsyncWorkflowServices:
+    """Tests for the async counterparts of the service functions"""
+
+    def test_astart_workflow_instance(self, workflow_data, test_users):
+        """Test that a workflow is started with a single INSERT, and not started twice."""
+        from asgiref.sync import async_to_sync
+        from django_steps.services import astart_workflow_instance
+
+        name = workflow_data["workflow_investigation"].name
+        instance = async_to_sync(astart_workflow_instance)(name, test_users["another"])
+        assert instance.current_step == workflow_data["step_int_1_init"]
+        assert instance.current_step_status == workflow_data["status_int_1_default"]
+
+        again = async_to_sync(astart_workflow_instance)(name, test_users["another"])
+        assert again.pk == instance.pk
+        assert (
+            async_to_sync(astart_workflow_instance)(
+                "NonExistentWorkflow", test_users["another"]
+            )
+            is None
+        )
+
+    def test_aupdate_workflow_step_status(self, workflow_data):
+        """Test that conditions are evaluated in the event loop when context data is given."""
+        from unittest import mock
+        from asgiref.sync import async_to_sync
+        from django_steps.services import aupdate_workflow_step_status
+
+        instance = workflow_data["instance_high_risk"]
+        version = instance.version
+        with mock.patch("django_steps.models.sync_to_async") as to_thread:
+            result = async_to_sync(aupdate_workflow_step_status)(
+                instance,
+                "Review Complete",
+                context_data={"claim": {"is_high_risk": True}},
+            )
+        assert result is True
+        to_thread.assert_not_called()
+
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+        assert instance.current_step_status == workflow_data["status_int_3_default"]
+        assert instance.version == version + 1  # Status and advancement written at once
+
+    def test_aupdate_workflow_step_status_loads_context(self, workflow_data):
+        """Test that the content object's context is loaded in a worker thread."""
+        from unittest import mock
+        from asgiref.sync import async_to_sync, sync_to_async
+        from django_steps.services import aupdate_workflow_step_status
+
+        instance = workflow_data["instance_high_risk"]
+        with mock.patch(
+            "django_steps.models.get_content_context",
+            return_value={"claim": {"is_high_risk": True}},
+        ) as get_content_context, mock.patch(
+            "django_steps.models.sync_to_async", wraps=sync_to_async
+        ) as to_thread:
+            assert async_to_sync(aupdate_workflow_step_status)(
+                instance, "Review Complete"
+            )
+        to_thread.assert_called_once()
+        get_content_context.assert_called_once()
+
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_3_interview"]
+
+    def test_aupdate_workflow_step_status_errors(self, workflow_data):
+        """Test invalid statuses, completed instances and concurrent updates."""
+        from asgiref.sync import async_to_sync
+        from django_steps.exceptions import WorkflowConflictError
+        from django_steps.models import WorkflowInstance
+        from django_steps.services import aupdate_workflow_step_status
+
+        instance = workflow_data["instance_low_risk"]
+        assert (
+            async_to_sync(aupdate_workflow_step_status)(instance, "No Such Status")
+            is False
+        )
+
+        WorkflowInstance.objects.get(pk=instance.pk).update_step_status("Assigned")
+        with pytest.raises(WorkflowConflictError):
+            async_to_sync(aupdate_workflow_step_status)(instance, "Review On Hold")
+
+        cancelled = workflow_data["instance_cancelled"]
+        assert (
+            async_to_sync(aupdate_workflow_step_status)(cancelled, "Check Passed")
+            is False
+        )
+
+    def test_async_lifecycle(self, workflow_data):
+        """Test holding, resuming and cancelling an instance."""
+        from asgiref.sync import async_to_sync
+        from django_steps.services import (
+            acancel_workflow_instance,
+            aresume_workflow_instance,
+            aset_workflow_on_hold,
+        )
+
+        instance = workflow_data["instance_low_risk"]
+        version = instance.version
+        assert async_to_sync(aset_workflow_on_hold)(instance) is True
+        assert instance.current_step_status == workflow_data["status_int_1_on_hold"]
+        assert async_to_sync(aset_workflow_on_hold)(instance) is False
+
+        assert async_to_sync(aresume_workflow_instance)(instance) is True
+        assert instance.current_step_status == workflow_data["status_int_1_default"]
+
+        assert async_to_sync(acancel_workflow_instance)(instance) is True
+        instance.refresh_from_db()
+        assert instance.current_step_status == workflow_data["status_int_1_cancelled"]
+        assert instance.completed_at is not None
+        assert instance.version == version + 3
+
+    def test_aget_workflow_instance_for_object(self, workflow_data, test_users):
+        """Test looking up the workflow instance of an object."""
+        from asgiref.sync import async_to_sync
+        from django_steps.services import aget_workflow_instance_for_object
+
+        lookup = async_to_sync(aget_workflow_instance_for_object)
+        instance = workflow_data["instance_low_risk"]
+        assert lookup(test_users["low_risk"]) == instance
+        assert (
+            lookup(test_users["low_risk"], workflow_data["workflow_investigation"].name)
+            == instance
+        )
+        assert (
+            lookup(test_users["low_risk"], workflow_data["workflow_fasttrack"].name)
+            is None
+        )
+        assert lookup(test_users["low_risk"], "NonExistentWorkflow") is None
@@ -0,0 +1,206 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+from django.template import Context, Template
+from django.test import override_settings
+
+from django_steps.models import WorkflowInstance
+from django_steps.services import start_workflow_instance, update_workflow_step_status
+from django_steps.state_cache import get_workflow_state
+
+
+@pytest.fixture
+def state_cache(settings, workflow_data):
+    # Enabled once the test data is created, which would leave tombstones otherwise
+    settings.DJANGO_STEPS = {"STATE_CACHE": True, "DEFINITION_CHECK_INTERVAL": 3600}
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("state_cache")
+class TestWorkflowStateCache:
+    """
+    Tests for the read-through cache of instance states. States are only cached once
+    the transaction reading them commits, so the tests run outside of one.
+    """
+
+    CONTEXT = {"claim": {"is_high_risk": True}}
+
+    def test_read_through(self, workflow_data, test_users, django_assert_num_queries):
+        """Test that states are loaded once, then served from the cache."""
+        user = test_users["low_risk"]
+        workflow = workflow_data["workflow_investigation"]
+        state = get_workflow_state(user, workflow.name)
+
+        assert state.instance_id == workflow_data["instance_low_risk"].pk
+        assert state.workflow_name == workflow.name
+        assert state.step_name == workflow_data["step_int_1_init"].name
+        assert state.status_name == workflow_data["status_int_1_default"].name
+        assert state.state == WorkflowInstance.State.ACTIVE
+        assert not state.is_completed
+        # The most recent instance is looked up once as well
+        assert get_workflow_state(user) == state
+
+        with django_assert_num_queries(0):
+            assert get_workflow_state(user, workflow.name) == state
+            assert get_workflow_state(user) == state
+
+    def test_writes_invalidate(
+        self, workflow_data, test_users, django_capture_on_commit_callbacks
+    ):
+        """Test that state writes invalidate the cache once their transaction commits."""
+        user = test_users["high_risk"]
+        before = get_workflow_state(user)
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            instance = WorkflowInstance.objects.get(pk=before.instance_id)
+            assert update_workflow_step_status(
+                instance, "Review Complete", {"claim": {"is_high_risk": True}}
+            )
+            # Still the committed state until the transaction commits
+            assert get_workflow_state(user) == before
+
+        after = get_workflow_state(user)
+        assert after.step_name == workflow_data["step_int_3_interview"].name
+        assert after.version > before.version
+        assert after.cache_key != before.cache_key
+
+    def test_out_of_order_commits(self, workflow_data, test_users):
+        """Test that a write committing after a newer one can't cache the older state."""
+        user = test_users["low_risk"]
+        get_workflow_state(user)
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+
+        callbacks = []
+        with mock.patch.object(
+            transaction,
+            "on_commit",
+            lambda func, using=None, robust=False: callbacks.append(func),
+        ):
+            with transaction.atomic():
+                assert update_workflow_step_status(instance, "Assigned")
+            with transaction.atomic():
+                assert instance.set_on_hold()
+        for callback in reversed(callbacks):
+            callback()
+
+        state = get_workflow_state(user)
+        assert state.status_name == workflow_data["status_int_1_on_hold"].name
+        assert state.version == instance.version
+
+    def test_rolled_back_reads(self, workflow_data, test_users):
+        """Test that a state read in a transaction that rolls back isn't cached."""
+        user = test_users["high_risk"]
+
+        with transaction.atomic():
+            instance = WorkflowInstance.objects.get(
+                pk=workflow_data["instance_high_risk"].pk
+            )
+            assert update_workflow_step_status(
+                instance, "Review Complete", self.CONTEXT
+            )
+            state = get_workflow_state(user)
+            assert state.step_name == workflow_data["step_int_3_interview"].name
+            transaction.set_rollback(True)
+
+        state = get_workflow_state(user)
+        assert state.step_name == workflow_data["step_int_1_init"].name
+        assert get_workflow_state(user) == state
+
+    def test_reads_racing_a_write(self, workflow_data, test_users):
+        """Test that a state loaded before a write commits isn't cached after it."""
+        from django_steps import services
+
+        user = test_users["low_risk"]
+        load = services.get_workflow_instance_for_object
+
+        def load_then_write(content_object, workflow_name=None):
+            loaded = load(content_object, workflow_name)
+            # Another request commits a change before the read caches what it loaded
+            instance = WorkflowInstance.objects.get(pk=loaded.pk)
+            assert update_workflow_step_status(instance, "Assigned")
+            return loaded
+
+        with mock.patch.object(
+            services, "get_workflow_instance_for_object", load_then_write
+        ):
+            stale = get_workflow_state(user)
+        assert stale.status_name == workflow_data["status_int_1_default"].name
+
+        state = get_workflow_state(user)
+        assert state.status_name == workflow_data["status_int_1_assigned"].name
+        assert state.version > stale.version
+
+    def test_bulk_operations(
+        self, workflow_data, test_users, django_capture_on_commit_callbacks
+    ):
+        """Test that set-based updates invalidate the states of the instances they change."""
+        user = test_users["low_risk"]
+        assert not get_workflow_state(user).is_on_hold
+        instances = WorkflowInstance.objects.filter(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            assert instances.bulk_set_on_hold().applied == 1
+        assert get_workflow_state(user).is_on_hold
+
+        with override_settings(
+            DJANGO_STEPS={"STATE_CACHE": True, "RECORD_HISTORY": False}
+        ), django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            assert instances.bulk_resume().applied == 1
+        assert not get_workflow_state(user).is_on_hold
+
+    def test_objects_without_instance(
+        self, workflow_data, test_users, django_capture_on_commit_callbacks
+    ):
+        """Test that missing instances are cached too, until one is started."""
+        user = test_users["another"]
+        workflow = workflow_data["workflow_fasttrack"]
+        assert get_workflow_state(user) is None
+        assert get_workflow_state(user, workflow.name) is None
+
+        with django_capture_on_commit_callbacks(execute=True):
+            instance = start_workflow_instance(workflow.name, user)
+
+        assert get_workflow_state(user).instance_id == instance.pk
+        assert get_workflow_state(user, workflow.name).instance_id == instance.pk
+
+        with django_capture_on_commit_callbacks(execute=True):
+            instance.delete()
+
+        assert get_workflow_state(user) is None
+
+    def test_template_fragment_caching(
+        self, workflow_data, test_users, django_capture_on_commit_callbacks
+    ):
+        """Test the workflow_state tag and its versioned key for fragment caching."""
+        template = Template(
+            "{% load cache django_steps %}"
+            "{% workflow_state user as state %}"
+            "{% cache 600 workflow_panel state.cache_key %}{{ state.status_name }}{% endcache %}"
+        )
+        user = test_users["low_risk"]
+        context = {"user": user}
+
+        assert (
+            template.render(Context(context))
+            == workflow_data["status_int_1_default"].name
+        )
+
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            assert update_workflow_step_status(instance, "Assigned")
+
+        assert (
+            template.render(Context(context))
+            == workflow_data["status_int_1_assigned"].name
+        )
@@ -0,0 +1,95 @@
+import pytest
+from django.contrib.auth.models import User
+
+from django_steps.cel import parse_condition
+from django_steps.models import WorkflowStep
+from django_steps.utils import (
+    extract_context_data_for_paths,
+    extract_context_data_from_content_object,
+    resolve_context_lookups,
+)
+
+
+class TestConditionContextExtraction:
+    """Tests for loading only the fields read by CEL conditions"""
+
+    def test_member_paths(self):
+        """Test that the member paths read by a condition are collected."""
+        condition = parse_condition(
+            'user.is_staff && user.email.endsWith("@example.com") || level > 2'
+        )
+        assert condition.member_paths == {
+            ("user", "is_staff"),
+            ("user", "email"),
+            ("level",),
+        }
+
+    def test_lookups(self):
+        """Test that member paths are mapped to ORM lookups."""
+        paths = {
+            ("workflowstep", "name"),
+            ("is_final_step",),
+            ("workflowstep", "workflow", "name"),
+        }
+        assert resolve_context_lookups(WorkflowStep, paths) == {
+            "name",
+            "is_final_step",
+            "workflow__name",
+        }
+        # Unknown names and 'id' are never part of the extracted context
+        assert resolve_context_lookups(User, {("user", "id"), ("risk_score",)}) == set()
+
+    @pytest.mark.parametrize(
+        "paths",
+        [
+            {("workflowstep",)},  # The whole object
+            {("workflowstep", "workflow")},  # The related object itself
+            {("workflowstep", "workflow", "missing")},
+            {("workflowstep", "possible_statuses")},  # Reverse relation
+        ],
+    )
+    def test_paths_that_cannot_be_projected(self, paths):
+        """Test that paths which need the full object are reported as such."""
+        assert resolve_context_lookups(WorkflowStep, paths) is None
+
+    @pytest.mark.django_db
+    def test_single_query(self, workflow_data, django_assert_num_queries):
+        """Test that the projected context is loaded in one query and matches the full extraction."""
+        step = workflow_data["step_int_2_doc_collection"]
+        paths = {("workflowstep", "name"), ("workflowstep", "workflow", "name")}
+
+        with django_assert_num_queries(1):
+            context = extract_context_data_for_paths(WorkflowStep, step.pk, paths)
+
+        assert context["name"] == step.name
+        assert context["workflowstep"]["workflow"]["name"] == step.workflow.name
+        condition = parse_condition('workflowstep.name == "Document Collection"')
+        assert condition.evaluate(context) is True
+        assert (
+            condition.evaluate(extract_context_data_from_content_object(step)) is True
+        )
+
+    @pytest.mark.django_db
+    def test_missing_object(self):
+        """Test that a missing content object yields an empty context."""
+        context = extract_context_data_for_paths(User, 0, {("user", "username")})
+        assert "username" not in context
+
+    @pytest.mark.django_db
+    def test_condition_context_skips_unread_fields(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that the content object isn't loaded when the conditions read none of its fields."""
+        instance = workflow_data["instance_low_risk"]
+        # Conditions of 'Initial Review' only read 'claim.*', which User doesn't have
+        step_definition = instance._get_definition().get_step(instance.current_step_id)
+        assert step_definition.context_paths == {("claim", "is_high_risk")}
+
+        with django_assert_num_queries(0):
+            context = instance._get_condition_context(step_definition)
+        assert list(context) == ["user"]
+
+        # Explicit context data is used as is
+        assert instance._get_condition_context(step_definition, {"claim": {}}) == {
+            "claim": {}
+        }
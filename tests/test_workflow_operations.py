@@ -2,7 +2,11 @@ import datetime
 import pytest
 
 from django_steps.models import (
-    Workflow, WorkflowInstance, WorkflowStep, WorkflowStepStatus, WorkflowTransition
+    Workflow,
+    WorkflowInstance,
+    WorkflowStep,
+    WorkflowStepStatus,
+    WorkflowTransition,
 )
 
 
@@ -91,7 +95,9 @@ class TestWorkflowInstanceOperations:
         assert instance.update_step_status("Assigned") is True
         instance.refresh_from_db()
         assert instance.current_step_status == workflow_data["status_int_1_assigned"]
-        assert instance.current_step == workflow_data["step_int_1_init"]  # Should not have advanced
+        assert (
+            instance.current_step == workflow_data["step_int_1_init"]
+        )  # Should not have advanced
 
     def test_update_step_status_invalid_status_name(self, workflow_data):
         """Test updating a step status with an invalid status name for the current step."""
@@ -101,7 +107,9 @@ class TestWorkflowInstanceOperations:
         # Try to set a status that doesn't exist for this step
         assert instance.update_step_status("NonExistentStatus") is False
         instance.refresh_from_db()
-        assert instance.current_step_status == workflow_data["status_int_1_default"]  # Should not have changed
+        assert (
+            instance.current_step_status == workflow_data["status_int_1_default"]
+        )  # Should not have changed
 
     def test_advance_workflow_unconditional_transition(self, workflow_data):
         """Test workflow advancement via an unconditional transition (empty CEL condition)."""
@@ -110,20 +118,32 @@ class TestWorkflowInstanceOperations:
 
         # Trigger advancement by completing the current step with appropriate context
         # Condition "claim.is_high_risk == false" for step_int_1_init -> step_int_2_doc_collection (priority 10)
-        assert instance.update_step_status(
-            "Review Complete", context_data={"claim": {"is_high_risk": False}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Review Complete", context_data={"claim": {"is_high_risk": False}}
+            )
+            is True
+        )
         instance.refresh_from_db()
 
-        assert instance.current_step == workflow_data["step_int_2_doc_collection"]  # Should advance
-        assert instance.current_step_status == workflow_data["status_int_2_default"]  # Should be default of next step
+        assert (
+            instance.current_step == workflow_data["step_int_2_doc_collection"]
+        )  # Should advance
+        assert (
+            instance.current_step_status == workflow_data["status_int_2_default"]
+        )  # Should be default of next step
 
         # From Document Collection to Final Report (unconditional transition)
-        assert instance.update_step_status("Docs Complete", context_data={"claim": {}}) is True
+        assert (
+            instance.update_step_status("Docs Complete", context_data={"claim": {}})
+            is True
+        )
         instance.refresh_from_db()
         assert instance.current_step == workflow_data["step_int_5_report"]
         assert instance.current_step_status == workflow_data["status_int_5_default"]
-        assert instance.is_completed() is False  # Not completed until final status on final step
+        assert (
+            instance.is_completed() is False
+        )  # Not completed until final status on final step
 
     def test_advance_workflow_conditional_transition_true(self, workflow_data):
         """Test workflow advancement via a conditional transition that evaluates to true."""
@@ -131,12 +151,19 @@ class TestWorkflowInstanceOperations:
         instance = workflow_data["instance_high_risk"]
 
         # Update status, providing context data that makes the 'is_high_risk == true' condition true
-        assert instance.update_step_status(
-            "Review Complete", context_data={"claim": {"is_high_risk": True}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Review Complete", context_data={"claim": {"is_high_risk": True}}
+            )
+            is True
+        )
         instance.refresh_from_db()
-        assert instance.current_step == workflow_data["step_int_3_interview"]  # Should go to Interview Stakeholders
-        assert instance.current_step_status.name == "Pending Assignment"  # Default status for step_int_3_interview
+        assert (
+            instance.current_step == workflow_data["step_int_3_interview"]
+        )  # Should go to Interview Stakeholders
+        assert (
+            instance.current_step_status.name == "Pending Assignment"
+        )  # Default status for step_int_3_interview
 
     def test_advance_workflow_conditional_transitions(self, workflow_data, test_users):
         """Test different transition cases based on conditions."""
@@ -150,17 +177,24 @@ class TestWorkflowInstanceOperations:
 
         # Manually set current step to step_int_3_interview for testing a specific transition scenario
         instance.current_step = workflow_data["step_int_3_interview"]
-        instance.current_step_status = workflow_data["step_int_3_interview"].possible_statuses.filter(
-            is_default_status=True
-        ).first()
+        instance.current_step_status = (
+            workflow_data["step_int_3_interview"]
+            .possible_statuses.filter(is_default_status=True)
+            .first()
+        )
         instance.save()
 
         # Test transition from Interview Stakeholders with low amount
-        assert instance.update_step_status(
-            "Interview Complete", context_data={"claim": {"amount": 5000}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Interview Complete", context_data={"claim": {"amount": 5000}}
+            )
+            is True
+        )
         instance.refresh_from_db()
-        assert instance.current_step == workflow_data["step_int_5_report"]  # Should go to Final Report
+        assert (
+            instance.current_step == workflow_data["step_int_5_report"]
+        )  # Should go to Final Report
         assert instance.current_step_status == workflow_data["status_int_5_default"]
 
         # Let's create a scenario where NO transition matches from a custom step
@@ -200,25 +234,35 @@ class TestWorkflowInstanceOperations:
         instance = workflow_data["instance_high_risk"]
 
         # We'll provide context where claim.is_high_risk is true, so Interview Stakeholders (priority 20) should be taken.
-        assert instance.update_step_status(
-            "Review Complete", context_data={"claim": {"is_high_risk": True}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Review Complete", context_data={"claim": {"is_high_risk": True}}
+            )
+            is True
+        )
         instance.refresh_from_db()
         assert instance.current_step == workflow_data["step_int_3_interview"]
 
         # Test another priority case from step_int_3_interview
         instance.current_step = workflow_data["step_int_3_interview"]
-        instance.current_step_status = workflow_data["step_int_3_interview"].possible_statuses.filter(
-            is_default_status=True
-        ).first()
+        instance.current_step_status = (
+            workflow_data["step_int_3_interview"]
+            .possible_statuses.filter(is_default_status=True)
+            .first()
+        )
         instance.save()
 
         # Set amount to 20000 (high), should go to Inspection (priority 10)
-        assert instance.update_step_status(
-            "Interview Complete", context_data={"claim": {"amount": 20000}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Interview Complete", context_data={"claim": {"amount": 20000}}
+            )
+            is True
+        )
         instance.refresh_from_db()
-        assert instance.current_step == workflow_data["step_int_4_inspection"]  # Should go to Schedule Inspection
+        assert (
+            instance.current_step == workflow_data["step_int_4_inspection"]
+        )  # Should go to Schedule Inspection
 
     def test_advance_workflow_reaches_final_step(self, workflow_data, test_users):
         """Test that workflow is marked completed when it reaches the final step and its completion status."""
@@ -231,24 +275,36 @@ class TestWorkflowInstanceOperations:
         instance.start_workflow()
 
         # Advance to Document Collection (unconditional transition with high_risk=False context)
-        assert instance.update_step_status(
-            "Review Complete", context_data={"claim": {"is_high_risk": False}}
-        ) is True
+        assert (
+            instance.update_step_status(
+                "Review Complete", context_data={"claim": {"is_high_risk": False}}
+            )
+            is True
+        )
         instance.refresh_from_db()
         assert instance.current_step == workflow_data["step_int_2_doc_collection"]
 
         # Complete Document Collection, should go directly to Final Report (unconditional transition)
-        assert instance.update_step_status("Docs Complete", context_data={"claim": {}}) is True
+        assert (
+            instance.update_step_status("Docs Complete", context_data={"claim": {}})
+            is True
+        )
         instance.refresh_from_db()
-        assert instance.current_step == workflow_data["step_int_5_report"]  # Now on final step
-        assert instance.is_completed() is False  # Not completed yet, still needs final step's completion status
+        assert (
+            instance.current_step == workflow_data["step_int_5_report"]
+        )  # Now on final step
+        assert (
+            instance.is_completed() is False
+        )  # Not completed yet, still needs final step's completion status
 
         # Set final step status to completion status
         assert instance.update_step_status("Report Approved") is True
         instance.refresh_from_db()
         assert instance.is_completed() is True
         assert instance.completed_at is not None
-        assert instance.current_step_status == workflow_data["status_int_5_final_approved"]
+        assert (
+            instance.current_step_status == workflow_data["status_int_5_final_approved"]
+        )
 
     def test_cancel_workflow_instance_success(self, workflow_data):
         """Test successful cancellation of a workflow instance."""
@@ -260,11 +316,19 @@ class TestWorkflowInstanceOperations:
         instance.refresh_from_db()
         assert instance.current_step_status.is_cancellation_status is True
         assert instance.completed_at is not None
-        print(instance.current_step, instance.current_step.is_final_step, instance.current_step_status,
-              instance.current_step_status.is_completion_status)
-        assert instance.is_completed() is True  # A cancelled workflow is considered completed
+        print(
+            instance.current_step,
+            instance.current_step.is_final_step,
+            instance.current_step_status,
+            instance.current_step_status.is_completion_status,
+        )
+        assert (
+            instance.is_completed() is True
+        )  # A cancelled workflow is considered completed
 
-    def test_cancel_workflow_instance_already_completed(self, workflow_data, test_users):
+    def test_cancel_workflow_instance_already_completed(
+        self, workflow_data, test_users
+    ):
         """Test that a completed workflow cannot be cancelled again."""
         # Create a new instance for this test
         instance = WorkflowInstance.objects.create(
@@ -274,14 +338,18 @@ class TestWorkflowInstanceOperations:
         )
         instance.start_workflow()
         instance.current_step = workflow_data["step_int_5_report"]  # Set to final step
-        instance.current_step_status = workflow_data["status_int_5_final_approved"]  # Set to completion status
+        instance.current_step_status = workflow_data[
+            "status_int_5_final_approved"
+        ]  # Set to completion status
         instance.completed_at = datetime.datetime.now()
         instance.save()
         assert instance.is_completed() is True
 
         assert instance.cancel_workflow() is False  # Should not be able to cancel
         instance.refresh_from_db()
-        assert instance.current_step_status.is_cancellation_status is False  # Status should not have changed
+        assert (
+            instance.current_step_status.is_cancellation_status is False
+        )  # Status should not have changed
 
     def test_set_workflow_on_hold_success(self, workflow_data):
         """Test successful setting of workflow instance to on-hold."""
@@ -308,7 +376,9 @@ class TestWorkflowInstanceOperations:
         assert instance.current_step_status.is_on_hold_status is True
         assert instance.set_on_hold() is False  # Should return False
         instance.refresh_from_db()
-        assert instance.current_step_status.is_on_hold_status is True  # Status should not change
+        assert (
+            instance.current_step_status.is_on_hold_status is True
+        )  # Status should not change
 
     def test_resume_workflow_instance_success(self, workflow_data, test_users):
         """Test successful resumption of a workflow instance from on-hold."""
@@ -325,7 +395,9 @@ class TestWorkflowInstanceOperations:
         assert instance.resume_workflow() is True
         instance.refresh_from_db()
         assert instance.current_step_status.is_on_hold_status is False
-        assert instance.current_step_status.is_default_status is True  # Should revert to default status
+        assert (
+            instance.current_step_status.is_default_status is True
+        )  # Should revert to default status
 
     def test_resume_workflow_instance_not_on_hold(self, workflow_data):
         """Test that a non-on-hold workflow cannot be resumed."""
@@ -335,4 +407,306 @@ class TestWorkflowInstanceOperations:
         assert instance.current_step_status.is_on_hold_status is False
         assert instance.resume_workflow() is False  # Should return False
         instance.refresh_from_db()
-        assert instance.current_step_status.is_on_hold_status is False  # Status should not change
+        assert (
+            instance.current_step_status.is_on_hold_status is False
+        )  # Status should not change
+
+
+@pytest.mark.django_db
+class TestBulkLifecycleOperations:
+    """Tests for the set-based cancel / hold / resume queryset operations"""
+
+    @pytest.fixture
+    def instances(self, workflow_data):
+        """Start the investigation workflow for ten more users"""
+        from django.contrib.auth.models import User
+        from django_steps.services import bulk_start_workflow_instances
+
+        User.objects.bulk_create(User(username=f"bulk_{i}") for i in range(10))
+        bulk_start_workflow_instances(
+            workflow_data["workflow_investigation"].name,
+            User.objects.filter(username__startswith="bulk_"),
+        )
+        return WorkflowInstance.objects.all()
+
+    def test_bulk_set_on_hold_and_resume(
+        self, workflow_data, instances, django_assert_num_queries, settings
+    ):
+        """Test that instances are put on hold and resumed with one UPDATE per step."""
+        # Recording the history adds an INSERT … SELECT (see the next test)
+        settings.DJANGO_STEPS = {"RECORD_HISTORY": False}
+        # Savepoint, aggregate, locked ids and one UPDATE for 'Initial Review', release
+        with django_assert_num_queries(5):
+            counts = instances.bulk_set_on_hold()
+
+        # 'Initial Check' of the fast-track workflow has no on-hold status
+        assert (counts.applied, counts.skipped, counts.failed) == (12, 0, 1)
+        on_hold = workflow_data["status_int_1_on_hold"]
+        assert instances.filter(current_step_status=on_hold).count() == 12
+        assert instances.bulk_set_on_hold().skipped == 12
+
+        counts = instances.bulk_resume()
+        assert (counts.applied, counts.skipped, counts.failed) == (12, 1, 0)
+        assert (
+            instances.filter(
+                current_step_status=workflow_data["status_int_1_default"]
+            ).count()
+            == 12
+        )
+        assert instances.bulk_resume().applied == 0
+
+    def test_bulk_history_is_set_based(
+        self, workflow_data, instances, django_assert_num_queries
+    ):
+        """Test that history events are recorded for the locked instance ids only."""
+        from django_steps.models import WorkflowInstanceEvent
+
+        WorkflowInstanceEvent.objects.all().delete()
+        # Savepoint, aggregate, locked ids, INSERT … SELECT, UPDATE, release
+        with django_assert_num_queries(6) as captured:
+            assert instances.bulk_set_on_hold().applied == 12
+
+        assert captured.captured_queries[2]["sql"].startswith("SELECT")
+        assert captured.captured_queries[3]["sql"].startswith("INSERT INTO")
+        # Both statements are keyed on the ids read, not on the queryset's filter
+        assert all(" IN (" in query["sql"] for query in captured.captured_queries[3:5])
+        on_hold = workflow_data["status_int_1_on_hold"]
+        events = WorkflowInstanceEvent.objects.filter(
+            kind=WorkflowInstanceEvent.Kind.ON_HOLD
+        )
+        assert events.count() == 12
+        assert set(events.values_list("instance_id", flat=True)) == set(
+            instances.filter(current_step_status=on_hold).values_list("pk", flat=True)
+        )
+        assert not events.exclude(to_status_id=on_hold.pk).exists()
+
+    def test_bulk_cancel(self, workflow_data, instances):
+        """Test that instances are cancelled and completed ones skipped."""
+        assert workflow_data["instance_cancelled"].cancel_workflow()
+
+        counts = instances.bulk_cancel()
+
+        assert (counts.applied, counts.skipped, counts.failed) == (12, 1, 0)
+        for instance in instances.filter(
+            workflow=workflow_data["workflow_investigation"]
+        ):
+            assert instance.current_step == workflow_data["step_int_5_report"]
+            assert (
+                instance.current_step_status == workflow_data["status_int_1_cancelled"]
+            )
+            assert instance.completed_at is not None
+            assert instance.is_completed()
+        assert instances.bulk_cancel().skipped == 13
+
+    def test_single_and_bulk_cancel_share_the_status(self, workflow_data):
+        """Test that cancel_workflow and bulk_cancel create one 'Cancelled' status."""
+        from django.contrib.auth.models import User
+        from django_steps.services import bulk_start_workflow_instances
+
+        User.objects.bulk_create(User(username=f"bulk_{i}") for i in range(3))
+        bulk_start_workflow_instances(
+            workflow_data["workflow_fasttrack"].name,
+            User.objects.filter(username__startswith="bulk_"),
+        )
+        # The fast-track workflow has no cancellation status
+        fasttrack = WorkflowInstance.objects.filter(
+            workflow=workflow_data["workflow_fasttrack"]
+        ).order_by("pk")
+        first, second = fasttrack[:2]
+        assert first.cancel_workflow()
+        assert second.cancel_workflow()
+        assert fasttrack.bulk_cancel().applied == 2
+
+        cancelled = WorkflowStepStatus.objects.get(
+            step=workflow_data["step_ft_2_approve"], name="Cancelled"
+        )
+        assert set(fasttrack.values_list("current_step_status", flat=True)) == {
+            cancelled.pk
+        }
+
+    def test_admin_actions_use_bulk_operations(self, workflow_data, instances):
+        """Test that the admin actions report the counts of the bulk operations."""
+        from unittest import mock
+
+        from django.contrib.admin.sites import site
+        from django.test import RequestFactory
+
+        model_admin = site._registry[WorkflowInstance]
+        request = RequestFactory().post("/")
+        with mock.patch.object(model_admin, "message_user") as message_user:
+            model_admin.mark_as_cancelled(request, instances)
+
+        assert [c.args[1] for c in message_user.call_args_list] == [
+            "Successfully cancelled 13 workflow instances."
+        ]
+        assert not instances.filter(completed_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+class TestOptimisticConcurrency:
+    """Tests for the compare-and-swap writes of workflow instance state"""
+
+    def test_advance_is_a_single_write(self, workflow_data, django_assert_num_queries):
+        """Test that a status update advancing the workflow costs one UPDATE."""
+        instance = workflow_data["instance_low_risk"]
+        version = instance.version
+
+        with django_assert_num_queries(1) as captured:
+            assert instance.update_step_status(
+                "Review Complete", context_data={"claim": {"is_high_risk": False}}
+            )
+
+        sql = captured.captured_queries[0]["sql"]
+        assert sql.startswith("UPDATE") and '"version"' in sql
+        instance.refresh_from_db()
+        assert instance.current_step == workflow_data["step_int_2_doc_collection"]
+        assert instance.version == version + 1
+
+    def test_concurrent_update_raises_conflict(self, workflow_data):
+        """Test that a write based on a stale copy is rejected instead of overwriting."""
+        from django_steps.exceptions import WorkflowConflictError
+
+        first = WorkflowInstance.objects.get(pk=workflow_data["instance_low_risk"].pk)
+        second = WorkflowInstance.objects.get(pk=first.pk)
+
+        assert first.set_on_hold()
+        with pytest.raises(WorkflowConflictError):
+            second.update_step_status("Assigned")
+
+        second.refresh_from_db()
+        assert second.current_step_status == workflow_data["status_int_1_on_hold"]
+        # After reloading, the operation can be retried
+        assert second.resume_workflow()
+
+    def test_full_save_keeps_version(self, workflow_data):
+        """Test that saving a stale copy never moves the version backwards."""
+        stale = WorkflowInstance.objects.get(pk=workflow_data["instance_low_risk"].pk)
+        workflow_data["instance_low_risk"].set_on_hold()
+
+        stale.save()
+        stale.refresh_from_db()
+        assert stale.version == workflow_data["instance_low_risk"].version
+
+    def test_full_save_keeps_newer_state(self, workflow_data):
+        """Test that a full save of a stale copy doesn't write back the state it read."""
+        from django_steps.exceptions import WorkflowConflictError
+
+        stale = WorkflowInstance.objects.get(pk=workflow_data["instance_low_risk"].pk)
+        workflow_data["instance_low_risk"].set_on_hold()
+
+        stale.save()
+        stale.refresh_from_db()
+        assert stale.current_step_status == workflow_data["status_int_1_on_hold"]
+
+        # Changing the state of a stale copy is rejected like any other state write
+        stale = WorkflowInstance.objects.get(pk=stale.pk)
+        workflow_data["instance_low_risk"].resume_workflow()
+        stale.current_step = workflow_data["step_int_2_doc_collection"]
+        with pytest.raises(WorkflowConflictError):
+            stale.save()
+
+        stale.refresh_from_db()
+        version = stale.version
+        stale.current_step = workflow_data["step_int_2_doc_collection"]
+        stale.save()
+        stale.refresh_from_db()
+        assert stale.current_step == workflow_data["step_int_2_doc_collection"]
+        assert stale.version == version + 1
+
+    def test_bulk_operations_bump_version(self, workflow_data):
+        """Test that copies read before a bulk operation can't overwrite its result."""
+        from django_steps.exceptions import WorkflowConflictError
+
+        stale = WorkflowInstance.objects.get(pk=workflow_data["instance_low_risk"].pk)
+        WorkflowInstance.objects.filter(pk=stale.pk).bulk_set_on_hold()
+
+        with pytest.raises(WorkflowConflictError):
+            stale.update_step_status("Assigned")
+
+
+@pytest.mark.django_db
+class TestLifecycleState:
+    """Tests for the denormalized state and entered_step_at columns"""
+
+    State = WorkflowInstance.State
+
+    def test_state_follows_instance_methods(self, workflow_data):
+        """Test that every lifecycle method keeps the state column up to date."""
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_high_risk"].pk
+        )
+        assert instance.state == self.State.ACTIVE
+        entered = instance.entered_step_at
+        assert entered is not None
+
+        instance.set_on_hold()
+        assert WorkflowInstance.objects.get(pk=instance.pk).state == self.State.ON_HOLD
+        instance.resume_workflow()
+        instance.update_step_status(
+            "Review Complete", {"claim": {"is_high_risk": True}}
+        )
+
+        stored = WorkflowInstance.objects.get(pk=instance.pk)
+        assert stored.state == self.State.ACTIVE
+        assert stored.entered_step_at > entered  # Advanced to 'Interview Stakeholders'
+
+        instance.cancel_workflow()
+        stored = WorkflowInstance.objects.get(pk=instance.pk)
+        assert stored.state == self.State.CANCELLED
+        assert stored.is_completed() is True
+
+    def test_cancellation_status_on_non_final_step(self, workflow_data):
+        """Test that a cancellation status only completes the workflow on the final step."""
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+        instance.current_step_status = workflow_data["status_int_1_cancelled"]
+        instance.save()
+
+        stored = WorkflowInstance.objects.get(pk=instance.pk)
+        assert stored.current_step == workflow_data["step_int_1_init"]
+        assert stored.state == self.State.ACTIVE
+        assert stored.is_completed() is False
+
+    def test_is_completed_does_no_queries(
+        self, workflow_data, django_assert_num_queries
+    ):
+        """Test that is_completed() reads the state column only."""
+        instance = WorkflowInstance.objects.get(
+            pk=workflow_data["instance_low_risk"].pk
+        )
+        with django_assert_num_queries(0):
+            assert instance.is_completed() is False
+
+    def test_state_follows_bulk_operations(self, workflow_data, test_users):
+        """Test that the bulk services and queryset operations maintain the state."""
+        from django_steps.services import (
+            bulk_start_workflow_instances,
+            bulk_update_workflow_step_status,
+        )
+
+        bulk_start_workflow_instances("Fast-Track Workflow", [test_users["another"]])
+        started = WorkflowInstance.objects.get(
+            workflow=workflow_data["workflow_fasttrack"],
+            object_id=test_users["another"].pk,
+        )
+        assert started.state == self.State.ACTIVE
+        assert started.entered_step_at is not None
+
+        instances = WorkflowInstance.objects.filter(
+            workflow=workflow_data["workflow_investigation"]
+        )
+        instances.bulk_set_on_hold()
+        assert set(instances.values_list("state", flat=True)) == {self.State.ON_HOLD}
+        instances.bulk_resume()
+        bulk_update_workflow_step_status(
+            [workflow_data["instance_high_risk"].pk],
+            "Review Complete",
+            context_provider=lambda user: {"claim": {"is_high_risk": True}},
+        )
+        advanced = instances.get(pk=workflow_data["instance_high_risk"].pk)
+        assert advanced.current_step == workflow_data["step_int_3_interview"]
+        assert advanced.entered_step_at > started.entered_step_at
+        assert instances.filter(state=self.State.ACTIVE).count() == 2
+        instances.bulk_cancel()
+        assert not instances.exclude(state=self.State.CANCELLED).exists()